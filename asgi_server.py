@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import time
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+import ui_bridge
+from providers.errors import ProviderError
+from conversation_store import SessionConflict
+from metrics import http_request_seconds
+from http_compression import accept_encoding_header, choose_encoding, compress, decompress, supported_encodings
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+async def read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+    return body
+
+def header(scope, name):
+    name = name.lower().encode()
+    for key, value in scope.get('headers', []):
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return None
+
+async def send_json(send, status, payload, headers=None, encoding=None):
+    # encoding: negotiated response coding (see http_compression), if any
+    body = json.dumps(payload).encode('utf-8')
+    headers = dict(headers or {}, **{"Accept-Encoding": accept_encoding_header()})
+    if encoding and len(body) >= int(os.getenv('HTTP_COMPRESS_MIN_BYTES', '1024')):
+        body = compress(body, encoding)
+        headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    extra = [(k.lower().encode(), str(v).encode()) for k, v in headers.items()]
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*")
+        ] + extra
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class AsgiBridge:
+    # ASGI front for the Flask app. /api/chat is served on the event loop with
+    # the providers' achat(), so a slow upstream holds a coroutine rather than
+    # a thread; every other route is handed to Flask through asgiref's
+    # WSGI adapter and behaves exactly as under app.run.
+
+    def __init__(self, flask_app):
+        if WsgiToAsgi is None:
+            raise RuntimeError("ASGI mode requires asgiref (pip install asgiref uvicorn)")
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.routes = {
+            ('POST', '/api/chat'): self.chat
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] == 'http':
+            handler = self.routes.get((scope['method'], scope['path']))
+            if handler:
+                await self.timed(handler, scope, receive, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def timed(self, handler, scope, receive, send):
+        # Native routes bypass Flask's request hooks, so time them here
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_and_capture(message):
+            if message['type'] == 'http.response.start':
+                status["code"] = message['status']
+            await send(message)
+
+        try:
+            await handler(scope, receive, send_and_capture)
+        finally:
+            http_request_seconds.observe(time.perf_counter() - start, method=scope['method'],
+                                         route=scope['path'], status=status["code"])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({"type": "lifespan.startup.complete"})
+            elif message['type'] == 'lifespan.shutdown':
+                for provider in ui_bridge.provider_manager.providers.values():
+                    await provider.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def chat(self, scope, receive, send):
+        # Mirrors http_compression.compress_flask for this native route
+        encoding = choose_encoding(header(scope, 'accept-encoding'))
+        content_encoding = (header(scope, 'content-encoding') or 'identity').strip().lower()
+        if content_encoding != 'identity' and content_encoding not in supported_encodings():
+            await send_json(send, 415, {"error": f"Unsupported Content-Encoding: {content_encoding}"})
+            return
+        try:
+            body = await read_body(receive)
+            if content_encoding != 'identity':
+                body = decompress(body, content_encoding)
+            data = json.loads(body or b'{}')
+        except ValueError as e:
+            await send_json(send, 400, {"error": f"Invalid request: {str(e)}"})
+            return
+
+        try:
+            # Request preparation touches SQLite, so keep it off the event loop
+            provider, messages, session, error = await asyncio.to_thread(ui_bridge.prepare_chat, data)
+            if error:
+                await send_json(send, error[1], error[0], encoding=encoding)
+                return
+
+            cache = ui_bridge.response_cache
+            key = cache.make_key(messages)
+            response = await cache.aget_or_call(key, lambda: ui_bridge.provider_manager.achat(messages, ui_bridge.request_priority(data)), bypass=bool(data.get('no_cache')))
+            try:
+                session_fields = await asyncio.to_thread(ui_bridge.record_session_turn, session, data['message'], response)
+            except SessionConflict as e:
+                payload, status = ui_bridge.session_conflict_response(e, response)
+                await send_json(send, status, payload, encoding=encoding)
+                return
+            await send_json(send, 200, dict({"response": response}, **session_fields), encoding=encoding)
+        except ProviderError as e:
+            payload, status, headers = ui_bridge.provider_error_response(e)
+            await send_json(send, status, payload, headers, encoding=encoding)
+        except Exception as e:
+            await send_json(send, 200, ui_bridge.chat_error_response(e), encoding=encoding)
+
+def run(flask_app, host='0.0.0.0', port=5000):
+    import uvicorn
+    uvicorn.run(AsgiBridge(flask_app), host=host, port=port,
+                timeout_keep_alive=int(os.getenv('WEB_KEEPALIVE', '75')))
@@ -0,0 +1,306 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import observe_stage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import speech_recognition as sr
+except ImportError:
+    sr = None
+
+def to_pcm16(samples):
+    # float32 in [-1, 1] -> little-endian 16-bit PCM bytes
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+class GoogleRecognizer:
+    # Default backend. Anything with transcribe(samples, sample_rate) -> str
+    # can stand in for it (a local model, or a fake in tests).
+
+    def transcribe(self, samples, sample_rate):
+        if sr is None or len(samples) == 0:
+            return ""
+        audio = sr.AudioData(to_pcm16(samples), sample_rate, 2)
+        try:
+            return sr.Recognizer().recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+
+class BoundedRecording:
+    # Chunks of a record-then-transcribe capture, capped at max_samples by
+    # dropping the oldest so an abandoned recording cannot grow without limit
+
+    def __init__(self, max_samples):
+        self.max_samples = max_samples
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, chunk):
+        # Copied: sounddevice reuses the callback buffer
+        chunk = np.array(chunk, dtype=np.float32).reshape(-1)
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        while self.size > self.max_samples and len(self.chunks) > 1:
+            oldest = self.chunks.popleft()
+            self.size -= len(oldest)
+            self.dropped += len(oldest)
+
+    def samples(self):
+        return np.concatenate(list(self.chunks)) if self.chunks else np.zeros(0, dtype=np.float32)
+
+class RingBuffer:
+    # Preallocated float32 ring between the audio callback (writer) and the
+    # VAD thread (reader). When the reader falls behind the oldest samples are
+    # overwritten and counted in `dropped`.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.start = 0
+        self.size = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.readable = threading.Condition(self._lock)
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if len(samples) > self.capacity:
+                self.dropped += len(samples) - self.capacity
+                samples = samples[-self.capacity:]
+            overflow = self.size + len(samples) - self.capacity
+            if overflow > 0:
+                self.start = (self.start + overflow) % self.capacity
+                self.size -= overflow
+                self.dropped += overflow
+            end = (self.start + self.size) % self.capacity
+            first = min(len(samples), self.capacity - end)
+            self.buffer[end:end + first] = samples[:first]
+            self.buffer[:len(samples) - first] = samples[first:]
+            self.size += len(samples)
+            self.readable.notify()
+
+    def read(self, count, out, timeout=None):
+        # Copies exactly `count` samples into `out`; False on timeout
+        with self._lock:
+            if self.size < count and not self.readable.wait_for(lambda: self.size >= count, timeout):
+                return False
+            first = min(count, self.capacity - self.start)
+            out[:first] = self.buffer[self.start:self.start + first]
+            out[first:count] = self.buffer[:count - first]
+            self.start = (self.start + count) % self.capacity
+            self.size -= count
+            return True
+
+    def drain(self):
+        with self._lock:
+            out = np.empty(self.size, dtype=np.float32)
+            first = min(self.size, self.capacity - self.start)
+            out[:first] = self.buffer[self.start:self.start + first]
+            out[first:] = self.buffer[:self.size - first]
+            self.start, self.size = 0, 0
+            return out
+
+class EnergyVAD:
+    # Frame-level voice activity detection on RMS energy against an adaptive
+    # noise floor. process(frame) returns "start", "end" or None.
+
+    def __init__(self, ratio=3.0, min_energy=0.005, hangover_frames=20, min_speech_frames=6, alpha=0.05):
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.hangover_frames = hangover_frames
+        self.min_speech_frames = min_speech_frames
+        self.alpha = alpha
+        self.noise_floor = None
+        self.in_speech = False
+        self.speech_frames = 0
+        self.silence_run = 0
+
+    def threshold(self):
+        return max(self.min_energy, (self.noise_floor or 0.0) * self.ratio)
+
+    def process(self, frame):
+        energy = float(np.sqrt(np.mean(frame * frame)))
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        voiced = energy > self.threshold()
+        if not voiced:
+            self.noise_floor += self.alpha * (energy - self.noise_floor)
+
+        if not self.in_speech:
+            if voiced:
+                self.in_speech = True
+                self.speech_frames, self.silence_run = 1, 0
+                return "start"
+            return None
+        if voiced:
+            self.speech_frames += 1
+            self.silence_run = 0
+            return None
+        self.silence_run += 1
+        if self.silence_run >= self.hangover_frames:
+            self.in_speech = False
+            return "end"
+        return None
+
+    def is_speech(self):
+        # Whether the utterance in progress has enough voiced frames to keep
+        return self.speech_frames >= self.min_speech_frames
+
+class StreamingTranscriber:
+    # Cuts a live stream into utterances and transcribes each one as soon as
+    # it ends. feed() is safe to call from the sounddevice callback; the VAD
+    # runs on its own thread and recognition on a single ordered worker.
+    # Subscribers receive {"partial": text, "index": n} events and finally
+    # {"final": text}.
+
+    def __init__(self, recognizer, sample_rate, frame_ms=30, buffer_seconds=30,
+                 max_utterance_seconds=15, preroll_ms=300, vad=None):
+        self.recognizer = recognizer
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.ring = RingBuffer(int(sample_rate * buffer_seconds))
+        self.vad = vad or EnergyVAD()
+        self.utterance = np.zeros(int(sample_rate * max_utterance_seconds), dtype=np.float32)
+        self.utterance_len = 0
+        self.preroll = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self.transcripts = []
+        self.recognize_seconds = 0.0
+        self._pending = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transcribe')
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='vad', daemon=True)
+        self._thread.start()
+
+    def feed(self, samples):
+        self.ring.write(samples)
+
+    def subscribe(self):
+        events = queue.Queue()
+        with self._lock:
+            for index, text in enumerate(self.transcripts):
+                events.put({"partial": text, "index": index})
+            self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+
+    def _publish(self, event):
+        with self._lock:
+            for events in self._subscribers:
+                events.put(event)
+
+    def _run(self):
+        frame = np.empty(self.frame_size, dtype=np.float32)
+        while self._running:
+            if self.ring.read(self.frame_size, frame, timeout=0.1):
+                self._process(frame)
+
+    def _process(self, frame):
+        event = self.vad.process(frame)
+        if event == "start":
+            for earlier in self.preroll:
+                self._append(earlier)
+            self.preroll.clear()
+        if self.vad.in_speech or event == "end":
+            if self.utterance_len + len(frame) > len(self.utterance):
+                # Longest utterance reached: transcribe it and keep going
+                self._cut()
+            self._append(frame)
+            if event == "end":
+                self._cut()
+        else:
+            self.preroll.append(frame.copy())
+
+    def _append(self, frame):
+        end = self.utterance_len + len(frame)
+        self.utterance[self.utterance_len:end] = frame
+        self.utterance_len = end
+
+    def _cut(self):
+        if self.utterance_len and self.vad.is_speech():
+            samples = self.utterance[:self.utterance_len].copy()
+            self._pending.append(self._executor.submit(self._recognize, samples))
+        self.utterance_len = 0
+
+    def _recognize(self, samples):
+        start = time.perf_counter()
+        try:
+            text = self.recognizer.transcribe(samples, self.sample_rate) or ""
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            text = ""
+        elapsed = time.perf_counter() - start
+        self.recognize_seconds += elapsed
+        observe_stage('audio', 'utterance_recognize', elapsed)
+        if text:
+            # Appended and published under one lock so a new subscriber sees
+            # each partial exactly once
+            with self._lock:
+                index = len(self.transcripts)
+                self.transcripts.append(text)
+                for events in self._subscribers:
+                    events.put({"partial": text, "index": index})
+        return text
+
+    def close(self):
+        # Abandon the recording (its job was refused, or the source restarted):
+        # stop the VAD thread and drop recognitions that have not started.
+        # Subscribers get the transcript so far as the final one.
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            text = " ".join(self.transcripts)
+        self._publish({"final": text})
+        return text
+
+    def finish(self, timeout=None, timings=None):
+        # Stop reading, flush what is left and wait for every utterance.
+        # Stage durations go into `timings` when given.
+        start = time.perf_counter()
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        tail = self.ring.drain()
+        for offset in range(0, len(tail) - self.frame_size + 1, self.frame_size):
+            self._process(tail[offset:offset + self.frame_size])
+        if self.vad.in_speech:
+            self._cut()
+        flushed = time.perf_counter()
+        for future in self._pending:
+            future.result(timeout=timeout)
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            text = " ".join(self.transcripts)
+        self._publish({"final": text})
+        if timings is not None:
+            timings.update({
+                "flush_ms": round((flushed - start) * 1000, 2),
+                "tail_wait_ms": round((time.perf_counter() - flushed) * 1000, 2),
+                "recognize_ms": round(self.recognize_seconds * 1000, 2),
+                "utterances": len(self._pending),
+                "dropped_samples": self.ring.dropped
+            })
+        return text
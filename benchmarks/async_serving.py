@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadtest import make_requests, run_scenario, start_app
+from mock_llm import MockConfig, start_mock_server
+
+# /api/chat under many concurrent slow upstream calls, served three ways:
+# the threaded Werkzeug server (one thread per connection), one gunicorn
+# gthread worker (a fixed thread pool) and the ASGI bridge (one event loop).
+# Reports throughput, latency and the server's peak RSS and thread count.
+
+def process_tree(pid):
+    pids = [pid]
+    for child in pids:
+        try:
+            with open(f'/proc/{child}/task/{child}/children') as f:
+                pids.extend(int(p) for p in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+def sample(pid):
+    # -> (rss_bytes, threads) summed over the process and its children
+    rss, threads = 0, 0
+    for child in process_tree(pid):
+        try:
+            with open(f'/proc/{child}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss += int(line.split()[1]) * 1024
+                    elif line.startswith('Threads:'):
+                        threads += int(line.split()[1])
+        except OSError:
+            continue
+    return rss, threads
+
+class PeakSampler:
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss, threads = sample(self.pid)
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_threads = max(self.peak_threads, threads)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded vs async serving of /api/chat against a slow upstream")
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--latency-ms', type=float, default=1000.0, help="Mock upstream time to first token")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn gthread threads")
+    parser.add_argument('--modes', default='werkzeug,gthread,asgi')
+    parser.add_argument('--async-pool', type=int, default=100,
+                        help="PROVIDER_ASYNC_POOL_SIZE: upstream connections the ASGI mode may open")
+    args = parser.parse_args()
+    os.environ['PROVIDER_ASYNC_POOL_SIZE'] = str(args.async_pool)
+
+    if sys.platform != 'linux':
+        print("RSS and thread sampling reads /proc; memory columns will be zero", file=sys.stderr)
+
+    mock = MockConfig(latency_ms=args.latency_ms, tokens_per_second=100000, completion_tokens=60)
+    mock_server, llm_url = start_mock_server(mock)
+    try:
+        for mode in args.modes.split(','):
+            state_dir = tempfile.mkdtemp(prefix='async-serving-')
+            os.environ.pop('ASGI_MODE', None)
+            if mode == 'asgi':
+                os.environ['ASGI_MODE'] = '1'
+            workers = 1 if mode == 'gthread' else 0
+            process, base = start_app(llm_url, state_dir, workers, args.threads, 10)
+            try:
+                idle_rss, idle_threads = sample(process.pid)
+                call = make_requests('chat', [], [], random.Random(1))
+                with PeakSampler(process.pid) as peak:
+                    result = run_scenario(base, call, args.concurrency, args.requests)
+                print(json.dumps(dict({
+                    "mode": mode,
+                    "concurrency": args.concurrency,
+                    "idle_rss_mb": round(idle_rss / 2 ** 20, 1),
+                    "peak_rss_mb": round(peak.peak_rss / 2 ** 20, 1),
+                    "idle_threads": idle_threads,
+                    "peak_threads": peak.peak_threads
+                }, **{k: result[k] for k in ("errors", "statuses", "rps", "p50_ms", "p90_ms", "p99_ms")})), flush=True)
+            finally:
+                process.terminate()
+                process.wait()
+                shutil.rmtree(state_dir, ignore_errors=True)
+    finally:
+        os.environ.pop('ASGI_MODE', None)
+        mock_server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_store import ConfigStore
+
+def hammer(path, worker, threads, updates):
+    # One process: `threads` threads each saving `updates` distinct keys,
+    # interleaved with loads, the way concurrent /api/config calls arrive
+    store = ConfigStore(path)
+    errors = []
+
+    def run(thread):
+        for i in range(updates):
+            try:
+                store.update({f"w{worker}-t{thread}-{i}": i, "last_writer": f"w{worker}-t{thread}"})
+                store.load()
+            except Exception as e:
+                errors.append(str(e))
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return store.writes, errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent saves against ConfigStore: no lost updates, no torn files")
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--updates', type=int, default=50)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='config-stress-')
+    path = os.path.join(directory, 'user_config.json')
+    with open(path, 'w') as f:
+        json.dump({"theme": "dark"}, f)
+
+    # A reader that must never see a half-written file
+    torn = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with open(path) as f:
+                    json.load(f)
+            except ValueError:
+                torn.append(1)
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.starmap(hammer, [(path, w, args.threads, args.updates) for w in range(args.processes)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader_thread.join()
+
+    with open(path) as f:
+        final = json.load(f)
+    expected = {f"w{w}-t{t}-{i}" for w in range(args.processes) for t in range(args.threads) for i in range(args.updates)}
+    lost = expected - final.keys()
+    saves = len(expected)
+    writes = sum(w for w, _ in results)
+    errors = [e for _, errs in results for e in errs]
+
+    print(json.dumps({
+        "saves": saves,
+        "file_writes": writes,
+        "saves_per_write": round(saves / writes, 1) if writes else None,
+        "seconds": round(elapsed, 2),
+        "lost_updates": len(lost),
+        "torn_reads": len(torn),
+        "errors": len(errors),
+        "preserved_existing_key": final.get("theme") == "dark"
+    }, indent=2))
+    if lost or torn or errors or final.get("theme") != "dark":
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
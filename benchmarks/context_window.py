@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from context_window import ContextWindow, message_tokens
+
+# Prompt size and fitting cost over one growing chat session: every request
+# sends the whole history, as ui_bridge does, and is fitted into the budget.
+#   python benchmarks/context_window.py --turns 400 --budget 7168
+
+WORDS = ("the model reads a resume and answers questions about skills projects experience "
+         "education python data cloud team lead design review deploy latency budget").split()
+
+def turn_text(rng, words):
+    sentences = []
+    while words > 0:
+        n = min(words, rng.randint(6, 20))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + ".")
+        words -= n
+    return " ".join(sentences)
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens and fit() time for a growing session")
+    parser.add_argument('--turns', type=int, default=400)
+    parser.add_argument('--budget', type=int, default=7168, help="Prompt tokens (context minus completion reserve)")
+    parser.add_argument('--user-words', type=int, default=40)
+    parser.add_argument('--assistant-words', type=int, default=180)
+    parser.add_argument('--every', type=int, default=50, help="Print a row every N user turns")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    window = ContextWindow()
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    raw_total, fitted_total, timings = 0, 0, []
+    for i in range(1, args.turns + 1):
+        messages.append({"role": "user", "content": turn_text(rng, args.user_words)})
+        start = time.perf_counter()
+        fitted = window.fit(messages, budget=args.budget)
+        timings.append((time.perf_counter() - start) * 1000)
+        raw = sum(message_tokens(m) for m in messages)
+        sent = sum(message_tokens(m) for m in fitted)
+        raw_total += raw
+        fitted_total += sent
+        if i % args.every == 0 or i == args.turns:
+            print(json.dumps({"turn": i, "history_tokens": raw, "prompt_tokens": sent,
+                              "messages": len(messages), "sent_messages": len(fitted),
+                              "fit_ms": round(timings[-1], 3), **window.stats()}), flush=True)
+        messages.append({"role": "assistant", "content": turn_text(rng, args.assistant_words)})
+
+    print(json.dumps({
+        "requests": args.turns,
+        "history_tokens_total": raw_total,
+        "prompt_tokens_total": fitted_total,
+        "saved_pct": round(100 * (1 - fitted_total / raw_total), 1),
+        "fit_p50_ms": round(statistics.median(timings), 3),
+        "fit_max_ms": round(max(timings), 3),
+        **window.stats()
+    }))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import io
+import os
+import random
+
+# Synthetic resumes as TXT, PDF and (with python-docx) DOCX, deterministic
+# for a given seed so benchmark runs are comparable.
+
+SECTIONS = ("Summary", "Experience", "Projects", "Skills", "Education")
+WORDS = ("python flask django postgres redis kafka docker kubernetes aws gcp terraform react typescript "
+         "latency throughput caching queue worker scheduler pipeline ingestion retrieval search index "
+         "designed built led migrated reduced improved scaled automated deployed monitored mentored "
+         "service platform api backend frontend data model team customers reliability incident").split()
+
+def make_resume_text(rng, words=600):
+    lines = [f"Candidate {rng.randint(1000, 9999)}", "candidate@example.com"]
+    per_section = max(1, words // len(SECTIONS))
+    for section in SECTIONS:
+        lines.append("")
+        lines.append(section)
+        remaining = per_section
+        while remaining > 0:
+            length = min(remaining, rng.randint(8, 16))
+            lines.append("- " + " ".join(rng.choice(WORDS) for _ in range(length)))
+            remaining -= length
+    return "\n".join(lines)
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def make_pdf(text, lines_per_page=48):
+    # Minimal single-font PDF that PyPDF2 can extract text from
+    lines = text.splitlines() or [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        stream = "BT /F1 10 Tf 14 TL 50 760 Td " + " ".join(f"({_pdf_escape(l)}) Tj T*" for l in page_lines) + " ET"
+        stream = stream.encode('latin-1', errors='replace')
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = out.tell()
+        out.write(b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n")
+    xref = out.tell()
+    count = max(objects) + 1
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+    for number in range(1, count):
+        out.write(b"%010d 00000 n \n" % offsets[number])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+    return out.getvalue()
+
+def make_docx(text):
+    try:
+        import docx
+    except ImportError:
+        return None
+    document = docx.Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+def build_documents(count=30, seed=11, words=600):
+    # -> list of (filename, bytes)
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        text = make_resume_text(rng, words=rng.randint(words // 2, words * 2))
+        kind = ("txt", "pdf", "docx")[i % 3]
+        if kind == "pdf":
+            documents.append((f"resume_{i}.pdf", make_pdf(text)))
+        elif kind == "docx" and make_docx(text) is not None:
+            documents.append((f"resume_{i}.docx", make_docx(text)))
+        else:
+            documents.append((f"resume_{i}.txt", text.encode('utf-8')))
+    return documents
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the synthetic resume corpus to a directory")
+    parser.add_argument('out_dir')
+    parser.add_argument('--count', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+    os.makedirs(args.out_dir, exist_ok=True)
+    for filename, data in build_documents(args.count, args.seed):
+        with open(os.path.join(args.out_dir, filename), 'wb') as f:
+            f.write(data)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import hashlib
+import os
+import time
+
+class FakeOCREngine:
+    # Drop-in for ocr.ocr_engine.OCREngine with a fixed cost per image and a
+    # cheaper per-image cost inside a batch, so the cloud scheduler's batching
+    # shows up in benchmarks. Select it with
+    # OCR_ENGINE=benchmarks.fake_ocr:FakeOCREngine.
+
+    def __init__(self):
+        self.latency = float(os.getenv('FAKE_OCR_LATENCY_MS', '40')) / 1000.0
+        self.batch_overhead = float(os.getenv('FAKE_OCR_BATCH_OVERHEAD_MS', '30')) / 1000.0
+        # Model loading; the real engine takes seconds to import torch and easyocr
+        time.sleep(float(os.getenv('FAKE_OCR_LOAD_MS', '0')) / 1000.0)
+
+    def _text(self, image_bytes):
+        return f"fake text {hashlib.sha1(image_bytes).hexdigest()[:8]}"
+
+    def extract_text_from_image(self, image_bytes):
+        time.sleep(self.latency)
+        return self._text(image_bytes), "Fake OCR"
+
+    def extract_text_batch(self, images):
+        time.sleep(self.batch_overhead + self.latency * len(images) / 4)
+        return [(self._text(image), "Fake OCR") for image in images]
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversation_manager import ConversationManager
+
+# Append cost of the history journal as a history grows, and the time to
+# reload it afterwards:
+#   python benchmarks/history_journal.py --sizes 10000,100000
+
+def run(size, message_bytes, compact_every):
+    state_dir = tempfile.mkdtemp(prefix='history-journal-')
+    storage = os.path.join(state_dir, 'conversation_history.json')
+    content = "x" * message_bytes
+    try:
+        manager = ConversationManager(storage, compact_every=compact_every)
+        timings = []
+        start = time.perf_counter()
+        for i in range(size):
+            t = time.perf_counter()
+            manager.add_message('user' if i % 2 == 0 else 'assistant', content)
+            timings.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        manager.close()
+        timings.sort()
+
+        start = time.perf_counter()
+        reloaded = ConversationManager(storage, compact_every=compact_every)
+        reload_s = time.perf_counter() - start
+        count = len(reloaded.get_history())
+        reloaded.close()
+        return {
+            "appends": size,
+            "compact_every": compact_every,
+            "appends_per_s": round(size / elapsed),
+            "p50_us": round(statistics.median(timings) * 1e6, 1),
+            "p99_us": round(timings[int(len(timings) * 0.99)] * 1e6, 1),
+            "max_ms": round(timings[-1] * 1000, 2),
+            "reload_ms": round(reload_s * 1000, 1),
+            "reloaded": count,
+            "snapshot_kb": round(os.path.getsize(storage) / 1024) if os.path.exists(storage) else 0,
+            "journal_kb": round(os.path.getsize(storage + '.journal') / 1024)
+        }
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="History journal append and reload cost")
+    parser.add_argument('--sizes', default='10000,100000')
+    parser.add_argument('--message-bytes', type=int, default=400)
+    parser.add_argument('--compact-every', type=int, default=1000)
+    args = parser.parse_args()
+    for size in (int(s) for s in args.sizes.split(',')):
+        print(json.dumps(run(size, args.message_bytes, args.compact_every)), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus import build_documents
+from mock_llm import MockConfig, start_mock_server
+from worker_throughput import ROOT, free_port
+
+# Drives the real cloud_server against a local mock LLM and a fake OCR
+# engine, so runs are repeatable and cost nothing:
+#   python benchmarks/loadtest.py --concurrency 16 --requests 200 --out results.json
+#   python benchmarks/loadtest.py --baseline benchmarks/baseline.json
+# Latency metrics (ms) and rps are compared to the baseline; any scenario
+# that is worse by more than --tolerance makes the run exit non-zero.
+
+SCENARIOS = ('chat', 'chat_stream', 'upload_resume', 'ocr_remote', 'config')
+
+def start_app(llm_url, state_dir, workers, threads, ocr_latency_ms):
+    port = free_port()
+    env = dict(os.environ, STATE_DIR=state_dir, PORT=str(port), CLOUD_MODE='true',
+               WEB_CONCURRENCY=str(workers), WEB_THREADS=str(threads),
+               GROQ_API_KEY='bench', GROQ_API_URL=llm_url + '/chat/completions', CURRENT_PROVIDER='groq',
+               OCR_ENGINE='benchmarks.fake_ocr:FakeOCREngine', FAKE_OCR_LATENCY_MS=str(ocr_latency_ms),
+               USER_CONFIG_FILE=os.path.join(state_dir, 'user_config.json'),
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    env.pop('CEREBRAS_API_KEY', None)
+    env.pop('REMOTE_SERVER_URL', None)
+    if workers > 0:
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}',
+                   '--access-logfile', '/dev/null', 'cloud_server:app']
+    else:
+        command = [sys.executable, os.path.join(ROOT, 'cloud_server.py')]
+    # The app writes its log files to the working directory, so run it in the
+    # throwaway state directory and import it through PYTHONPATH
+    log = open(os.path.join(state_dir, 'server.log'), 'wb')
+    process = subprocess.Popen(command, cwd=state_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 90
+    while time.time() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            requests.get(base + '/api/check_setup', timeout=1)
+            return process, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"cloud_server did not start, see {log.name}")
+
+def make_images(count, seed):
+    try:
+        from ocr_preprocess import make_screenshot
+    except ImportError:
+        return []
+    rng = random.Random(seed)
+    return [make_screenshot(rng)[0] for _ in range(count)]
+
+def make_requests(name, documents, images, rng):
+    # -> function(session, base, i) -> (response, ttfb_seconds or None)
+    if name == 'chat':
+        def call(session, base, i):
+            body = {"message": f"Question {i}: summarise {rng.choice(('caching', 'queues', 'indexes'))}",
+                    "no_cache": True}
+            return session.post(base + '/api/chat', json=body, timeout=60), None
+    elif name == 'chat_stream':
+        def call(session, base, i):
+            start = time.perf_counter()
+            response = session.post(base + '/api/chat/stream', json={"message": f"Stream {i}", "no_cache": True},
+                                    stream=True, timeout=60)
+            first = None
+            for line in response.iter_lines():
+                if first is None and line.startswith(b'data:'):
+                    first = time.perf_counter() - start
+                if line == b'data: [DONE]':
+                    break
+            response.close()
+            return response, first
+    elif name == 'upload_resume':
+        def call(session, base, i):
+            filename, data = documents[i % len(documents)]
+            return session.post(base + '/api/upload_resume', files={"file": (filename, data)}, timeout=60), None
+    elif name == 'ocr_remote':
+        def call(session, base, i):
+            image = images[i % len(images)]
+            return session.post(base + '/api/ocr_remote', files={"image": ("screen.png", image)}, timeout=60), None
+    else:
+        def call(session, base, i):
+            if i % 4 == 0:
+                response = session.post(base + '/api/config/save', json={f"setting_{i % 10}": i}, timeout=30)
+            else:
+                response = session.get(base + '/api/config/load', timeout=30)
+            return response, None
+    return call
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+def run_scenario(base, call, concurrency, total):
+    latencies, ttfb, statuses = [], [], {}
+    errors = [0]
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                response, first = call(session, base, i)
+                elapsed = time.perf_counter() - start
+                status = str(response.status_code)
+                ok = response.status_code < 400
+            except requests.RequestException as e:
+                elapsed, first, status, ok = time.perf_counter() - start, None, type(e).__name__, False
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if ok:
+                    latencies.append(elapsed)
+                    if first is not None:
+                        ttfb.append(first)
+                else:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    result = {
+        "requests": total,
+        "errors": errors[0],
+        "error_rate": round(errors[0] / total, 4) if total else 0.0,
+        "statuses": statuses,
+        "duration_s": round(duration, 3),
+        "rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "p50_ms": percentile(ordered, 0.50),
+        "p90_ms": percentile(ordered, 0.90),
+        "p99_ms": percentile(ordered, 0.99),
+    }
+    if ttfb:
+        result["ttfb_p50_ms"] = percentile(sorted(ttfb), 0.50)
+        result["ttfb_p99_ms"] = percentile(sorted(ttfb), 0.99)
+    return result
+
+def compare(results, baseline, tolerance):
+    # -> list of regression messages
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for field in ("p50_ms", "p90_ms", "p99_ms", "ttfb_p50_ms", "ttfb_p99_ms"):
+            old, new = previous.get(field), current.get(field)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append(f"{name}: {field} {old} -> {new}")
+        old, new = previous.get("rps"), current.get("rps")
+        if old and new < old * (1 - tolerance):
+            regressions.append(f"{name}: rps {old} -> {new}")
+        if current["error_rate"] > previous.get("error_rate", 0.0) + 0.01:
+            regressions.append(f"{name}: error_rate {previous.get('error_rate', 0.0)} -> {current['error_rate']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test cloud_server against local mock backends")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help="Requests per scenario")
+    parser.add_argument('--workers', type=int, default=0, help="gunicorn workers; 0 runs cloud_server.py directly")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--url', help="Drive an already running server instead of starting one")
+    parser.add_argument('--llm-latency-ms', type=float, default=150.0)
+    parser.add_argument('--llm-tokens-per-second', type=float, default=500.0)
+    parser.add_argument('--llm-completion-tokens', type=int, default=80)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--ocr-latency-ms', type=float, default=40.0)
+    parser.add_argument('--corpus-size', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--out', help="Write results JSON here")
+    parser.add_argument('--baseline', help="Compare against a previous results JSON")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save-baseline', action='store_true', help="Write results to --baseline instead")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    rng = random.Random(args.seed)
+    documents = build_documents(args.corpus_size, args.seed)
+    images = make_images(args.corpus_size, args.seed) if 'ocr_remote' in names else []
+    if 'ocr_remote' in names and not images:
+        print("Skipping ocr_remote: Pillow and NumPy are needed to build screenshots")
+        names.remove('ocr_remote')
+
+    mock = MockConfig(args.llm_latency_ms, args.llm_tokens_per_second, args.llm_completion_tokens,
+                      args.llm_error_rate, seed=args.seed)
+    mock_server, llm_url = start_mock_server(mock)
+    state_dir = tempfile.mkdtemp(prefix='loadtest-')
+    process = None
+    try:
+        if args.url:
+            base = args.url.rstrip('/')
+        else:
+            process, base = start_app(llm_url, state_dir, args.workers, args.threads, args.ocr_latency_ms)
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "config": {k: v for k, v in vars(args).items() if k not in ('out', 'baseline', 'save_baseline')},
+            },
+            "scenarios": {}
+        }
+        for name in names:
+            call = make_requests(name, documents, images, rng)
+            # Warm-up: first-use costs (engine load, connections) stay out of the numbers
+            run_scenario(base, call, min(args.concurrency, 4), min(args.requests, 8))
+            result = run_scenario(base, call, args.concurrency, args.requests)
+            results["scenarios"][name] = result
+            print(f"{name:<14} {result['rps']:>8} req/s  p50 {result['p50_ms']} ms  p90 {result['p90_ms']} ms  "
+                  f"p99 {result['p99_ms']} ms  errors {result['errors']}", flush=True)
+        with mock.lock:
+            results["meta"]["mock_llm"] = dict(mock.counts)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        mock_server.shutdown()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import WORDS
+
+# OpenAI-compatible /chat/completions stand-in for Groq and Cerebras. Point
+# GROQ_API_URL / CEREBRAS_API_URL at it to benchmark without paid calls.
+
+class MockConfig:
+    def __init__(self, latency_ms=200.0, tokens_per_second=400.0, completion_tokens=120,
+                 error_rate=0.0, error_status=503, rate_limit_rate=0.0, seed=7,
+                 quota_requests=0, quota_tokens=0, quota_window=60.0):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0, "over_quota": 0}
+        # Groq-style quotas: buckets of quota_* that refill over quota_window
+        # seconds, reported in x-ratelimit-* headers on every response
+        self.quota_window = quota_window
+        self.quotas = {kind: [float(limit), float(limit)]
+                       for kind, limit in (("requests", quota_requests), ("tokens", quota_tokens)) if limit}
+        self.quota_updated = time.monotonic()
+
+    def charge(self, tokens):
+        # -> (allowed, headers, retry_after)
+        with self.lock:
+            now = time.monotonic()
+            for limit_level in self.quotas.values():
+                limit = limit_level[0]
+                limit_level[1] = min(limit, limit_level[1] + (now - self.quota_updated) * limit / self.quota_window)
+            self.quota_updated = now
+            costs = {"requests": 1, "tokens": tokens}
+            short = [kind for kind, (limit, level) in self.quotas.items() if level < min(costs[kind], limit)]
+            if not short:
+                for kind, limit_level in self.quotas.items():
+                    limit_level[1] -= min(costs[kind], limit_level[0])
+            else:
+                self.counts["over_quota"] += 1
+            headers, retry_after = {}, 0.0
+            for kind, (limit, level) in self.quotas.items():
+                rate = limit / self.quota_window
+                headers[f"x-ratelimit-limit-{kind}"] = str(int(limit))
+                headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, int(level)))
+                headers[f"x-ratelimit-reset-{kind}"] = f"{(limit - level) / rate:.2f}s"
+                if kind in short:
+                    retry_after = max(retry_after, (min(costs[kind], limit) - level) / rate)
+            return not short, headers, retry_after
+
+    def roll(self):
+        # -> None, "error" or "rate_limit" for one request
+        with self.lock:
+            self.counts["requests"] += 1
+            value = self.rng.random()
+            if value < self.rate_limit_rate:
+                self.counts["rate_limited"] += 1
+                return "rate_limit"
+            if value < self.rate_limit_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return "error"
+            return None
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                with config.lock:
+                    self.send_json(200, dict(config.counts))
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = self.rfile.read(length)
+                request = json.loads(body or b'{}')
+            except ValueError:
+                self.send_json(400, {"error": {"message": "invalid JSON"}})
+                return
+
+            prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in request.get('messages', []))
+            allowed, quota_headers, retry_after = config.charge(prompt_tokens + config.completion_tokens)
+            if not allowed:
+                quota_headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+                self.send_json(429, {"error": {"message": "quota exceeded"}}, quota_headers)
+                return
+
+            outcome = config.roll()
+            time.sleep(config.latency_ms / 1000.0)
+            if outcome == "rate_limit":
+                self.send_json(429, {"error": {"message": "rate limited"}}, dict(quota_headers, **{"Retry-After": "1"}))
+                return
+            if outcome == "error":
+                self.send_json(config.error_status, {"error": {"message": "injected failure"}}, quota_headers)
+                return
+
+            # Word salad rather than a repeated token, so compression ratios stay realistic
+            rng = random.Random(len(body))
+            tokens = [rng.choice(WORDS) + " " for _ in range(config.completion_tokens)]
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                     "total_tokens": prompt_tokens + len(tokens)}
+            model = request.get('model', 'mock')
+
+            if not request.get('stream'):
+                time.sleep(len(tokens) / config.tokens_per_second)
+                self.send_json(200, {
+                    "id": "mock", "object": "chat.completion", "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                                 "finish_reason": "stop"}],
+                    "usage": usage
+                }, quota_headers)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            for name, value in quota_headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            delay = 1.0 / config.tokens_per_second
+            for token in tokens:
+                chunk = {"id": "mock", "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": token}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(delay)
+            final = {"id": "mock", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+class MockServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 resets bursts of new connections
+    request_queue_size = 256
+
+def start_mock_server(config, host='127.0.0.1', port=0):
+    # Returns (server, base_url); the server runs on a daemon thread
+    server = MockServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mock-llm', daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock LLM server")
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency-ms', type=float, default=200.0, help="Delay before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=400.0)
+    parser.add_argument('--completion-tokens', type=int, default=120)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--quota-requests', type=int, default=0, help="Requests per --quota-window (0: unlimited)")
+    parser.add_argument('--quota-tokens', type=int, default=0, help="Tokens per --quota-window (0: unlimited)")
+    parser.add_argument('--quota-window', type=float, default=60.0)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.tokens_per_second, args.completion_tokens,
+                        args.error_rate, args.error_status, args.rate_limit_rate, args.seed,
+                        args.quota_requests, args.quota_tokens, args.quota_window)
+    server, url = start_mock_server(config, port=args.port)
+    print(f"Mock LLM listening on {url}/chat/completions")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import difflib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+from image_preprocess import ImagePreprocessor
+
+WORDS = ("python flask provider latency request session resume interview candidate system design "
+         "database index query cache thread process queue worker stream token model context "
+         "deploy docker server client retry timeout budget metric").split()
+
+def load_font(size):
+    for name in ("DejaVuSans.ttf", "Arial.ttf", "arial.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+def make_screenshot(rng, width=1280, height=720):
+    # One synthetic capture: a few lines of text in a random size and theme,
+    # or (sometimes) an empty panel. Returns (png_bytes, expected_text).
+    dark = rng.random() < 0.3
+    background = rng.randint(20, 45) if dark else rng.randint(225, 255)
+    ink = rng.randint(200, 240) if dark else rng.randint(0, 60)
+    image = Image.new('L', (width, height), background)
+    if rng.random() < 0.15:
+        return encode(image), ""
+
+    size = rng.choice((14, 18, 24, 36, 56, 80))
+    font = load_font(size)
+    draw = ImageDraw.Draw(image)
+    lines = []
+    y = rng.randint(10, 80)
+    while y + size * 1.5 < height and len(lines) < 6:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        draw.text((rng.randint(10, 120), y), line, fill=ink, font=font)
+        lines.append(line)
+        y += int(size * 1.6)
+    return encode(image), "\n".join(lines)
+
+def encode(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def build_corpus(count, seed, repeat_ratio):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        if corpus and rng.random() < repeat_ratio:
+            # Users re-select the same region; model that as an exact repeat
+            corpus.append(rng.choice(corpus))
+        else:
+            corpus.append(make_screenshot(rng))
+    return corpus
+
+def similarity(expected, actual):
+    normalize = lambda s: " ".join(s.lower().split())
+    return difflib.SequenceMatcher(None, normalize(expected), normalize(actual)).ratio()
+
+def load_engine():
+    try:
+        from ocr.ocr_engine import OCREngine
+        return OCREngine()
+    except Exception as e:
+        print(f"OCR engine unavailable ({e}); measuring preprocessing only", file=sys.stderr)
+        return None
+
+def summarize(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2)
+    }
+
+def run(args):
+    corpus = build_corpus(args.count, args.seed, args.repeat_ratio)
+    engine = None if args.no_engine else load_engine()
+    preprocessor = ImagePreprocessor(target_text_height=args.target_height, cache_entries=args.count)
+
+    report = {"corpus": len(corpus), "seed": args.seed}
+
+    prepare_times = []
+    for image_bytes, _ in corpus:
+        start = time.perf_counter()
+        preprocessor.prepare(image_bytes)
+        prepare_times.append(time.perf_counter() - start)
+    report["preprocess"] = summarize(prepare_times)
+
+    if engine is not None:
+        for label, recognize in (
+            ("raw", lambda b: engine.extract_text_from_image(b)),
+            ("preprocessed", lambda b: preprocessor.recognize(b, engine)),
+        ):
+            latencies, scores = [], []
+            for image_bytes, expected in corpus:
+                start = time.perf_counter()
+                text, _ = recognize(image_bytes)
+                latencies.append(time.perf_counter() - start)
+                scores.append(similarity(expected, text or ""))
+            report[label] = dict(summarize(latencies), accuracy=round(statistics.mean(scores), 4))
+
+    report["preprocessor"] = preprocessor.stats()
+    print(json.dumps(report, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and accuracy of OCR preprocessing on synthetic screenshots")
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--repeat-ratio', type=float, default=0.2)
+    parser.add_argument('--target-height', type=int, default=32)
+    parser.add_argument('--no-engine', action='store_true', help="Skip OCR and time preprocessing only")
+    run(parser.parse_args())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_ocr import FakeOCREngine
+from worker_throughput import ROOT
+
+sys.path.insert(0, ROOT)
+from ocr_scheduler import OCRBatchScheduler
+
+# Closed-loop load on OCRBatchScheduler alone (no HTTP): --clients threads
+# each submit distinct images back to back. Shows throughput and latency as
+# max_batch grows, with FakeOCREngine's batch cost model
+# (FAKE_OCR_BATCH_OVERHEAD_MS + FAKE_OCR_LATENCY_MS * n / 4):
+#   python benchmarks/ocr_scheduler_load.py --batch-sizes 1,2,4,8,16 --clients 32
+
+def run(max_batch, max_wait_ms, clients, per_client):
+    scheduler = OCRBatchScheduler(FakeOCREngine, max_queue=clients * 2, max_batch=max_batch,
+                                  max_wait=max_wait_ms / 1000.0)
+    scheduler.start()
+    scheduler.ready.wait()
+    latencies = []
+    lock = threading.Lock()
+
+    def client(n):
+        own = []
+        for i in range(per_client):
+            start = time.perf_counter()
+            scheduler.submit(f"image {n}-{i}".encode())
+            own.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stats = scheduler.stats()
+    batches = {int(k): v for k, v in stats["batch_sizes"].items()}
+    latencies.sort()
+    return {
+        "max_batch": max_batch,
+        "max_wait_ms": max_wait_ms,
+        "clients": clients,
+        "images_per_s": round(len(latencies) / elapsed, 1),
+        "avg_batch": round(sum(k * v for k, v in batches.items()) / sum(batches.values()), 2),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)], 1),
+        "queue_wait_avg_ms": stats["timings"]["queue_wait"]["avg_ms"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR batch scheduler throughput vs batch size")
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+    parser.add_argument('--max-wait-ms', type=float, default=20.0)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--per-client', type=int, default=8)
+    args = parser.parse_args()
+    for max_batch in (int(b) for b in args.batch_sizes.split(',')):
+        print(json.dumps(run(max_batch, args.max_wait_ms, args.clients, args.per_client)), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from worker_throughput import ROOT
+
+# /api/ocr latency paid per request by the one-shot subprocess path
+# (OCR_WORKER=off: `ui_bridge.py --ocr` per call) against the warm worker
+# (ocr_worker.OCRWorker). Both run the real code with FakeOCREngine standing
+# in for ocr.ocr_engine and a fixed image instead of the screen selection:
+#   python benchmarks/ocr_startup.py --requests 10 --engine-load-ms 1000
+
+IMAGE = b'\x89PNG fake capture'
+
+def install_fakes():
+    # Child side: the OCR package and the screen selector are desktop-only
+    sys.path.insert(0, ROOT)
+    from fake_ocr import FakeOCREngine
+    package = types.ModuleType('ocr')
+    engine_module = types.ModuleType('ocr.ocr_engine')
+    engine_module.OCREngine = FakeOCREngine
+    package.ocr_engine = engine_module
+    sys.modules.update({'ocr': package, 'ocr.ocr_engine': engine_module})
+    import ocr_worker
+    ocr_worker.select_and_capture = lambda: (IMAGE, None)
+    return ocr_worker
+
+def child(mode):
+    ocr_worker = install_fakes()
+    if mode == 'worker':
+        ocr_worker.serve()
+    else:
+        # What `ui_bridge.py --ocr` does, imports included
+        import ui_bridge
+        ui_bridge.run_ocr_process()
+
+def child_command(mode):
+    return [sys.executable, os.path.abspath(__file__), '--child', mode]
+
+def summary(name, timings):
+    timings = sorted(timings)
+    return {"path": name, "requests": len(timings), "p50_ms": round(statistics.median(timings), 1),
+            "min_ms": round(timings[0], 1), "max_ms": round(timings[-1], 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="One-shot OCR subprocess vs warm OCR worker latency")
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--engine-load-ms', type=float, default=1000.0, help="Fake engine load time")
+    parser.add_argument('--latency-ms', type=float, default=40.0, help="Fake recognition time per image")
+    parser.add_argument('--child', choices=('worker', 'oneshot'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    # ui_bridge writes its log and history next to the working directory
+    state_dir = tempfile.mkdtemp(prefix='ocr-startup-')
+    os.chdir(state_dir)
+    os.environ.update(FAKE_OCR_LOAD_MS=str(args.engine_load_ms), FAKE_OCR_LATENCY_MS=str(args.latency_ms),
+                      OCR_PREPROCESS='off', OCR_WORKER='off', CLOUD_MODE='true',
+                      CONVERSATION_DB=os.path.join(state_dir, 'conversations.db'),
+                      USER_CONFIG_FILE=os.path.join(state_dir, 'user_config.json'))
+    os.environ.pop('OCR_MODE', None)
+    try:
+        oneshot = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            result = subprocess.run(child_command('oneshot'), capture_output=True, text=True, check=True)
+            oneshot.append((time.perf_counter() - start) * 1000)
+            assert json.loads(result.stdout.strip().splitlines()[-1]).get('text'), result.stdout
+        print(json.dumps(summary('oneshot', oneshot)), flush=True)
+
+        sys.path.insert(0, ROOT)
+        from ocr_worker import OCRWorker
+        worker = OCRWorker(command=child_command('worker'))
+        try:
+            start = time.perf_counter()
+            assert worker.request('ocr').get('text')
+            first = (time.perf_counter() - start) * 1000
+            warm = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                assert worker.request('ocr').get('text')
+                warm.append((time.perf_counter() - start) * 1000)
+        finally:
+            worker.stop()
+        print(json.dumps(dict(summary('worker_warm', warm), first_request_ms=round(first, 1),
+                              engine_load_s=worker.load_seconds)), flush=True)
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm import MockConfig, start_mock_server
+
+# Bursty interactive + batch traffic against a mock upstream that enforces a
+# Groq-style quota, with the admission scheduler on and off. Providers keep
+# their default retry policy (a 429 is retried while its Retry-After is
+# within PROVIDER_RETRY_AFTER_MAX); the 429 count is what the upstream sent.
+
+def run(admission, args):
+    from providers.provider_manager import ProviderManager
+    from providers.errors import ProviderError
+
+    mock = MockConfig(latency_ms=args.latency_ms, tokens_per_second=5000, completion_tokens=50,
+                      quota_requests=args.quota_requests, quota_tokens=args.quota_tokens,
+                      quota_window=args.quota_window)
+    server, url = start_mock_server(mock)
+    os.environ.pop('PROVIDER_MAX_RETRIES', None)
+    os.environ.update(GROQ_API_KEY='bench', GROQ_API_URL=url + '/chat/completions', CURRENT_PROVIDER='groq',
+                      PROVIDER_ADMISSION='true' if admission else 'false',
+                      PROVIDER_COMPLETION_ESTIMATE='50')
+    manager = ProviderManager(os.path.join(ROOT, '.env.bench-unused'))
+
+    results = {"interactive": [], "batch": []}
+    failures = {"interactive": {}, "batch": {}}
+    lock = threading.Lock()
+    stop_at = time.time() + args.duration
+
+    def client(priority, think):
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                manager.chat([{"role": "user", "content": "hello " * 20}], priority)
+                with lock:
+                    results[priority].append(time.perf_counter() - start)
+            except ProviderError as e:
+                kind = getattr(e, 'errors', None) and e.errors[-1].kind or e.kind
+                with lock:
+                    failures[priority][kind] = failures[priority].get(kind, 0) + 1
+                time.sleep(0.2)
+            time.sleep(think)
+
+    threads = [threading.Thread(target=client, args=("interactive", args.think)) for _ in range(args.interactive)]
+    threads += [threading.Thread(target=client, args=("batch", 0.0)) for _ in range(args.batch)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    server.shutdown()
+
+    report = {"admission": admission, "upstream_429": mock.counts["over_quota"]}
+    for priority, latencies in results.items():
+        ordered = sorted(latencies)
+        report[priority] = {
+            "ok": len(ordered),
+            "failed": failures[priority],
+            "p50_ms": round(statistics.median(ordered) * 1000, 1) if ordered else None,
+            "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 1) if ordered else None
+        }
+    report["scheduler"] = manager.providers['groq'].limiter.snapshot()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Upstream 429s and queue wait with and without admission control")
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--interactive', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--think', type=float, default=1.0, help="Pause between interactive requests")
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--quota-requests', type=int, default=30)
+    parser.add_argument('--quota-tokens', type=int, default=6000)
+    parser.add_argument('--quota-window', type=float, default=10.0)
+    args = parser.parse_args()
+
+    for admission in (False, True):
+        print(json.dumps(run(admission, args)), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_ocr import FakeOCREngine
+from loadtest import start_app
+from mock_llm import MockConfig, start_mock_server
+from ocr_preprocess import build_corpus
+from remote_transport import SlowLink
+from worker_throughput import ROOT
+
+sys.path.insert(0, ROOT)
+
+# Desktop OCR offloaded to cloud_server's /api/ocr_remote over a simulated
+# thin link. Compares uploading raw captures with the compact encodings, then
+# makes the server slow to show the local fallback bounding latency.
+
+def run(link, corpus, mode, timeout, preprocess=True):
+    from image_preprocess import ImagePreprocessor
+    from remote_ocr import RemoteOCRClient
+
+    client = RemoteOCRClient(link.url, timeout=timeout, image_format='webp' if mode == 'webp' else 'png')
+    if mode == 'raw':
+        # Pre-offload behaviour: the capture as it comes off the screen
+        client.encode = lambda image_bytes: (image_bytes, 'png')
+    preprocessor = ImagePreprocessor() if preprocess else None
+    engine = []
+
+    def local_engine():
+        if not engine:
+            engine.append(FakeOCREngine())
+        return engine[0]
+
+    latencies, fallbacks = [], 0
+    for image_bytes, _ in corpus:
+        timings = {}
+        start = time.perf_counter()
+        client.recognize(image_bytes, local_engine, preprocessor, timings)
+        latencies.append(time.perf_counter() - start)
+        fallbacks += 'fallback' in timings
+    client.close()
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 1),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 1),
+        "fallbacks": fallbacks,
+        "breaker": client.breaker.snapshot()["state"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Remote OCR upload size and latency over a slow link")
+    parser.add_argument('--captures', type=int, default=30)
+    parser.add_argument('--repeat-ratio', type=float, default=0.0)
+    parser.add_argument('--bandwidth-kbps', type=float, default=2000.0)
+    parser.add_argument('--latency-ms', type=float, default=40.0, help="One-way delay")
+    parser.add_argument('--ocr-latency-ms', type=float, default=40.0, help="Cloud engine time per image")
+    parser.add_argument('--slow-ocr-latency-ms', type=float, default=8000.0,
+                        help="Cloud engine time per image in the slow run (batched images cost a quarter)")
+    parser.add_argument('--timeout', type=float, default=1.0, help="OCR_REMOTE_TIMEOUT for the slow run")
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    from PIL import features
+
+    corpus = build_corpus(args.captures, args.seed, args.repeat_ratio)
+    mock_server, llm_url = start_mock_server(MockConfig())
+    runs = [("raw", False, args.ocr_latency_ms), ("gray", False, args.ocr_latency_ms),
+            ("png", True, args.ocr_latency_ms)]
+    if features.check('webp'):
+        runs.append(("webp", True, args.ocr_latency_ms))
+    runs.append(("png-slow-server", True, args.slow_ocr_latency_ms))
+    try:
+        for name, preprocess, ocr_latency in runs:
+            state_dir = tempfile.mkdtemp(prefix='remote-ocr-')
+            os.environ['OCR_PREPROCESS'] = 'on' if preprocess else 'off'
+            process, base = start_app(llm_url, state_dir, 1, 8, ocr_latency)
+            link = SlowLink(('127.0.0.1', int(base.rsplit(':', 1)[1])), args.bandwidth_kbps, args.latency_ms)
+            try:
+                timeout = args.timeout if name.endswith('slow-server') else 30.0
+                report = run(link, corpus, name.split('-')[0], timeout, preprocess)
+                print(json.dumps(dict({"mode": name, "captures": len(corpus), "bytes_up": link.counts["up"],
+                                       "connections": link.counts["connections"]}, **report)), flush=True)
+            finally:
+                link.close()
+                process.terminate()
+                process.wait()
+                shutil.rmtree(state_dir, ignore_errors=True)
+    finally:
+        mock_server.shutdown()
+
+if __name__ == '__main__':
+    main()
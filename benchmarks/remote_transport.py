@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus import make_resume_text
+from loadtest import start_app
+from mock_llm import MockConfig, start_mock_server
+from worker_throughput import ROOT
+
+sys.path.insert(0, ROOT)
+
+# RemoteProvider -> cloud_server over a simulated thin link: a TCP proxy that
+# adds one-way latency and caps bandwidth, and counts bytes and connections.
+# Compares the old transport (a new connection and the full history on every
+# turn, plain JSON) with the session protocol at each compression setting.
+
+class SlowLink:
+    def __init__(self, target, bandwidth_kbps, latency_ms):
+        self.target = target
+        self.bytes_per_second = bandwidth_kbps * 1000 / 8.0
+        self.latency = latency_ms / 1000.0
+        self.counts = {"up": 0, "down": 0, "connections": 0}
+        self._lock = threading.Lock()
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(64)
+        self.url = f"http://127.0.0.1:{self.listener.getsockname()[1]}"
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            with self._lock:
+                self.counts["connections"] += 1
+            threading.Thread(target=self._pump, args=(client, upstream, "up"), daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, client, "down"), daemon=True).start()
+
+    def _pump(self, src, dst, direction):
+        last = 0.0
+        try:
+            while True:
+                data = src.recv(16384)
+                if not data:
+                    break
+                # A new burst pays the one-way delay, every byte pays bandwidth
+                if time.monotonic() - last > self.latency:
+                    time.sleep(self.latency)
+                time.sleep(len(data) / self.bytes_per_second)
+                dst.sendall(data)
+                last = time.monotonic()
+                with self._lock:
+                    self.counts[direction] += len(data)
+        except OSError:
+            pass
+        finally:
+            try:
+                dst.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    def reset(self):
+        with self._lock:
+            self.counts = {"up": 0, "down": 0, "connections": 0}
+
+    def close(self):
+        self.listener.close()
+
+def conversation(turns, seed):
+    # -> (resume, questions): the UI sends the same resume with every question
+    rng = random.Random(seed)
+    return make_resume_text(rng, words=300), [f"How should I answer interview question {i}?" for i in range(turns)]
+
+def ui_message(resume, question):
+    # The bundled UI's message form (its template escapes the newlines)
+    return f"[CANDIDATE RESUME]: {resume}\\n\\n[QUESTION]: {question}"
+
+def run_legacy(link, resume, questions):
+    # Pre-session transport, shaped like the UI: full history with the plain
+    # question appended, plain JSON, one connection per turn
+    history, latencies = [], []
+    for question in questions:
+        history.append({"role": "user", "content": question})
+        start = time.perf_counter()
+        response = requests.post(link.url + '/api/chat', json={"messages": history, "message": ui_message(resume, question)},
+                                 headers={"Accept-Encoding": "identity", "Connection": "close"}, timeout=120)
+        latencies.append(time.perf_counter() - start)
+        history.append({"role": "assistant", "content": response.json()["response"]})
+    return latencies
+
+def run_provider(link, resume, questions, compression):
+    from providers.remote_provider import RemoteProvider
+
+    os.environ['REMOTE_COMPRESSION'] = compression
+    provider = RemoteProvider(link.url)
+    history, latencies = [], []
+    for question in questions:
+        history.append({"role": "user", "content": question})
+        # What the local bridge hands the provider for a UI request
+        messages = [{"role": "system", "content": "system"}] + history + \
+            [{"role": "user", "content": ui_message(resume, question)}]
+        start = time.perf_counter()
+        answer = provider.chat(messages)
+        latencies.append(time.perf_counter() - start)
+        history.append({"role": "assistant", "content": answer})
+    provider.close()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="RemoteProvider payload size and round trips over a slow link")
+    parser.add_argument('--turns', type=int, default=8)
+    parser.add_argument('--bandwidth-kbps', type=float, default=512.0)
+    parser.add_argument('--latency-ms', type=float, default=80.0, help="One-way delay")
+    parser.add_argument('--completion-tokens', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="gunicorn workers; 0 uses the Werkzeug server, which cannot keep connections alive")
+    args = parser.parse_args()
+
+    from http_compression import supported_encodings
+
+    mock = MockConfig(latency_ms=20, tokens_per_second=100000, completion_tokens=args.completion_tokens)
+    mock_server, llm_url = start_mock_server(mock)
+    state_dir = tempfile.mkdtemp(prefix='transport-')
+    process, base = start_app(llm_url, state_dir, args.workers, 8, 10)
+    port = int(base.rsplit(':', 1)[1])
+    link = SlowLink(('127.0.0.1', port), args.bandwidth_kbps, args.latency_ms)
+    resume, questions = conversation(args.turns, args.seed)
+
+    modes = [("legacy", None), ("off", "off"), ("gzip", "gzip")]
+    if 'zstd' in supported_encodings():
+        modes.append(("zstd", "zstd"))
+    modes.append(("auto", "auto"))
+    try:
+        for name, compression in modes:
+            link.reset()
+            if compression is None:
+                latencies = run_legacy(link, resume, questions)
+            else:
+                latencies = run_provider(link, resume, questions, compression)
+            counts = dict(link.counts)
+            print(json.dumps({
+                "mode": name,
+                "turns": len(latencies),
+                "bytes_up": counts["up"],
+                "bytes_down": counts["down"],
+                "connections": counts["connections"],
+                "rtt_mean_ms": round(statistics.mean(latencies) * 1000, 1),
+                "rtt_last_ms": round(latencies[-1] * 1000, 1)
+            }), flush=True)
+    finally:
+        link.close()
+        process.terminate()
+        process.wait()
+        mock_server.shutdown()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
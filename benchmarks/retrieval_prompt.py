@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus import make_resume_text
+from worker_throughput import ROOT
+
+# Prompt size with and without resume retrieval, by resume length. Questions
+# are sent in the UI's "[CANDIDATE RESUME]: ... [QUESTION]: ..." form through
+# ui_bridge.apply_retrieval, with the RETRIEVAL_* settings from the
+# environment:
+#   python benchmarks/retrieval_prompt.py --words 150,300,400,450,600,1000,3000
+
+QUESTIONS = (
+    "What experience does the candidate have with kafka and redis?",
+    "Tell me about a project where they reduced latency.",
+    "Which cloud platforms have they deployed to?",
+    "Describe their leadership and mentoring.",
+    "How strong is their frontend work in react and typescript?",
+    "What would you ask them about incident response?",
+)
+
+def load_bridge():
+    # ui_bridge keeps its state next to the working directory
+    state_dir = tempfile.mkdtemp(prefix='retrieval-prompt-')
+    os.environ.update(CLOUD_MODE='true', OCR_WORKER='off',
+                      CONVERSATION_DB=os.path.join(state_dir, 'conversations.db'),
+                      USER_CONFIG_FILE=os.path.join(state_dir, 'user_config.json'))
+    os.chdir(state_dir)
+    sys.path.insert(0, ROOT)
+    import ui_bridge
+    from context_window import estimate_tokens
+    return ui_bridge, estimate_tokens
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens and retrieval overhead by resume length")
+    parser.add_argument('--words', default='150,300,400,450,600,1000,3000')
+    parser.add_argument('--resumes', type=int, default=20, help="Resumes per length")
+    args = parser.parse_args()
+    ui_bridge, estimate_tokens = load_bridge()
+
+    rng = random.Random(7)
+    for words in (int(w) for w in args.words.split(',')):
+        full, sent, cold, warm, reduced = [], [], [], [], 0
+        for _ in range(args.resumes):
+            resume = make_resume_text(rng, words)
+            for i, question in enumerate(QUESTIONS):
+                message = f"[CANDIDATE RESUME]: {resume}\n\n[QUESTION]: {question}"
+                start = time.perf_counter()
+                out, _ = ui_bridge.apply_retrieval(message)
+                (cold if i == 0 else warm).append((time.perf_counter() - start) * 1000)
+                full.append(estimate_tokens(message))
+                sent.append(estimate_tokens(out))
+                reduced += out != message
+        print(json.dumps({
+            "resume_words": words,
+            "full_tokens": round(statistics.mean(full)),
+            "sent_tokens": round(statistics.mean(sent)),
+            "change_pct": round(100 * (sum(sent) / sum(full) - 1), 1),
+            "max_change_pct": round(100 * max(s / f - 1 for s, f in zip(sent, full)), 1),
+            "reduced_share": round(reduced / len(full), 2),
+            "index_ms": round(statistics.median(cold), 3),
+            "warm_ms": round(statistics.median(warm), 3)
+        }), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workers, threads, state_dir):
+    port = free_port()
+    env = dict(os.environ, STATE_DIR=state_dir, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               WEB_THREADS=str(threads), CLOUD_MODE='true')
+    # Keys from the developer's .env would make every worker start configured
+    env.pop('GROQ_API_KEY', None)
+    env.pop('CEREBRAS_API_KEY', None)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+         '--access-logfile', '/dev/null', 'cloud_server:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(base + '/api/check_setup', timeout=1)
+            return process, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("gunicorn did not start")
+
+def run_load(base, concurrency, duration):
+    # Mixed traffic: a settings read, a session write and a history read
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client():
+        session = requests.Session()
+        own, local = [], []
+        while time.time() < stop_at:
+            for method, path, body in (
+                ('GET', '/api/check_setup', None),
+                ('POST', '/api/sessions', {"title": "bench"}),
+                ('GET', f"/api/sessions/{own[-1]}/messages" if own else '/api/sessions', None),
+            ):
+                start = time.perf_counter()
+                try:
+                    response = session.request(method, base + path, json=body, timeout=10)
+                    if response.status_code >= 400:
+                        raise requests.HTTPError(response.status_code)
+                    if path == '/api/sessions' and method == 'POST':
+                        own.append(response.json()["id"])
+                    local.append(time.perf_counter() - start)
+                except (requests.RequestException, ValueError, KeyError):
+                    with lock:
+                        errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(statistics.median(ordered) * 1000, 2) if ordered else None,
+        "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 2) if ordered else None
+    }
+
+def check_shared_setup(base, samples=40, wait=2.0):
+    # Configure a provider through one worker, then ask every worker
+    requests.post(base + '/api/setup', json={"provider": "groq", "api_key": "bench-key"}, timeout=10)
+    time.sleep(wait)
+    seen = sum(
+        not requests.get(base + '/api/check_setup', timeout=10).json().get('setup_required')
+        for _ in range(samples)
+    )
+    return {"configured_responses": seen, "samples": samples}
+
+def main():
+    parser = argparse.ArgumentParser(description="Request throughput of cloud_server as gunicorn workers grow")
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    report = []
+    for workers in [int(w) for w in args.workers.split(',')]:
+        state_dir = tempfile.mkdtemp(prefix='bench-state-')
+        process, base = start_server(workers, args.threads, state_dir)
+        try:
+            result = dict(workers=workers, **run_load(base, args.concurrency, args.duration))
+            result["shared_setup"] = check_shared_setup(base)
+            report.append(result)
+            print(json.dumps(result), flush=True)
+        finally:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+    baseline = report[0]["rps"] or 1
+    for result in report:
+        print(f"{result['workers']:>2} workers: {result['rps']:>8} req/s  x{result['rps'] / baseline:.2f}  "
+              f"p95 {result['p95_ms']} ms  errors {result['errors']}  "
+              f"shared setup {result['shared_setup']['configured_responses']}/{result['shared_setup']['samples']}")
+
+if __name__ == '__main__':
+    main()
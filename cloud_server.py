@@ -7,17 +7,34 @@ os.environ['CLOUD_MODE'] = 'true'
 # Set cloud mode flag
 os.environ['CLOUD_MODE'] = 'true'
 
-from ui_bridge import app
+from subsystems import startup
+
+with startup.stage("import:ui_bridge"):
+    from ui_bridge import app, profile_startup
 from flask import request, jsonify
-import base64
-import io
+from concurrent.futures import TimeoutError as FutureTimeout
+from ocr_scheduler import QueueFullError
+from ocr_service import OCRServiceClient, scheduler_from_env
+from document_ingest import in_worker_process
+from metrics import registry as metrics_registry, Gauge
 
-# Initialize OCR Engine lazily
-ocr_engine = None
+# Inference runs on one scheduler thread in micro-batches; the engine is
+# loaded at startup instead of inside the first user request. Under gunicorn
+# the scheduler lives in the one OCR service process (OCR_SERVICE_URL) shared
+# by every worker. Spawned ingestion workers re-import `python cloud_server.py`
+# as __mp_main__ and must not set up a scheduler or load an engine.
+if not in_worker_process():
+    with startup.stage("init:ocr_scheduler"):
+        if os.environ.get("OCR_SERVICE_URL"):
+            ocr_scheduler = OCRServiceClient(os.environ["OCR_SERVICE_URL"])
+        else:
+            ocr_scheduler = scheduler_from_env()
+            ocr_scheduler.start()
+    metrics_registry.register(Gauge("ocr_queue_depth", "Cloud OCR requests waiting for inference",
+                                    callback=lambda: ocr_scheduler.stats()["queue_depth"]))
 
 @app.route('/api/ocr_remote', methods=['POST'])
 def ocr_remote():
-    global ocr_engine
     try:
         if 'image' not in request.files:
             return jsonify({"error": "No image provided"}), 400
@@ -25,19 +42,32 @@ def ocr_remote():
         file = request.files['image']
         image_bytes = file.read()
         
-        if not ocr_engine:
-            print("Loading Cloud OCR Engine...")
-            from ocr.ocr_engine import OCREngine
-            ocr_engine = OCREngine()
-            
-        text, method = ocr_engine.extract_text_from_image(image_bytes)
+        text, method = ocr_scheduler.submit(image_bytes, timeout=float(os.environ.get("OCR_TIMEOUT", 60)))
         return jsonify({"text": text, "method": f"Cloud {method}"})
         
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except FutureTimeout:
+        return jsonify({"error": "OCR timed out"}), 504
     except Exception as e:
         print(f"Cloud OCR Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/ocr_remote/stats', methods=['GET'])
+def ocr_remote_stats():
+    return jsonify(ocr_scheduler.stats())
+
 if __name__ == "__main__":
-    # Run with Gunicorn/Waitress in production, but for now standard run
+    if '--profile-startup' in sys.argv:
+        profile_startup()
+        sys.exit(0)
     port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port)
+    if '--asgi' in sys.argv or os.environ.get('ASGI_MODE'):
+        # Event-loop serving: upstream chat calls no longer pin a thread each
+        import asgi_server
+        asgi_server.run(app, host='0.0.0.0', port=port)
+    else:
+        # Single process, and Werkzeug closes the connection after every
+        # response; production runs several keep-alive workers with
+        # `gunicorn -c gunicorn.conf.py cloud_server:app`
+        app.run(host='0.0.0.0', port=port)
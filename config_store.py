@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class ConfigStore:
+    # user_config.json held in memory. update() merges into a pending set
+    # under a lock; a writer thread coalesces bursts of updates into one
+    # atomic write (temp file + os.replace) and each caller waits for the
+    # write that contains its change. Writes re-read the file first if it
+    # changed on disk (another process, a hand edit), so pending keys are
+    # applied on top of it instead of clobbering it.
+
+    def __init__(self, path, write_delay=0.05):
+        self.path = path
+        self.write_delay = write_delay
+        self._base = {}
+        self._signature = None
+        self._pending = {}
+        self._generation = 0
+        self._written = 0
+        self._error = None
+        self._failed = 0
+        self._lock = threading.Lock()
+        self._written_cond = threading.Condition(self._lock)
+        self._dirty = threading.Event()
+        self._writer = None
+        self.writes = 0
+        self._reload_if_changed()
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print(f"Config file {self.path} is not valid JSON, ignoring it: {e}")
+            return {}
+
+    def _reload_if_changed(self):
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return
+        data = self._read_file()
+        with self._lock:
+            self._base = data
+            self._signature = signature
+
+    def load(self):
+        # One stat per call; the file is only re-read when it changed
+        self._reload_if_changed()
+        with self._lock:
+            return dict(self._base, **self._pending)
+
+    def update(self, changes, wait=True, timeout=10.0):
+        with self._lock:
+            self._pending.update(changes)
+            self._generation += 1
+            generation = self._generation
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='config-writer', daemon=True)
+                self._writer.start()
+        self._dirty.set()
+        if wait:
+            self.flush(generation, timeout)
+        return self.load()
+
+    def flush(self, generation=None, timeout=10.0):
+        with self._lock:
+            generation = self._generation if generation is None else generation
+            # Only a failed write that covered this generation ends the wait;
+            # updates made after it wait for the retry
+            done = lambda: self._written >= generation or self._failed >= generation
+            if not self._written_cond.wait_for(done, timeout):
+                raise TimeoutError("Config write timed out")
+            if self._written < generation:
+                raise self._error
+
+    def _write_loop(self):
+        while True:
+            self._dirty.wait()
+            # Let the rest of a burst arrive so it shares one write
+            time.sleep(self.write_delay)
+            self._dirty.clear()
+            with self._lock:
+                attempted = self._generation
+            try:
+                self._write()
+            except Exception as e:
+                print(f"Config write failed: {e}")
+                with self._lock:
+                    self._error = e
+                    self._failed = attempted
+                    self._written_cond.notify_all()
+                time.sleep(1.0)
+                self._dirty.set()
+
+    def _write(self):
+        lock_file = open(self.path + '.lock', 'a') if fcntl else None
+        try:
+            if lock_file:
+                # Serializes writers across worker processes
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._reload_if_changed()
+            with self._lock:
+                pending = dict(self._pending)
+                generation = self._generation
+                document = dict(self._base, **pending)
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            temp_path = os.path.join(directory, f".{os.path.basename(self.path)}.{os.getpid()}.tmp")
+            with open(temp_path, 'w') as f:
+                json.dump(document, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+
+            with self._lock:
+                self._base = document
+                self._signature = self._stat_signature()
+                for key, value in pending.items():
+                    # Keys updated again since the snapshot stay pending
+                    if key in self._pending and self._pending[key] is value:
+                        del self._pending[key]
+                self._written = generation
+                self._error = None
+                self.writes += 1
+                self._written_cond.notify_all()
+        finally:
+            if lock_file:
+                lock_file.close()
@@ -0,0 +1,128 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# Context sizes of the models the providers use
+MODEL_CONTEXT_TOKENS = {
+    "llama3-8b-8192": 8192,
+    "llama3.1-8b": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# Per-message framing the chat templates add around role and content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text):
+    # Llama-style BPE averages roughly 4 characters per token on English and
+    # at least one token per word or punctuation mark; take the larger of both
+    if not text:
+        return 0
+    return max(len(_WORD_RE.findall(text)), (len(text) + 3) // 4)
+
+def message_tokens(message):
+    return estimate_tokens(message.get('content') or '') + MESSAGE_OVERHEAD_TOKENS
+
+def _first_sentence(text, limit=160):
+    text = " ".join(text.split())
+    match = re.search(r"[.!?](\s|$)", text)
+    if match and match.end() <= limit:
+        return text[:match.end()].strip()
+    return text[:limit].rstrip() + ("..." if len(text) > limit else "")
+
+class ContextWindow:
+    # Keeps a chat prompt inside the model's context budget: the system prompt
+    # and the newest turns are always kept verbatim, older turns are folded
+    # into a rolling extractive summary that is itself capped.
+
+    def __init__(self, budgets=None, completion_reserve=1024, summary_tokens=512, max_summary_lines=4096):
+        self.budgets = dict(MODEL_CONTEXT_TOKENS, **(budgets or {}))
+        self.completion_reserve = completion_reserve
+        self.summary_tokens = summary_tokens
+        self.max_summary_lines = max_summary_lines
+        # Summary line and its token cost per dropped turn, keyed by the
+        # turn's own digest: as a session grows, its dropped prefix changes
+        # on every request but each turn's line is only built once
+        self._lines = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"lines_built": 0, "line_hits": 0}
+
+    def budget_for(self, model):
+        return self.budgets.get(model, DEFAULT_CONTEXT_TOKENS) - self.completion_reserve
+
+    def fit(self, messages, model=None, budget=None):
+        budget = budget or self.budget_for(model)
+        if not messages:
+            return messages
+
+        system = [m for m in messages[:1] if m.get('role') == 'system']
+        turns = messages[len(system):]
+        used = sum(message_tokens(m) for m in system)
+        total = used + sum(message_tokens(m) for m in turns)
+        if total <= budget:
+            return messages
+
+        # Walk back from the newest turn, keeping as many as fit while leaving
+        # room for the summary; the latest user message is always kept
+        summary_room = min(self.summary_tokens, max(0, budget // 4))
+        kept = []
+        for message in reversed(turns):
+            cost = message_tokens(message)
+            if kept and used + cost > budget - summary_room:
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+
+        dropped = turns[:len(turns) - len(kept)]
+        result = list(system)
+        if dropped:
+            summary = self.summarize(dropped, max(0, budget - used - MESSAGE_OVERHEAD_TOKENS))
+            if summary:
+                result.append({"role": "system", "content": summary})
+        return result + kept
+
+    def summary_line(self, message):
+        # -> (line, token cost)
+        role, content = message.get('role', 'user'), message.get('content') or ''
+        key = hashlib.sha256(f"{role}\x00{content}".encode('utf-8')).digest()
+        with self._lock:
+            entry = self._lines.get(key)
+            if entry is not None:
+                self._lines.move_to_end(key)
+                self.counters["line_hits"] += 1
+                return entry
+
+        line = f"- {role}: {_first_sentence(content)}"
+        entry = (line, estimate_tokens(line) + 1)
+        with self._lock:
+            self._lines[key] = entry
+            self.counters["lines_built"] += 1
+            while len(self._lines) > self.max_summary_lines:
+                self._lines.popitem(last=False)
+        return entry
+
+    def summarize(self, dropped, max_tokens):
+        if max_tokens <= 0:
+            return ""
+        # Newest dropped turns matter most, so fill the summary from the end;
+        # only the turns that fit are looked at
+        lines = []
+        used = estimate_tokens("Summary of earlier conversation:")
+        for m in reversed(dropped):
+            line, cost = self.summary_line(m)
+            if used + cost > max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        if not lines:
+            return ""
+        return "Summary of earlier conversation:\n" + "\n".join(reversed(lines))
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, cached_lines=len(self._lines))
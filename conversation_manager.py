@@ -1,27 +1,138 @@
+import atexit
 import json
 import os
+import threading
 from datetime import datetime
 
 class ConversationManager:
-    def __init__(self, storage_file='conversation_history.json'):
+    # History is stored as a snapshot (storage_file) plus an append-only JSONL
+    # journal next to it. add_message appends one line instead of rewriting
+    # the file; fsyncs are batched, and the journal is periodically compacted
+    # into a fresh snapshot. Every record carries a sequence number, so a crash
+    # between writing the snapshot and truncating the journal never replays a
+    # message twice.
+
+    def __init__(self, storage_file='conversation_history.json', fsync_every=32,
+                 fsync_interval=0.5, compact_every=1000):
         self.storage_file = storage_file
+        self.journal_file = storage_file + '.journal'
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+
         self.history = []
+        self.seq = 0
+        self._journal = None
+        self._journal_entries = 0
+        self._unsynced = 0
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+
         self.load_history()
 
+        # Background fsync for the tail of a burst that never reached fsync_every
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
     def load_history(self):
-        if os.path.exists(self.storage_file):
-            try:
-                with open(self.storage_file, 'r') as f:
-                    self.history = json.load(f)
-            except Exception:
-                self.history = []
+        with self._lock:
+            self.history = []
+            self.seq = 0
+            if os.path.exists(self.storage_file):
+                try:
+                    with open(self.storage_file, 'r') as f:
+                        snapshot = json.load(f)
+                    # Older versions stored a bare list
+                    if isinstance(snapshot, list):
+                        self.history = snapshot
+                    else:
+                        self.history = snapshot.get('history', [])
+                        self.seq = snapshot.get('seq', 0)
+                except Exception:
+                    self.history = []
+
+            self._journal_entries = self._replay_journal()
+            self._open_journal()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_file):
+            return 0
+        entries = 0
+        complete = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn final line from a crash mid-append
+                    break
+                complete += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                entries += 1
+                if record.get('seq', 0) <= self.seq:
+                    continue
+                self.seq = record['seq']
+                if record.get('op') == 'add':
+                    self.history.append(record['message'])
+        # Cut the torn tail off, or the next append would be glued onto it
+        # and lost on the following replay
+        if complete < os.path.getsize(self.journal_file):
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(complete)
+        return entries
+
+    def _open_journal(self):
+        if self._journal:
+            self._journal.close()
+        self._journal = open(self.journal_file, 'a', encoding='utf-8')
+
+    def _append(self, record):
+        self.seq += 1
+        record['seq'] = self.seq
+        self._journal.write(json.dumps(record) + '\n')
+        self._journal.flush()
+        self._journal_entries += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self._fsync()
+        # Compacting rewrites the whole snapshot, so wait for a journal at
+        # least as long as the snapshot; appends stay O(1) amortized
+        snapshot_entries = len(self.history) - self._journal_entries
+        if self._journal_entries >= max(self.compact_every, snapshot_entries):
+            self.save_history()
+
+    def _fsync(self):
+        if self._unsynced and self._journal:
+            os.fsync(self._journal.fileno())
+            self._unsynced = 0
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                try:
+                    self._fsync()
+                except Exception as e:
+                    print(f"Error syncing history journal: {e}")
 
     def save_history(self):
-        try:
-            with open(self.storage_file, 'w') as f:
-                json.dump(self.history, f, indent=2)
-        except Exception as e:
-            print(f"Error saving history: {e}")
+        # Compaction: atomically replace the snapshot, then start a new journal
+        with self._lock:
+            try:
+                temp_file = self.storage_file + '.tmp'
+                with open(temp_file, 'w') as f:
+                    json.dump({"seq": self.seq, "history": self.history}, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.storage_file)
+
+                self._journal.close()
+                self._journal = open(self.journal_file, 'w', encoding='utf-8')
+                self._journal_entries = 0
+                self._unsynced = 0
+            except Exception as e:
+                print(f"Error saving history: {e}")
 
     def add_message(self, role, content):
         message = {
@@ -29,13 +140,34 @@ class ConversationManager:
             "content": content,
             "timestamp": datetime.now().isoformat()
         }
-        self.history.append(message)
-        self.save_history()
+        with self._lock:
+            self.history.append(message)
+            try:
+                self._append({"op": "add", "message": message})
+            except Exception as e:
+                print(f"Error saving history: {e}")
         return message
 
     def get_history(self):
-        return self.history
+        with self._lock:
+            return list(self.history)
 
     def clear_history(self):
-        self.history = []
-        self.save_history()
+        with self._lock:
+            self.history = []
+            self.save_history()
+
+    def flush(self):
+        with self._lock:
+            self._fsync()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._lock:
+            try:
+                self._fsync()
+                self._journal.close()
+            except Exception:
+                pass
@@ -0,0 +1,375 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    title TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+MAX_PAGE_SIZE = 200
+
+class SessionConflict(Exception):
+    # The client's idea of the session version no longer matches the server's
+    def __init__(self, session_id, version):
+        super().__init__(f"Session {session_id} is at version {version}")
+        self.session_id = session_id
+        self.version = version
+
+def _session_row(row):
+    return {
+        "id": row["id"],
+        "user_id": row["user_id"],
+        "title": row["title"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "message_count": row["message_count"],
+        "version": row["version"]
+    }
+
+def _message_row(row):
+    return {
+        "id": row["id"],
+        "session_id": row["session_id"],
+        "role": row["role"],
+        "content": row["content"],
+        "created_at": row["created_at"]
+    }
+
+def _page_size(limit, default=50):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+class ConversationStore:
+    # Multi-session conversation storage in SQLite (WAL mode, one connection
+    # per thread). Messages are indexed by (session_id, id) for keyset
+    # pagination and mirrored into an FTS5 table for search; builds without
+    # FTS5 fall back to LIKE scans.
+
+    def __init__(self, db_path='conversations.db', retention_days=None, max_sessions=None,
+                 max_messages_per_session=None):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.max_sessions = max_sessions
+        self.max_messages_per_session = max_messages_per_session
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = [r["name"] for r in conn.execute("PRAGMA table_info(sessions)")]
+        if "version" not in columns:
+            # Databases created before session versioning
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            print("SQLite FTS5 not available, falling back to LIKE search")
+            self.fts = False
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # Sessions
+
+    def create_session(self, user_id=None, title=None, session_id=None):
+        now = time.time()
+        session_id = session_id or uuid.uuid4().hex
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (id, user_id, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, user_id, title, now, now)
+            )
+            conn.commit()
+        return self.get_session(session_id)
+
+    def get_session(self, session_id):
+        row = self._conn().execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return _session_row(row) if row else None
+
+    def list_sessions(self, user_id=None, limit=20, before=None):
+        # Newest first; pass the last page's smallest updated_at as `before`
+        query = "SELECT * FROM sessions WHERE 1=1"
+        params = []
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        if before is not None:
+            query += " AND updated_at < ?"
+            params.append(float(before))
+        query += " ORDER BY updated_at DESC LIMIT ?"
+        params.append(_page_size(limit, 20))
+        return [_session_row(r) for r in self._conn().execute(query, params)]
+
+    def delete_session(self, session_id):
+        with self._write_lock:
+            conn = self._conn()
+            cursor = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    # Messages
+
+    def add_message(self, session_id, role, content):
+        return self.add_messages(session_id, [{"role": role, "content": content}])[0]
+
+    def add_messages(self, session_id, messages):
+        # One transaction for the batch; creates the session on first use
+        now = time.time()
+        added = []
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?)",
+                    (session_id, now, now)
+                )
+                for m in messages:
+                    cursor = conn.execute(
+                        "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                        (session_id, m['role'], m['content'], now)
+                    )
+                    added.append({"id": cursor.lastrowid, "session_id": session_id, "role": m['role'],
+                                  "content": m['content'], "created_at": now})
+                conn.execute(
+                    "UPDATE sessions SET updated_at = ?, version = version + 1, "
+                    "message_count = message_count + ? WHERE id = ?",
+                    (now, len(messages), session_id)
+                )
+        return added
+
+    def get_history(self, session_id, limit=MAX_PAGE_SIZE * 5):
+        # Role/content pairs for prompt building, oldest first
+        rows = self._conn().execute(
+            "SELECT role, content FROM (SELECT id, role, content FROM messages WHERE session_id = ? "
+            "ORDER BY id DESC LIMIT ?) ORDER BY id ASC",
+            (session_id, limit)
+        ).fetchall()
+        return [{"role": r["role"], "content": r["content"]} for r in rows]
+
+    def append_turn(self, session_id, expected_version, messages, replace=False):
+        # Compare-and-swap append used by the /api/chat session protocol.
+        # Raises SessionConflict when another turn landed first; with
+        # replace=True the stored history is swapped for `messages` instead.
+        now = time.time()
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                # Take the write lock before reading the version so the check
+                # also holds against other worker processes
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                current = row["version"] if row else 0
+                if not replace and expected_version is not None and int(expected_version) != current:
+                    raise SessionConflict(session_id, current)
+                if not row:
+                    conn.execute(
+                        "INSERT INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?)",
+                        (session_id, now, now)
+                    )
+                if replace:
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    [(session_id, m['role'], m['content'], now) for m in messages]
+                )
+                conn.execute(
+                    "UPDATE sessions SET updated_at = ?, version = version + 1, message_count = "
+                    "(SELECT COUNT(*) FROM messages WHERE session_id = ?) WHERE id = ?",
+                    (now, session_id, session_id)
+                )
+                return current + 1
+
+    def get_messages(self, session_id, limit=50, before_id=None, after_id=None):
+        # Keyset pagination on the message id. Without a cursor the newest
+        # page is returned; results are always in chronological order.
+        limit = _page_size(limit)
+        conn = self._conn()
+        if after_id is not None:
+            rows = conn.execute(
+                "SELECT * FROM messages WHERE session_id = ? AND id > ? ORDER BY id ASC LIMIT ?",
+                (session_id, int(after_id), limit)
+            ).fetchall()
+            return [_message_row(r) for r in rows]
+
+        query = "SELECT * FROM messages WHERE session_id = ?"
+        params = [session_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(int(before_id))
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        rows = conn.execute(query, params).fetchall()
+        return [_message_row(r) for r in reversed(rows)]
+
+    def search(self, text, session_id=None, user_id=None, limit=20):
+        terms = text.split()
+        if not terms:
+            return []
+        limit = _page_size(limit, 20)
+        params = []
+        if self.fts:
+            # Quote every term so user input never reaches the FTS query syntax
+            match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+            query = ("SELECT m.*, snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet "
+                     "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                     "JOIN sessions s ON s.id = m.session_id WHERE messages_fts MATCH ?")
+            params.append(match)
+        else:
+            query = ("SELECT m.*, substr(m.content, 1, 120) AS snippet FROM messages m "
+                     "JOIN sessions s ON s.id = m.session_id WHERE 1=1")
+            for t in terms:
+                query += " AND m.content LIKE ?"
+                params.append(f"%{t}%")
+        if session_id is not None:
+            query += " AND m.session_id = ?"
+            params.append(session_id)
+        if user_id is not None:
+            query += " AND s.user_id = ?"
+            params.append(user_id)
+        query += " ORDER BY rank LIMIT ?" if self.fts else " ORDER BY m.id DESC LIMIT ?"
+        params.append(limit)
+
+        results = []
+        for row in self._conn().execute(query, params):
+            item = _message_row(row)
+            item["snippet"] = row["snippet"]
+            results.append(item)
+        return results
+
+    # Retention
+
+    def prune(self, retention_days=None, max_sessions=None, max_messages_per_session=None):
+        retention_days = retention_days if retention_days is not None else self.retention_days
+        max_sessions = max_sessions if max_sessions is not None else self.max_sessions
+        max_messages = max_messages_per_session if max_messages_per_session is not None else self.max_messages_per_session
+        removed = {"sessions": 0, "messages": 0}
+
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                if retention_days:
+                    cutoff = time.time() - float(retention_days) * 86400
+                    cursor = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+                    removed["sessions"] += cursor.rowcount
+
+                if max_sessions:
+                    cursor = conn.execute(
+                        "DELETE FROM sessions WHERE id NOT IN "
+                        "(SELECT id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+                        (int(max_sessions),)
+                    )
+                    removed["sessions"] += cursor.rowcount
+
+                if max_messages:
+                    over = conn.execute(
+                        "SELECT id FROM sessions WHERE message_count > ?", (int(max_messages),)
+                    ).fetchall()
+                    for row in over:
+                        cursor = conn.execute(
+                            "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                            "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                            (row["id"], row["id"], int(max_messages))
+                        )
+                        removed["messages"] += cursor.rowcount
+                        # The history changed under any client holding the
+                        # old version, so its next append gets a 409
+                        conn.execute(
+                            "UPDATE sessions SET version = version + 1, message_count = "
+                            "(SELECT COUNT(*) FROM messages WHERE session_id = ?) WHERE id = ?",
+                            (row["id"], row["id"])
+                        )
+        return removed
+
+    def start_pruning(self, interval):
+        # Apply the retention limits at startup and then every `interval`
+        # seconds, so the database stays bounded without calls to /prune
+        if not (self.retention_days or self.max_sessions or self.max_messages_per_session):
+            return None
+        self._stop_pruning = threading.Event()
+
+        def loop():
+            while True:
+                try:
+                    removed = self.prune()
+                    if removed["sessions"] or removed["messages"]:
+                        print(f"Pruned conversations: {removed}")
+                except Exception as e:
+                    print(f"Error pruning conversations: {e}")
+                if not interval or self._stop_pruning.wait(interval):
+                    return
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def stop_pruning(self):
+        stop = getattr(self, '_stop_pruning', None)
+        if stop is not None:
+            stop.set()
+
+def store_from_env():
+    def env_int(name):
+        value = os.getenv(name)
+        return int(value) if value else None
+
+    store = ConversationStore(
+        db_path=os.getenv('CONVERSATION_DB', 'conversations.db'),
+        retention_days=env_int('CONVERSATION_RETENTION_DAYS'),
+        max_sessions=env_int('CONVERSATION_MAX_SESSIONS'),
+        max_messages_per_session=env_int('CONVERSATION_MAX_MESSAGES_PER_SESSION')
+    )
+    # Seconds between automatic prunes; 0 prunes once at startup only
+    interval = env_int('CONVERSATION_PRUNE_INTERVAL')
+    store.start_pruning(3600 if interval is None else interval)
+    return store
@@ -0,0 +1,204 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx')
+
+class IngestError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def in_worker_process():
+    # True in a spawned pool worker, already while it re-imports the parent's
+    # main module as __mp_main__ to unpickle its first task (parent_process()
+    # is only set after that)
+    return multiprocessing.current_process().name != 'MainProcess'
+
+# Worker process side: the last PDF opened, as (path, reader). Page ranges
+# of one document usually land on the same worker, which then parses the
+# file once instead of once per range.
+_worker_reader = (None, None)
+
+def _extract_pdf_pages(path, start, end):
+    # Runs in a worker process: extract a page range from the spooled PDF
+    global _worker_reader
+    import PyPDF2
+    if _worker_reader[0] != path:
+        _worker_reader = (path, PyPDF2.PdfReader(path))
+    reader = _worker_reader[1]
+    return start, [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+class DocumentIngestor:
+    # Extracts text from uploaded resumes and portfolios. Limits are enforced
+    # before any parsing, PDF pages are extracted in parallel in a process
+    # pool, and results are cached by content hash so re-uploading the same
+    # file costs one dictionary lookup.
+
+    def __init__(self, max_bytes=20 * 1024 * 1024, max_pages=200, workers=None,
+                 pages_per_task=8, cache_entries=64, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.workers = (os.cpu_count() or 2) if workers is None else workers
+        self.pages_per_task = pages_per_task
+        self.cache_entries = cache_entries
+        self.cache_dir = cache_dir
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Never fork the server: it runs request, scheduler and flusher
+                # threads whose locks a forked child would inherit mid-use
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    # Cache
+
+    @staticmethod
+    def content_key(data, extension):
+        return hashlib.sha256(extension.encode() + b'\0' + data).hexdigest()
+
+    def _cache_get(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, key + '.txt')
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                self._cache_put(key, text, persist=False)
+                return text
+        return None
+
+    def _cache_put(self, key, text, persist=True):
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        if persist and self.cache_dir:
+            path = os.path.join(self.cache_dir, key + '.txt')
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, path)
+
+    # Extraction
+
+    def ingest(self, data, filename):
+        text = None
+        for event in self.iter_ingest(data, filename):
+            if event.get('done'):
+                text = event['text']
+        return text
+
+    def iter_ingest(self, data, filename):
+        # Yields {"progress": done, "total": n} events and finally
+        # {"done": True, "text": ..., "cached": bool}. Raises IngestError.
+        extension = os.path.splitext(filename.lower())[1]
+        if extension not in SUPPORTED_EXTENSIONS:
+            raise IngestError("Unsupported file type. Please use PDF, DOCX, or TXT")
+        if len(data) > self.max_bytes:
+            raise IngestError(f"File too large ({len(data)} bytes, limit {self.max_bytes})", 413)
+
+        key = self.content_key(data, extension)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield {"done": True, "text": cached, "cached": True}
+            return
+
+        if extension == '.txt':
+            text = data.decode('utf-8', errors='ignore')
+        elif extension == '.docx':
+            text = self._extract_docx(data)
+        else:
+            text = None
+            for event in self._iter_pdf(data, key):
+                if 'pages' in event:
+                    text = "\n".join(event['pages'])
+                else:
+                    yield event
+
+        text = text.strip()
+        if not text:
+            raise IngestError("No text could be extracted from the file")
+        self._cache_put(key, text)
+        yield {"done": True, "text": text, "cached": False}
+
+    def _extract_docx(self, data):
+        try:
+            import docx
+            doc = docx.Document(io.BytesIO(data))
+            return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+        except Exception as e:
+            raise IngestError(f"DOCX parsing failed: {str(e)}", 500)
+
+    def _iter_pdf(self, data, key):
+        try:
+            import PyPDF2
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+            total = len(reader.pages)
+        except Exception as e:
+            raise IngestError(f"PDF parsing failed: {str(e)}", 500)
+        if total > self.max_pages:
+            raise IngestError(f"PDF has {total} pages, limit is {self.max_pages}", 413)
+
+        pages = [""] * total
+        try:
+            if self.workers <= 1 or total <= self.pages_per_task:
+                # Not worth a round trip to the pool
+                for i, page in enumerate(reader.pages):
+                    pages[i] = page.extract_text() or ""
+                    yield {"progress": i + 1, "total": total}
+            else:
+                # Workers read the file from disk instead of each task pickling
+                # the whole PDF; the content key in the name keeps a worker's
+                # cached reader from ever matching another document
+                fd, path = tempfile.mkstemp(prefix=f"ingest-{key}-", suffix='.pdf')
+                futures = []
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data)
+                    pool = self._get_pool()
+                    futures = [
+                        pool.submit(_extract_pdf_pages, path, start, min(start + self.pages_per_task, total))
+                        for start in range(0, total, self.pages_per_task)
+                    ]
+                    done = 0
+                    for future in as_completed(futures):
+                        start, texts = future.result()
+                        pages[start:start + len(texts)] = texts
+                        done += len(texts)
+                        yield {"progress": done, "total": total}
+                finally:
+                    for future in futures:
+                        future.cancel()
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        except IngestError:
+            raise
+        except Exception as e:
+            raise IngestError(f"PDF parsing failed: {str(e)}", 500)
+        yield {"pages": pages}
@@ -0,0 +1,95 @@
+# Multi-process serving for cloud_server:
+#   gunicorn -c gunicorn.conf.py cloud_server:app
+# Every worker is a separate process, so state that must agree between them
+# (provider keys and selection, conversations, retrieval indexes, caches,
+# saved settings)
+# is pointed at files under STATE_DIR before the workers import the app.
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+state_dir = os.getenv('STATE_DIR', 'state')
+os.makedirs(state_dir, exist_ok=True)
+for name, filename in (
+    ('SHARED_STATE_DB', 'shared_state.db'),
+    ('CONVERSATION_DB', 'conversations.db'),
+    ('RETRIEVAL_INDEX_DIR', 'retrieval'),
+    ('CHAT_CACHE_DIR', 'chat_cache'),
+    ('INGEST_CACHE_DIR', 'ingest_cache'),
+    ('USER_CONFIG_FILE', 'user_config.json'),
+):
+    os.environ.setdefault(name, os.path.join(state_dir, filename))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+# Requests mostly wait on upstream LLM calls, so each worker also runs threads
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', '8'))
+# Streaming chat responses can legitimately run for a while
+timeout = int(os.getenv('WEB_TIMEOUT', '120'))
+# Remote clients reuse one connection across chat turns; idle keep-alive
+# sockets wait in gthread's poller, not on a worker thread
+keepalive = int(os.getenv('WEB_KEEPALIVE', '75'))
+graceful_timeout = 30
+# Each worker builds its own thread pools and SQLite connections after the fork
+preload_app = False
+accesslog = '-'
+
+# Cloud OCR runs in one separate process (ocr_service.py) for all workers:
+# a model per worker would multiply memory by `workers`, and split the
+# traffic so each scheduler sees too few requests to batch. The master starts
+# it before forking, so every worker inherits OCR_SERVICE_URL, and restarts
+# it if it dies. OCR_SERVICE=off keeps an engine in each worker.
+ocr_service = {"process": None, "stopping": False}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _start_ocr_service(port):
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Own session: a Ctrl+C or group-wide SIGTERM reaches the master, which
+    # stops the service in on_exit instead of the watcher restarting it
+    return subprocess.Popen([sys.executable, os.path.join(here, 'ocr_service.py'), '--port', str(port),
+                             '--parent', str(os.getpid())], cwd=here, start_new_session=True)
+
+def _watch_ocr_service(port):
+    while not ocr_service["stopping"]:
+        code = ocr_service["process"].wait()
+        if ocr_service["stopping"]:
+            return
+        print(f"OCR service exited with code {code}, restarting")
+        time.sleep(1)
+        ocr_service["process"] = _start_ocr_service(port)
+
+def on_starting(server):
+    if os.getenv('OCR_SERVICE', 'on').lower() in ('0', 'off', 'false'):
+        return
+    port = int(os.getenv('OCR_SERVICE_PORT') or _free_port())
+    ocr_service["process"] = _start_ocr_service(port)
+    os.environ['OCR_SERVICE_URL'] = f"http://127.0.0.1:{port}"
+    # Workers may take OCR requests as soon as they boot; the engine itself
+    # keeps loading in the background and early requests wait in its queue
+    deadline = time.time() + 30
+    while time.time() < deadline and ocr_service["process"].poll() is None:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    threading.Thread(target=_watch_ocr_service, args=(port,), daemon=True).start()
+
+def on_exit(server):
+    ocr_service["stopping"] = True
+    process = ocr_service["process"]
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,138 @@
+import gzip
+import io
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Body compression shared by the cloud server and RemoteProvider. Responses
+# follow Accept-Encoding as usual; request bodies are only compressed once
+# the server has listed the codings it accepts in an Accept-Encoding
+# response header (RFC 7694), so older servers keep getting plain JSON.
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+class DecodeError(ValueError):
+    pass
+
+class BodyTooLarge(DecodeError):
+    pass
+
+def supported_encodings():
+    # In order of preference
+    return ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+def accept_encoding_header():
+    return ", ".join(supported_encodings())
+
+def choose_encoding(header):
+    # Best coding we support from an Accept-Encoding header, or None
+    offered = {}
+    for part in (header or '').split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name.strip():
+            offered[name.strip().lower()] = quality
+    for encoding in supported_encodings():
+        if offered.get(encoding, offered.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+def compress(data, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=int(os.getenv('HTTP_ZSTD_LEVEL', '3'))).compress(data)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=int(os.getenv('HTTP_GZIP_LEVEL', '6')), mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def decompress(data, encoding, max_size=None):
+    # Refuses output beyond max_size so a small body cannot expand unbounded
+    max_size = max_size or int(os.getenv('HTTP_MAX_DECODED_BYTES', str(16 * 1024 * 1024)))
+    try:
+        if encoding == 'gzip':
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            out = decoder.decompress(data, max_size + 1)
+            if len(out) > max_size:
+                raise BodyTooLarge("Decoded body too large")
+            if not decoder.eof:
+                raise DecodeError("Truncated gzip body")
+            return out
+        if encoding == 'zstd' and zstandard is not None:
+            out = io.BytesIO()
+            with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                while True:
+                    chunk = reader.read(65536)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    if out.tell() > max_size:
+                        raise BodyTooLarge("Decoded body too large")
+            return out.getvalue()
+    except (zlib.error, EOFError) as e:
+        raise DecodeError(f"Invalid {encoding} body: {e}") from e
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise DecodeError(f"Invalid {encoding} body: {e}") from e
+        raise
+    raise DecodeError(f"Unsupported encoding: {encoding}")
+
+def response_body(response):
+    # Body of a requests/httpx response. Their zstd support depends on the
+    # installed urllib3/httpx, so a body still in zstd framing is decoded here.
+    body = response.content
+    if response.headers.get('Content-Encoding', '').strip().lower() == 'zstd' and body[:4] == ZSTD_MAGIC:
+        body = decompress(body, 'zstd')
+    return body
+
+def compress_flask(app):
+    from flask import request, jsonify
+    from werkzeug.wsgi import get_input_stream
+
+    min_size = int(os.getenv('HTTP_COMPRESS_MIN_BYTES', '1024'))
+
+    @app.before_request
+    def _decode_request_body():
+        encoding = request.headers.get('Content-Encoding', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return None
+        if encoding not in supported_encodings():
+            return (jsonify({"error": f"Unsupported Content-Encoding: {encoding}"}), 415,
+                    {"Accept-Encoding": accept_encoding_header()})
+        # Swap in the decoded body before anything reads request.stream
+        environ = request.environ
+        try:
+            body = decompress(get_input_stream(environ).read(), encoding)
+        except DecodeError as e:
+            return jsonify({"error": str(e)}), 413 if isinstance(e, BodyTooLarge) else 400
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        return None
+
+    @app.after_request
+    def _encode_response_body(response):
+        response.headers['Accept-Encoding'] = accept_encoding_header()
+        # Streams (SSE) and files are sent as they are
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers \
+                or response.status_code in (204, 304) or response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,209 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+    from PIL import Image, features
+except ImportError:
+    np = None
+    Image = None
+    features = None
+
+def decode_image(image_bytes):
+    # Grayscale float32 array in [0, 255]
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        gray = img.convert('L')
+        return np.asarray(gray, dtype=np.float32)
+
+def encode_png(gray):
+    buffer = io.BytesIO()
+    Image.fromarray(gray.astype(np.uint8), mode='L').save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+def compact_encode(image_bytes, fmt='png', max_side=2560):
+    # Grayscale, size-capped re-encoding for upload -> (bytes, extension).
+    # Two-tone images (binarized captures) are stored as 1-bit PNGs, and an
+    # image that re-encoding would not shrink is passed through.
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        original = (img.format or 'png').lower()
+        gray = img.convert('L')
+    resized = max(gray.size) > max_side
+    if resized:
+        gray.thumbnail((max_side, max_side))
+    buffer = io.BytesIO()
+    if fmt == 'webp' and features.check('webp'):
+        gray.save(buffer, format='WEBP', lossless=True)
+        extension = 'webp'
+    else:
+        if gray.getcolors(2) is not None:
+            gray = gray.convert('1')
+        gray.save(buffer, format='PNG', optimize=True)
+        extension = 'png'
+    if not resized and buffer.tell() >= len(image_bytes):
+        return image_bytes, original
+    return buffer.getvalue(), extension
+
+def estimate_text_height(binary):
+    # Median height of runs of rows that contain ink: a cheap stand-in for
+    # line height on screenshots of text
+    ink_rows = binary.any(axis=1)
+    if not ink_rows.any():
+        return 0
+    padded = np.concatenate(([False], ink_rows, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    heights = edges[1::2] - edges[0::2]
+    return int(np.median(heights)) if len(heights) else 0
+
+def otsu_threshold(gray):
+    hist = np.bincount(gray.astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 127.0
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_total = cum_mean[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_bg = cum_mean / weight_bg
+        mean_fg = (mean_total - cum_mean) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    between = np.nan_to_num(between)
+    return float(np.argmax(between))
+
+def downscale(gray, factor):
+    # Box filter by an integer factor; exact and vectorized
+    if factor <= 1:
+        return gray
+    h = gray.shape[0] - gray.shape[0] % factor
+    w = gray.shape[1] - gray.shape[1] % factor
+    if h == 0 or w == 0:
+        return gray
+    return gray[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3))
+
+def difference_hash(gray, size=8):
+    # 64-bit dHash: robust to scaling and small rendering noise, so repeated
+    # captures of the same screen region map to the same key
+    h, w = gray.shape
+    rows = np.linspace(0, h, size + 1).astype(int)
+    cols = np.linspace(0, w, size + 2).astype(int)
+    small = np.add.reduceat(np.add.reduceat(gray, rows[:-1], axis=0), cols[:-1], axis=1)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(''.join('1' if b else '0' for b in bits), 2)
+
+class ImagePreprocessor:
+    # NumPy stage in front of OCR: grayscale, crop to the non-uniform area,
+    # downscale so text lands near target_text_height pixels, and binarize
+    # with Otsu. Blank or uniform captures never reach the engine, and results
+    # are cached by perceptual hash.
+
+    def __init__(self, target_text_height=32, blank_std=4.0, tile=32, cache_entries=128):
+        self.target_text_height = target_text_height
+        self.blank_std = blank_std
+        self.tile = tile
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"processed": 0, "blank": 0, "cache_hits": 0}
+
+    @property
+    def available(self):
+        return np is not None and Image is not None
+
+    def content_bounds(self, gray):
+        # Bounding box of tiles whose pixel spread says they hold something
+        h, w = gray.shape
+        t = self.tile
+        th, tw = -(-h // t), -(-w // t)
+        padded = np.pad(gray, ((0, th * t - h), (0, tw * t - w)), mode='edge')
+        tiles = padded.reshape(th, t, tw, t)
+        busy = tiles.std(axis=(1, 3)) > self.blank_std
+        if not busy.any():
+            return None
+        rows = np.flatnonzero(busy.any(axis=1))
+        cols = np.flatnonzero(busy.any(axis=0))
+        return (rows[0] * t, min(h, (rows[-1] + 1) * t), cols[0] * t, min(w, (cols[-1] + 1) * t))
+
+    def prepare(self, image_bytes):
+        # Returns (processed_png_bytes or None when blank, cache key). The key
+        # pairs the perceptual hash with a digest of the binarized pixels, so
+        # recaptures that binarize identically hit while two different lines
+        # of text that merely share a layout do not.
+        gray = decode_image(image_bytes)
+        dhash = difference_hash(gray) if min(gray.shape) >= 9 else None
+
+        bounds = self.content_bounds(gray)
+        with self._lock:
+            self.counters["processed"] += 1
+            if bounds is None:
+                self.counters["blank"] += 1
+        if bounds is None:
+            return None, None
+        top, bottom, left, right = bounds
+        gray = gray[top:bottom, left:right]
+
+        # Dark-on-light and light-on-dark both become dark ink on white
+        threshold = otsu_threshold(gray)
+        binary = gray < threshold
+        if binary.mean() > 0.5:
+            binary = ~binary
+        text_height = estimate_text_height(binary)
+        factor = int(text_height // self.target_text_height) if text_height else 1
+        if factor > 1:
+            gray = downscale(gray, factor)
+            binary = gray < threshold
+            if binary.mean() > 0.5:
+                binary = ~binary
+
+        if dhash is None:
+            return encode_png(np.where(binary, 0, 255)), None
+        digest = hashlib.sha1(np.packbits(binary).tobytes() + str(binary.shape).encode()).hexdigest()[:16]
+        return encode_png(np.where(binary, 0, 255)), f"{dhash:016x}-{digest}"
+
+    def cached(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.counters["cache_hits"] += 1
+                return self._cache[key]
+        return None
+
+    def remember(self, key, result):
+        if key is None:
+            return
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def lookup(self, image_bytes):
+        # -> (result, image_for_engine, cache_key). result is set when the
+        # engine can be skipped (blank region or cache hit).
+        if not self.available:
+            return None, image_bytes, None
+        try:
+            processed, key = self.prepare(image_bytes)
+        except Exception as e:
+            print(f"Image preprocessing failed, using raw image: {e}")
+            return None, image_bytes, None
+        if processed is None:
+            return ("", "Blank region"), None, None
+        return self.cached(key), processed, key
+
+    def recognize(self, image_bytes, engine):
+        # Full pipeline around engine.extract_text_from_image -> (text, method)
+        result, processed, key = self.lookup(image_bytes)
+        if result is not None:
+            return result
+        result = engine.extract_text_from_image(processed)
+        self.remember(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, cache_entries=len(self._cache))
@@ -0,0 +1,176 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus text exposition without the client library. Metrics are per
+# process; under gunicorn each worker reports its own series.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}_total{_label_text(self.labelnames, k)} {v}" for k, v in items]
+
+class Gauge(_Metric):
+    # Either set() directly or backed by a callback read at scrape time
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                value = None
+            if value is not None:
+                self.set(value)
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labelnames, k)} {v}" for k, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _label_text(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route",
+    ("method", "route", "status")))
+provider_request_seconds = registry.register(Histogram(
+    "provider_request_duration_seconds", "Upstream LLM call duration (streams: until the last token)",
+    ("provider", "mode")))
+provider_ttft_seconds = registry.register(Histogram(
+    "provider_time_to_first_token_seconds", "Time to the first streamed token", ("provider",)))
+provider_queue_wait_seconds = registry.register(Histogram(
+    "provider_queue_wait_seconds", "Time a call waited for upstream rate-limit quota", ("provider", "priority")))
+provider_errors = registry.register(Counter(
+    "provider_errors", "Failed upstream LLM calls", ("provider", "kind")))
+provider_tokens = registry.register(Counter(
+    "provider_tokens", "Tokens reported in upstream usage fields", ("provider", "type")))
+stage_seconds = registry.register(Histogram(
+    "stage_duration_seconds", "OCR and audio pipeline stage durations", ("subsystem", "stage")))
+
+def observe_stage(subsystem, stage, seconds):
+    stage_seconds.observe(seconds, subsystem=subsystem, stage=stage)
+
+def record_usage(provider, usage):
+    # OpenAI-style usage: {"prompt_tokens": n, "completion_tokens": m, ...}
+    if not isinstance(usage, dict):
+        return
+    for field, kind in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+        value = usage.get(field)
+        if isinstance(value, (int, float)):
+            provider_tokens.inc(value, provider=provider, type=kind)
+
+def instrument_flask(app):
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        start = getattr(g, '_metrics_start', None)
+        if start is not None:
+            # Streaming responses are timed to their headers; their upstream
+            # time is in the provider histograms
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            http_request_seconds.observe(time.perf_counter() - start, method=request.method,
+                                         route=route, status=response.status_code)
+        return response
@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from metrics import observe_stage
+
+class QueueFullError(Exception):
+    pass
+
+class _Job:
+    def __init__(self, image_bytes):
+        self.image_bytes = image_bytes
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class _StageTimer:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        observe_stage('ocr', self.name, seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2)
+        }
+
+class OCRBatchScheduler:
+    # Inference scheduler for the cloud OCR engine. Requests wait in a bounded
+    # queue; a single inference thread takes the first waiting job, gathers
+    # more for up to max_wait seconds (or until max_batch), runs them as one
+    # batch and resolves each caller's future. Engines that expose
+    # extract_text_batch(list_of_bytes) get true batched inference; others
+    # are run one image at a time, which still caps concurrent inference.
+
+    def __init__(self, engine_factory, max_queue=64, max_batch=8, max_wait=0.02, preprocessor=None):
+        self.engine_factory = engine_factory
+        self.preprocessor = preprocessor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.engine = None
+        self.load_error = None
+        self.ready = threading.Event()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self.batch_sizes = {}
+        self.rejected = 0
+        self.timings = {name: _StageTimer(name) for name in
+                        ("load", "queue_wait", "preprocess", "inference", "batch_inference")}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ocr-scheduler', daemon=True)
+            self._thread.start()
+
+    def submit(self, image_bytes, timeout=60.0):
+        # Blocks the calling request thread until its own result is ready
+        self.start()
+        job = _Job(image_bytes)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise QueueFullError("OCR queue is full, try again shortly")
+        try:
+            return job.future.result(timeout=timeout)
+        except FutureTimeout:
+            # The worker skips jobs whose future was cancelled
+            job.future.cancel()
+            raise
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.engine = self.engine_factory()
+        except Exception as e:
+            self.load_error = e
+            print(f"Cloud OCR engine failed to load: {e}")
+        self.timings["load"].add(time.perf_counter() - start)
+        self.ready.set()
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        now = time.perf_counter()
+        live = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        with self._stats_lock:
+            for job in live:
+                self.timings["queue_wait"].add(now - job.enqueued_at)
+            self.batch_sizes[len(live)] = self.batch_sizes.get(len(live), 0) + 1
+
+        if self.load_error is not None:
+            for job in live:
+                job.future.set_exception(RuntimeError(f"OCR engine unavailable: {self.load_error}"))
+            return
+
+        # Blank regions and repeated captures are answered without inference
+        pending = []
+        for job in live:
+            if self.preprocessor is None:
+                pending.append((job, job.image_bytes, None))
+                continue
+            item_start = time.perf_counter()
+            result, image_bytes, key = self.preprocessor.lookup(job.image_bytes)
+            with self._stats_lock:
+                self.timings["preprocess"].add(time.perf_counter() - item_start)
+            if result is not None:
+                job.future.set_result(result)
+            else:
+                pending.append((job, image_bytes, key))
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        if hasattr(self.engine, 'extract_text_batch'):
+            try:
+                results = self.engine.extract_text_batch([image_bytes for _, image_bytes, _ in pending])
+                for (job, _, key), result in zip(pending, results):
+                    self._resolve(job, key, result)
+            except Exception as e:
+                for job, _, _ in pending:
+                    job.future.set_exception(e)
+        else:
+            for job, image_bytes, key in pending:
+                item_start = time.perf_counter()
+                try:
+                    self._resolve(job, key, self.engine.extract_text_from_image(image_bytes))
+                except Exception as e:
+                    job.future.set_exception(e)
+                with self._stats_lock:
+                    self.timings["inference"].add(time.perf_counter() - item_start)
+        with self._stats_lock:
+            self.timings["batch_inference"].add(time.perf_counter() - start)
+
+    def _resolve(self, job, key, result):
+        if self.preprocessor is not None:
+            self.preprocessor.remember(key, result)
+        job.future.set_result(result)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "ready": self.ready.is_set() and self.load_error is None,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "rejected": self.rejected,
+                "batch_sizes": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                "timings": {name: timer.snapshot() for name, timer in self.timings.items()},
+                "preprocess": self.preprocessor.stats() if self.preprocessor is not None else None
+            }
@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from ocr_scheduler import OCRBatchScheduler, QueueFullError
+from ocr_worker import preprocessor_from_env
+
+# One cloud OCR engine per deployment. gunicorn.conf.py starts this process
+# once next to the workers and points them at it with OCR_SERVICE_URL; each
+# worker's /api/ocr_remote forwards the image here instead of loading its own
+# engine, so memory holds one model and requests from all workers meet in
+# one OCRBatchScheduler and batch together.
+#   python ocr_service.py --port 5100
+
+def load_ocr_engine():
+    # OCR_ENGINE=module:Class swaps in another engine (benchmarks use a fake)
+    print("Loading Cloud OCR Engine...")
+    engine_path = os.environ.get("OCR_ENGINE")
+    if engine_path:
+        import importlib
+        module_name, class_name = engine_path.split(':', 1)
+        return getattr(importlib.import_module(module_name), class_name)()
+    from ocr.ocr_engine import OCREngine
+    return OCREngine()
+
+def scheduler_from_env():
+    return OCRBatchScheduler(
+        load_ocr_engine,
+        max_queue=int(os.environ.get("OCR_QUEUE_SIZE", 64)),
+        max_batch=int(os.environ.get("OCR_BATCH_SIZE", 8)),
+        max_wait=float(os.environ.get("OCR_BATCH_WAIT_MS", 20)) / 1000.0,
+        preprocessor=preprocessor_from_env()
+    )
+
+class OCRServiceClient:
+    # Worker side: the scheduler's submit()/stats() over HTTP, raising the
+    # same QueueFullError and FutureTimeout so cloud_server's route is unchanged
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+
+    def submit(self, image_bytes, timeout=60.0):
+        try:
+            response = self.session.post(self.url + '/ocr', data=image_bytes, params={"timeout": timeout},
+                                         headers={"Content-Type": "application/octet-stream"},
+                                         timeout=timeout + 5)
+        except requests.Timeout:
+            raise FutureTimeout()
+        except requests.RequestException as e:
+            raise RuntimeError(f"OCR service unreachable: {e}")
+        if response.status_code == 503:
+            raise QueueFullError(response.json().get("error", "OCR queue is full, try again shortly"))
+        if response.status_code == 504:
+            raise FutureTimeout()
+        payload = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(payload.get("error", f"OCR service answered {response.status_code}"))
+        return payload["text"], payload["method"]
+
+    def stats(self):
+        try:
+            return self.session.get(self.url + '/stats', timeout=5).json()
+        except (requests.RequestException, ValueError) as e:
+            return {"ready": False, "error": str(e), "queue_depth": 0}
+
+class OCRServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, self.server.scheduler.stats())
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        path, _, query = self.path.partition('?')
+        image_bytes = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if path != '/ocr':
+            self.send_json(404, {"error": "Not found"})
+            return
+        timeout = 60.0
+        if query.startswith('timeout='):
+            try:
+                timeout = float(query.split('=', 1)[1])
+            except ValueError:
+                pass
+        try:
+            text, method = self.server.scheduler.submit(image_bytes, timeout=timeout)
+            self.send_json(200, {"text": text, "method": method})
+        except QueueFullError as e:
+            self.send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+        except FutureTimeout:
+            self.send_json(504, {"error": "OCR timed out"})
+        except Exception as e:
+            print(f"OCR service error: {e}")
+            self.send_json(500, {"error": str(e)})
+
+class OCRServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Every worker's requests can arrive at once
+    request_queue_size = 256
+
+def exit_with_parent(pid):
+    # The gunicorn master may be killed without running on_exit
+    while os.getppid() == pid:
+        time.sleep(1)
+    print("OCR service parent exited, stopping")
+    os._exit(0)
+
+def serve(port, host='127.0.0.1', parent=None):
+    if parent:
+        threading.Thread(target=exit_with_parent, args=(parent,), daemon=True).start()
+    server = OCRServiceServer((host, port), OCRServiceHandler)
+    server.scheduler = scheduler_from_env()
+    server.scheduler.start()
+    print(f"OCR service listening on {host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    port = int(os.environ.get("OCR_SERVICE_PORT", 5100))
+    if '--port' in sys.argv:
+        port = int(sys.argv[sys.argv.index('--port') + 1])
+    parent = int(sys.argv[sys.argv.index('--parent') + 1]) if '--parent' in sys.argv else None
+    serve(port, parent=parent)
@@ -0,0 +1,251 @@
+import json
+import os
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+# Frames are a 4-byte big-endian length followed by that many bytes of UTF-8 JSON
+HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+def write_frame(stream, payload):
+    body = json.dumps(payload).encode('utf-8')
+    stream.write(HEADER.pack(len(body)) + body)
+    stream.flush()
+
+def _read_exact(stream, size):
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("OCR worker pipe closed")
+        data += chunk
+    return data
+
+def read_frame(stream):
+    (size,) = HEADER.unpack(_read_exact(stream, HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"OCR frame too large: {size} bytes")
+    return json.loads(_read_exact(stream, size).decode('utf-8'))
+
+def select_and_capture():
+    # Let the user drag a region on screen and return its image bytes
+    from ocr.text_selector import InvisibleTextSelector
+
+    # Variable to store results from callback
+    selection_result = {"coords": None}
+
+    def on_select(coords):
+        selection_result["coords"] = coords
+
+    selector = InvisibleTextSelector(on_select)
+    selector.start_selection()
+
+    coords = selection_result["coords"]
+    if not coords:
+        return None, {"error": "No selection made"}
+
+    # Use the selector instance to capture the screen
+    image_bytes = selector.capture_screen_region(coords)
+    if not image_bytes:
+        return None, {"error": "Failed to capture screen region"}
+    return image_bytes, None
+
+def preprocessor_from_env():
+    # OCR_PREPROCESS=off sends raw captures straight to the engine
+    if os.getenv('OCR_PREPROCESS', 'on').lower() in ('0', 'off', 'false'):
+        return None
+    from image_preprocess import ImagePreprocessor
+    preprocessor = ImagePreprocessor(
+        target_text_height=int(os.getenv('OCR_TARGET_TEXT_HEIGHT', 32)),
+        cache_entries=int(os.getenv('OCR_CACHE_SIZE', 128))
+    )
+    return preprocessor if preprocessor.available else None
+
+def remote_from_env():
+    from remote_ocr import remote_ocr_from_env
+    return remote_ocr_from_env()
+
+class OCREngineUnavailable(Exception):
+    # The local engine could not be imported; callers answer 503, not 500
+    pass
+
+def capture_and_recognize(ocr_engine, preprocessor=None, remote=None):
+    # One OCR request: selection, capture and recognition. Always returns a
+    # dict; successful results carry per-stage "timings" in seconds. With a
+    # RemoteOCRClient the engine is only called if the cloud path fails.
+    try:
+        start = time.perf_counter()
+        image_bytes, error = select_and_capture()
+        if error:
+            return error
+        captured = time.perf_counter()
+        try:
+            timings = {"capture": captured - start}
+            if remote is not None:
+                text, method = remote.recognize(image_bytes, ocr_engine, preprocessor, timings)
+            elif preprocessor is not None:
+                text, method = preprocessor.recognize(image_bytes, ocr_engine())
+            else:
+                text, method = ocr_engine().extract_text_from_image(image_bytes)
+            timings["recognize"] = time.perf_counter() - captured
+            return {"text": text, "method": method, "timings": timings}
+        except OCREngineUnavailable as e:
+            return {"error": str(e), "status": 503}
+        except Exception as e:
+            return {"error": f"OCR Engine Error: {str(e)}"}
+    except Exception as e:
+        return {"error": f"OCR Process Error: {str(e)}"}
+
+def serve():
+    # Worker side: load the engine once, then answer frames on stdin/stdout.
+    # Anything else that prints (easyocr, torch) is pushed to stderr so it
+    # cannot corrupt the protocol stream. In remote OCR mode the engine is
+    # left unloaded until a fallback actually needs it.
+    frames_in = sys.stdin.buffer
+    frames_out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+
+    engines = []
+
+    def load_engine():
+        if not engines:
+            from ocr.ocr_engine import OCREngine
+            engines.append(OCREngine())
+        return engines[0]
+
+    start = time.perf_counter()
+    remote = remote_from_env()
+    if remote is None:
+        try:
+            load_engine()
+        except Exception as e:
+            write_frame(frames_out, {"ready": False, "error": f"OCR Engine Error: {str(e)}"})
+            return
+    preprocessor = preprocessor_from_env()
+    write_frame(frames_out, {"ready": True, "load_seconds": round(time.perf_counter() - start, 3)})
+
+    while True:
+        try:
+            request = read_frame(frames_in)
+        except EOFError:
+            return
+        command = request.get('cmd')
+        if command == 'shutdown':
+            return
+        if command == 'ping':
+            write_frame(frames_out, {"id": request.get('id'), "pong": True})
+        elif command == 'ocr':
+            result = capture_and_recognize(load_engine, preprocessor, remote)
+            write_frame(frames_out, dict(result, id=request.get('id')))
+        else:
+            write_frame(frames_out, {"id": request.get('id'), "error": f"Unknown command: {command}"})
+
+class OCRWorkerError(Exception):
+    pass
+
+class OCRWorkerTimeout(OCRWorkerError):
+    pass
+
+class OCRWorker:
+    # Client side: owns one long-lived worker process, restarts it when it
+    # dies, and serializes requests over its pipes.
+
+    def __init__(self, command=None, startup_timeout=180.0):
+        self.command = command or self.default_command()
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.load_seconds = None
+        self.restarts = 0
+        self._frames = queue.Queue()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    @staticmethod
+    def default_command():
+        if getattr(sys, 'frozen', False):
+            # Frozen builds have a single executable; ui_bridge.main dispatches the flag
+            return [sys.executable, '--ocr-worker']
+        return [sys.executable, os.path.abspath(__file__)]
+
+    def _alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _reader(self, process, frames):
+        try:
+            while True:
+                frames.put(read_frame(process.stdout))
+        except Exception as e:
+            frames.put({"_eof": str(e)})
+
+    def start(self):
+        with self._lock:
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self._alive():
+            return
+        if self.process is not None:
+            self.restarts += 1
+            print(f"Restarting OCR worker (exit code {self.process.poll()})")
+        self._frames = queue.Queue()
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        threading.Thread(target=self._reader, args=(self.process, self._frames), daemon=True).start()
+
+        hello = self._next_frame(self.startup_timeout)
+        if not hello.get('ready'):
+            self._kill()
+            raise OCRWorkerError(hello.get('error', "OCR worker failed to start"))
+        self.load_seconds = hello.get('load_seconds')
+
+    def _next_frame(self, timeout):
+        try:
+            frame = self._frames.get(timeout=timeout)
+        except queue.Empty:
+            self._kill()
+            raise OCRWorkerTimeout("OCR worker timed out")
+        if '_eof' in frame:
+            self._kill()
+            raise OCRWorkerError(f"OCR worker exited: {frame['_eof']}")
+        return frame
+
+    def _kill(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def request(self, command, timeout=120.0, retry=True):
+        with self._lock:
+            try:
+                self._ensure_started()
+                self._next_id += 1
+                request_id = self._next_id
+                write_frame(self.process.stdin, {"cmd": command, "id": request_id})
+                frame = self._next_frame(timeout)
+                if frame.pop('id', None) != request_id:
+                    self._kill()
+                    raise OCRWorkerError("OCR worker answered out of order")
+                return frame
+            except OCRWorkerTimeout:
+                # Do not re-run a selection the user may still be making
+                raise
+            except (OSError, OCRWorkerError):
+                if not retry or self._alive():
+                    raise
+            # The worker crashed mid-request: one fresh attempt
+        return self.request(command, timeout, retry=False)
+
+    def stop(self):
+        with self._lock:
+            if self._alive():
+                try:
+                    write_frame(self.process.stdin, {"cmd": "shutdown"})
+                    self.process.wait(timeout=5)
+                except Exception:
+                    self._kill()
+
+if __name__ == '__main__':
+    serve()
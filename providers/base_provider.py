@@ -1,10 +1,283 @@
+import asyncio
+import email.utils
+import json
+import math
+import os
+import time
 from abc import ABC, abstractmethod
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from metrics import record_usage
+from .rate_limiter import AdmissionScheduler
+from .errors import (ProviderError, ProviderTimeoutError, ProviderUnavailableError,
+                     ProviderRateLimitError, ProviderAuthError, ProviderResponseError)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 429 and 503 are retried only while their Retry-After is at most
+# PROVIDER_RETRY_AFTER_MAX seconds. A longer one fails fast and pauses the
+# admission scheduler instead, so the circuit breakers and failover in
+# ProviderManager act on it without holding the request.
+RETRY_AFTER_STATUSES = (429, 503)
+
+def env_number(name, default):
+    # Read at call time so values loaded by ProviderManager's load_dotenv apply
+    value = os.getenv(name)
+    try:
+        return type(default)(value) if value else default
+    except ValueError:
+        return default
+
+def backoff_delay(backoff, retry):
+    # urllib3's schedule: the first retry is immediate, then backoff * 2**(n-1)
+    return 0.0 if retry <= 1 else backoff * 2 ** (retry - 1)
+
+def parse_retry_after(value):
+    # Seconds from a Retry-After header; HTTP dates count from now
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CappedRetry(Retry):
+    # Retry that honours a short Retry-After on 429/503 and gives up at once
+    # on a longer one
+
+    def __init__(self, *args, retry_after_cap=2.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after_cap = retry_after_cap
+
+    def new(self, **kw):
+        kw.setdefault('retry_after_cap', self.retry_after_cap)
+        return super().new(**kw)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None and response.status in RETRY_AFTER_STATUSES:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None and retry_after > self.retry_after_cap:
+                # urlopen hands the response back as raise_on_status is off
+                raise MaxRetryError(_pool, url, f"Retry-After {retry_after:.0f}s exceeds the retry cap")
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+if httpx is not None:
+    class RetryTransport(httpx.AsyncHTTPTransport):
+        # create_session's policy for the async client. httpx itself only
+        # retries failed connects; transient 5xx answers are retried here on
+        # the same backoff schedule.
+
+        def __init__(self, retries, backoff, retry_after_cap, **kwargs):
+            super().__init__(retries=retries, **kwargs)
+            self.status_retries = retries
+            self.backoff = backoff
+            self.retry_after_cap = retry_after_cap
+
+        async def handle_async_request(self, request):
+            retry = 0
+            while True:
+                response = await super().handle_async_request(request)
+                if response.status_code not in RETRY_STATUSES or retry >= self.status_retries:
+                    return response
+                delay = backoff_delay(self.backoff, retry + 1)
+                if response.status_code in RETRY_AFTER_STATUSES:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if retry_after is not None:
+                        if retry_after > self.retry_after_cap:
+                            return response
+                        delay = retry_after
+                await response.aclose()
+                retry += 1
+                await asyncio.sleep(delay)
+
+def create_session(pool_size=None, max_retries=None, backoff=None):
+    """Keep-alive session whose adapter retries transient 429/5xx answers.
+
+    Retries back off by backoff * 2**n, or sleep for a 429/503's Retry-After
+    when it is within PROVIDER_RETRY_AFTER_MAX; a longer one is returned at
+    once. The adapter's connection pool is safe to share between the Flask
+    request threads.
+    """
+    pool_size = pool_size or env_number('PROVIDER_POOL_SIZE', 10)
+    max_retries = env_number('PROVIDER_MAX_RETRIES', 3) if max_retries is None else max_retries
+    backoff = env_number('PROVIDER_RETRY_BACKOFF', 0.5) if backoff is None else backoff
+    retry = CappedRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=max_retries,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        backoff_factor=backoff,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        retry_after_cap=env_number('PROVIDER_RETRY_AFTER_MAX', 2.0)
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+async def close_clients(clients):
+    for client in clients:
+        await client.aclose()
+
 class BaseProvider(ABC):
-    def __init__(self, api_key):
+    def __init__(self, api_key, connect_timeout=None, read_timeout=None):
         self.api_key = api_key
         self.name = "base"
+        self.timeout = (
+            connect_timeout or env_number('PROVIDER_CONNECT_TIMEOUT', 5.0),
+            read_timeout or env_number('PROVIDER_READ_TIMEOUT', 60.0)
+        )
+        self.session = create_session()
+        self._async_clients = []
+        self._async_loop = None
+        self._next_async_client = 0
+        # Admission control fed by the upstream's rate-limit headers
+        self.limiter = AdmissionScheduler()
+
+    def close(self):
+        self.session.close()
+        # The async clients can only be closed on the loop that created them
+        clients, self._async_clients = self._async_clients, []
+        loop = self._async_loop
+        if not clients or loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._closing = loop.create_task(close_clients(clients))
+        elif loop.is_running():
+            asyncio.run_coroutine_threadsafe(close_clients(clients), loop)
+        else:
+            loop.run_until_complete(close_clients(clients))
+
+    async def aclose(self):
+        clients, self._async_clients = self._async_clients, []
+        await close_clients(clients)
+
+    def async_client(self):
+        # Pooled httpx clients, created on the serving event loop. httpcore
+        # rescans every pooled connection on each request event, so the
+        # PROVIDER_ASYNC_POOL_SIZE connections are split across clients of
+        # PROVIDER_ASYNC_SHARD_SIZE, handed out round-robin.
+        if httpx is None:
+            return None
+        if not self._async_clients:
+            pool_size = env_number('PROVIDER_ASYNC_POOL_SIZE', 100)
+            shards = -(-pool_size // max(1, env_number('PROVIDER_ASYNC_SHARD_SIZE', 16)))
+            shard_size = -(-pool_size // shards)
+            limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+            retries = env_number('PROVIDER_MAX_RETRIES', 3)
+            backoff = env_number('PROVIDER_RETRY_BACKOFF', 0.5)
+            self._async_clients = [httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                transport=RetryTransport(retries, backoff, env_number('PROVIDER_RETRY_AFTER_MAX', 2.0),
+                                         limits=limits)
+            ) for _ in range(shards)]
+            self._async_loop = asyncio.get_running_loop()
+        self._next_async_client = (self._next_async_client + 1) % len(self._async_clients)
+        return self._async_clients[self._next_async_client]
 
     @abstractmethod
     def chat(self, messages):
         pass
+
+    def wrap_error(self, e):
+        """Translate a requests/httpx/parsing exception into a typed ProviderError."""
+        if isinstance(e, ProviderError):
+            return e
+        message = str(e)
+        if isinstance(e, requests.exceptions.Timeout) or (httpx and isinstance(e, httpx.TimeoutException)):
+            return ProviderTimeoutError(self.name, message)
+
+        response = getattr(e, 'response', None)
+        status = getattr(response, 'status_code', None)
+        if status == 429:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            self.limiter.pause(retry_after)
+            return ProviderRateLimitError(self.name, message, retry_after=retry_after)
+        if status in (401, 403):
+            return ProviderAuthError(self.name, message, status)
+        if status == 503:
+            # Retry-After past the retry cap: hold this provider's queue too
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after:
+                self.limiter.pause(retry_after)
+            return ProviderUnavailableError(self.name, message, status)
+        if status and status >= 500:
+            return ProviderUnavailableError(self.name, message, status)
+        if status:
+            return ProviderResponseError(self.name, message, status)
+
+        if isinstance(e, requests.exceptions.ConnectionError) or (httpx and isinstance(e, httpx.TransportError)):
+            return ProviderUnavailableError(self.name, message)
+        if isinstance(e, (KeyError, IndexError, TypeError, ValueError)):
+            return ProviderResponseError(self.name, f"Malformed response: {message}")
+        return ProviderError(self.name, message)
+
+    async def achat(self, messages):
+        # Providers without a native async path run chat() on a worker thread
+        return await asyncio.to_thread(self.chat, messages)
+
+    def chat_stream(self, messages):
+        # Non-streaming fallback: providers without a streaming path yield the
+        # whole completion as a single chunk.
+        yield self.chat(messages)
+
+    def check_response(self, response):
+        # Quota headers come on errors too, so read them before raising
+        self.limiter.observe(response.headers)
+        response.raise_for_status()
+
+    @staticmethod
+    def iter_sse_data(response):
+        """Yield the decoded JSON payload of each `data:` event until [DONE]."""
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            payload = line[5:].strip()
+            if payload == '[DONE]':
+                break
+            try:
+                yield json.loads(payload)
+            except ValueError:
+                continue
+
+    def read_completion(self, result):
+        """Content of an OpenAI-compatible chat completion; records its token usage."""
+        record_usage(self.name, result.get('usage'))
+        return result['choices'][0]['message']['content']
+
+    def iter_openai_deltas(self, response):
+        """Yield content deltas from an OpenAI-compatible chat completion stream."""
+        for chunk in self.iter_sse_data(response):
+            # Usage arrives on the final chunk (Groq nests it under x_groq)
+            usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage')
+            if usage:
+                record_usage(self.name, usage)
+            choices = chunk.get('choices') or []
+            if not choices:
+                continue
+            content = (choices[0].get('delta') or {}).get('content')
+            if content:
+                yield content
@@ -1,25 +1,54 @@
-import requests
+import os
+
 from .base_provider import BaseProvider
 
 class CerebrasProvider(BaseProvider):
     def __init__(self, api_key):
         super().__init__(api_key)
         self.name = "cerebras"
-        self.api_url = "https://api.cerebras.ai/v1/chat/completions"
+        self.api_url = os.getenv('CEREBRAS_API_URL', "https://api.cerebras.ai/v1/chat/completions")
+        self.model = "llama3.1-8b"
 
-    def chat(self, messages):
-        headers = {
+    def _headers(self):
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+
+    def _payload(self, messages, stream=False):
         data = {
-            "model": "llama3.1-8b",
+            "model": self.model,
             "messages": messages,
             "temperature": 0.7
         }
+        if stream:
+            data["stream"] = True
+        return data
+
+    def chat(self, messages):
+        try:
+            response = self.session.post(self.api_url, headers=self._headers(), json=self._payload(messages), timeout=self.timeout)
+            self.check_response(response)
+            return self.read_completion(response.json())
+        except Exception as e:
+            raise self.wrap_error(e) from e
+
+    async def achat(self, messages):
+        client = self.async_client()
+        if client is None:
+            return await super().achat(messages)
+        try:
+            response = await client.post(self.api_url, headers=self._headers(), json=self._payload(messages))
+            self.check_response(response)
+            return self.read_completion(response.json())
+        except Exception as e:
+            raise self.wrap_error(e) from e
+
+    def chat_stream(self, messages):
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content']
+            with self.session.post(self.api_url, headers=self._headers(), json=self._payload(messages, stream=True),
+                                   timeout=self.timeout, stream=True) as response:
+                self.check_response(response)
+                yield from self.iter_openai_deltas(response)
         except Exception as e:
-            return f"Error: {str(e)}"
+            raise self.wrap_error(e) from e
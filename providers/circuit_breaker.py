@@ -0,0 +1,65 @@
+import threading
+import time
+
+class CircuitBreaker:
+    # Classic three-state breaker. CLOSED counts consecutive failures and
+    # trips to OPEN at the threshold; OPEN rejects calls until the recovery
+    # timeout passes, then HALF_OPEN lets a limited number of probe requests
+    # through. A successful probe closes the circuit, a failed one re-opens it.
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, recovery_timeout=30.0, half_open_probes=1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probes_in_flight = 0
+            if self.state == self.HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_probes:
+                    return False
+                self.probes_in_flight += 1
+            return True
+
+    def retry_after(self):
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probes_in_flight = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probes_in_flight = 0
+
+    def release_probe(self):
+        # A probe that ended without a verdict (e.g. hedge loser cancelled)
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.probes_in_flight > 0:
+                self.probes_in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
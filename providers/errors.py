@@ -0,0 +1,53 @@
+class ProviderError(Exception):
+    # Base for every failure a provider can raise from chat()/achat()/chat_stream()
+    kind = "provider_error"
+
+    def __init__(self, provider, message, status=None):
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+
+    def to_dict(self):
+        return {"type": self.kind, "provider": self.provider, "status": self.status, "message": str(self)}
+
+class ProviderTimeoutError(ProviderError):
+    kind = "timeout"
+
+class ProviderUnavailableError(ProviderError):
+    # Connection failures and 5xx answers
+    kind = "unavailable"
+
+class ProviderRateLimitError(ProviderError):
+    kind = "rate_limited"
+
+    def __init__(self, provider, message, status=429, retry_after=None):
+        super().__init__(provider, message, status)
+        self.retry_after = retry_after
+
+class ProviderAuthError(ProviderError):
+    kind = "auth"
+
+class ProviderResponseError(ProviderError):
+    # The upstream answered, but not with something we can use
+    kind = "bad_response"
+
+class CircuitOpenError(ProviderError):
+    kind = "circuit_open"
+
+    def __init__(self, provider, retry_after):
+        super().__init__(provider, f"{provider} is temporarily disabled after repeated failures")
+        self.retry_after = retry_after
+
+class NoProviderAvailableError(ProviderError):
+    kind = "no_provider"
+
+    def __init__(self, errors, retry_after=None):
+        detail = "; ".join(f"{e.provider}: {e}" for e in errors) or "no provider configured"
+        super().__init__(None, f"All providers failed ({detail})")
+        self.errors = errors
+        self.retry_after = retry_after
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["attempts"] = [e.to_dict() for e in self.errors]
+        return data
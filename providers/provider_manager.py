@@ -1,14 +1,51 @@
+import asyncio
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 from .groq_provider import GroqProvider
 from .cerebras_provider import CerebrasProvider
 from .remote_provider import RemoteProvider
+from .routing import ProviderStats
+from .circuit_breaker import CircuitBreaker
+from .rate_limiter import AdmissionRejected, estimate_tokens
+from .errors import (ProviderError, ProviderTimeoutError, ProviderUnavailableError, ProviderRateLimitError,
+                     CircuitOpenError, NoProviderAvailableError)
+from metrics import provider_request_seconds, provider_ttft_seconds, provider_errors, provider_queue_wait_seconds
 
 class ProviderManager:
     def __init__(self, env_file):
         load_dotenv(env_file)
         self.providers = {}
+        self._configured = {}
         self.current_provider = None
+        self.shared_state = None
+        self.stats = {}
+        self.breakers = {}
+
+        # "fixed" always uses current_provider; "latency" picks the fastest
+        # healthy provider per request and can hedge to a second one
+        self.routing = os.getenv('PROVIDER_ROUTING', 'fixed')
+        self.hedge = os.getenv('PROVIDER_HEDGE', '').lower() in ('1', 'true', 'yes')
+        self.hedge_percentile = float(os.getenv('PROVIDER_HEDGE_PERCENTILE', '95'))
+        self.hedge_min_delay = float(os.getenv('PROVIDER_HEDGE_MIN_DELAY', '0.5'))
+        self.max_error_rate = float(os.getenv('PROVIDER_MAX_ERROR_RATE', '0.5'))
+        # Calls wait for upstream quota in each provider's admission queue;
+        # interactive chat gives up sooner so it can fail over
+        self.admission = os.getenv('PROVIDER_ADMISSION', 'true').lower() not in ('0', 'false', 'no')
+        self.queue_timeouts = {
+            "interactive": float(os.getenv('PROVIDER_QUEUE_TIMEOUT', '5')),
+            "batch": float(os.getenv('PROVIDER_BATCH_QUEUE_TIMEOUT', '60'))
+        }
+        # Hedged calls run on this pool: by default one primary and one hedge
+        # per request thread of this worker. When every thread is busy the
+        # request is served unhedged on its own thread rather than queueing
+        # behind other requests' calls, which would make the hedge delay moot.
+        hedge_workers = int(os.getenv('PROVIDER_HEDGE_WORKERS') or 2 * int(os.getenv('WEB_THREADS', '8')))
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix='provider-hedge')
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+        self.hedges = {"fired": 0, "skipped": 0}
         self.load_providers()
 
     def load_providers(self):
@@ -17,6 +54,7 @@ class ProviderManager:
         if remote_url:
             print(f"Initializing Remote Provider with URL: {remote_url}")
             self.providers['remote'] = RemoteProvider(remote_url)
+            self._configured['remote'] = remote_url
             self.current_provider = self.providers['remote']
             return
 
@@ -26,8 +64,10 @@ class ProviderManager:
         
         if groq_key:
             self.providers['groq'] = GroqProvider(groq_key)
+            self._configured['groq'] = groq_key
         if cerebras_key:
             self.providers['cerebras'] = CerebrasProvider(cerebras_key)
+            self._configured['cerebras'] = cerebras_key
             
         current = os.getenv('CURRENT_PROVIDER', 'groq')
         if current in self.providers:
@@ -42,18 +82,345 @@ class ProviderManager:
         return self.current_provider.name if self.current_provider else None
 
     def switch_provider(self, name):
+        if not self._switch_local(name):
+            return False
+        if self.shared_state is not None:
+            self.shared_state.set('current_provider', name)
+        return True
+
+    def _switch_local(self, name):
         if name in self.providers:
             self.current_provider = self.providers[name]
             return True
         return False
 
     def add_provider(self, name, api_key):
+        if not self._install_provider(name, api_key):
+            return False
+        if self.shared_state is not None:
+            self.shared_state.set(f'provider_key:{name}', api_key)
+        return True
+
+    def _install_provider(self, name, api_key):
         if name == 'groq':
-            self.providers['groq'] = GroqProvider(api_key)
+            provider = GroqProvider(api_key)
         elif name == 'cerebras':
-            self.providers['cerebras'] = CerebrasProvider(api_key)
+            provider = CerebrasProvider(api_key)
         elif name == 'remote':
-            self.providers['remote'] = RemoteProvider(api_key) # api_key here acts as URL
+            provider = RemoteProvider(api_key) # api_key here acts as URL
         else:
             return False
+        # Copy-on-write so request threads iterating the providers never see
+        # the dict change under them (the shared-state watcher installs too)
+        previous = self.providers.get(name)
+        providers = dict(self.providers)
+        providers[name] = provider
+        self.providers = providers
+        self._configured[name] = api_key
+        if self.current_provider is previous and previous is not None:
+            self.current_provider = provider
+        # Release the pooled connections of the provider being replaced
+        if previous is not None:
+            previous.close()
         return True
+
+    def use_shared_state(self, state):
+        # Keys and the selected provider set through /api/setup are written to
+        # a store shared by all worker processes, and changes made by other
+        # workers are applied here as they land
+        self.shared_state = state
+        for key, api_key in state.items('provider_key:').items():
+            self._on_shared_change(key, api_key)
+        current = state.get('current_provider')
+        if current:
+            self._switch_local(current)
+        state.subscribe(self._on_shared_change)
+
+    def _on_shared_change(self, key, value):
+        if key.startswith('provider_key:'):
+            name = key.split(':', 1)[1]
+            if self._configured.get(name) != value:
+                print(f"Provider {name} updated by another worker")
+                self._install_provider(name, value)
+        elif key == 'current_provider' and self.get_provider_name() != value:
+            self._switch_local(value)
+
+    def get_stats(self, name):
+        if name not in self.stats:
+            self.stats[name] = ProviderStats()
+        return self.stats[name]
+
+    def get_breaker(self, name):
+        if name not in self.breakers:
+            self.breakers[name] = CircuitBreaker(
+                failure_threshold=int(os.getenv('PROVIDER_BREAKER_FAILURES', '3')),
+                recovery_timeout=float(os.getenv('PROVIDER_BREAKER_RECOVERY', '30')),
+                half_open_probes=int(os.getenv('PROVIDER_BREAKER_PROBES', '1'))
+            )
+        return self.breakers[name]
+
+    def failover_chain(self):
+        # Explicit PROVIDER_FAILOVER order, else the current provider first
+        # followed by the remaining configured ones
+        names = [n.strip() for n in os.getenv('PROVIDER_FAILOVER', '').split(',') if n.strip()]
+        if not names:
+            current = self.get_provider_name()
+            names = ([current] if current else []) + [n for n in self.providers if n != current]
+        return [self.providers[n] for n in names if n in self.providers]
+
+    def ranked_providers(self):
+        chain = self.failover_chain()
+        if self.routing != 'latency' or len(chain) < 2:
+            return chain
+        healthy, degraded = [], []
+        for provider in chain:
+            stats = self.get_stats(provider.name)
+            (healthy if stats.healthy(self.max_error_rate) else degraded).append(provider)
+        healthy.sort(key=lambda p: self.get_stats(p.name).score())
+        degraded.sort(key=lambda p: self.get_stats(p.name).error_ewma)
+        return healthy + degraded
+
+    def select_provider(self):
+        for provider in self.ranked_providers():
+            if self.get_breaker(provider.name).state != CircuitBreaker.OPEN:
+                return provider
+        return None
+
+    def hedge_delay(self, provider):
+        stats = self.get_stats(provider.name)
+        return max(self.hedge_min_delay, stats.percentile(self.hedge_percentile, default=self.hedge_min_delay))
+
+    def routing_snapshot(self):
+        return {
+            "routing": self.routing,
+            "hedge": self.hedge,
+            "hedges": dict(self.hedges),
+            "failover": [p.name for p in self.failover_chain()],
+            "providers": {
+                name: dict(self.get_stats(name).snapshot(), circuit=self.get_breaker(name).snapshot(),
+                           admission=provider.limiter.snapshot())
+                for name, provider in self.providers.items()
+            }
+        }
+
+    def _admit(self, provider, messages, priority='interactive'):
+        breaker = self.get_breaker(provider.name)
+        if not breaker.allow_request():
+            raise CircuitOpenError(provider.name, breaker.retry_after())
+        if self.admission:
+            try:
+                self._wait_for_quota(provider, estimate_tokens(messages), priority)
+            except BaseException:
+                # However admission ends, a half-open circuit gets its probe back
+                breaker.release_probe()
+                raise
+
+    async def _aadmit(self, provider, messages, priority='interactive'):
+        # Queued on the event loop, so a cancelled request (client gone, hedge
+        # lost) leaves the admission queue instead of a thread waiting it out
+        breaker = self.get_breaker(provider.name)
+        if not breaker.allow_request():
+            raise CircuitOpenError(provider.name, breaker.retry_after())
+        if not self.admission:
+            return
+        try:
+            await self._await_quota(provider, estimate_tokens(messages), priority)
+        except BaseException:
+            breaker.release_probe()
+            raise
+
+    def _queue_timeout(self, priority):
+        return self.queue_timeouts.get(priority, self.queue_timeouts["interactive"])
+
+    def _admission_error(self, provider, e):
+        provider_errors.inc(provider=provider.name, kind='admission')
+        return ProviderRateLimitError(provider.name, str(e), retry_after=e.retry_after)
+
+    def _wait_for_quota(self, provider, cost, priority):
+        try:
+            waited = provider.limiter.acquire(cost, priority, self._queue_timeout(priority))
+        except AdmissionRejected as e:
+            raise self._admission_error(provider, e) from e
+        provider_queue_wait_seconds.observe(waited, provider=provider.name, priority=priority)
+
+    async def _await_quota(self, provider, cost, priority):
+        try:
+            waited = await provider.limiter.aacquire(cost, priority, self._queue_timeout(priority))
+        except AdmissionRejected as e:
+            raise self._admission_error(provider, e) from e
+        provider_queue_wait_seconds.observe(waited, provider=provider.name, priority=priority)
+
+    def _record(self, provider, start, error=None, mode='chat'):
+        elapsed = time.perf_counter() - start
+        self.get_stats(provider.name).record(elapsed, error is None)
+        provider_request_seconds.observe(elapsed, provider=provider.name, mode=mode)
+        breaker = self.get_breaker(provider.name)
+        if error is not None:
+            print(f"Provider {provider.name} failed: {error}")
+            provider_errors.inc(provider=provider.name, kind=getattr(error, 'kind', 'error'))
+        # Only an upstream that is down or not answering trips the circuit. A
+        # 4xx (bad or too long prompt, 429 already pausing the limiter) shows
+        # it is up, so one user's requests cannot disable it for everyone.
+        if isinstance(error, (ProviderTimeoutError, ProviderUnavailableError)):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def _call(self, provider, messages, priority='interactive'):
+        self._admit(provider, messages, priority)
+        start = time.perf_counter()
+        try:
+            response = provider.chat(messages)
+        except ProviderError as e:
+            self._record(provider, start, e)
+            raise
+        self._record(provider, start)
+        return response
+
+    async def _acall(self, provider, messages, priority='interactive'):
+        await self._aadmit(provider, messages, priority)
+        start = time.perf_counter()
+        try:
+            response = await provider.achat(messages)
+        except asyncio.CancelledError:
+            self.get_breaker(provider.name).release_probe()
+            raise
+        except ProviderError as e:
+            self._record(provider, start, e, mode='async')
+            raise
+        self._record(provider, start, mode='async')
+        return response
+
+    def _no_provider(self, errors):
+        waits = [e.retry_after for e in errors
+                 if isinstance(e, (CircuitOpenError, ProviderRateLimitError)) and e.retry_after is not None]
+        retry_after = min(waits) if waits and len(waits) == len(errors) else None
+        return NoProviderAvailableError(errors, retry_after=retry_after)
+
+    def chat(self, messages, priority='interactive'):
+        # Walk the chain (latency-ranked when routing is on), skipping open
+        # circuits, until one provider answers
+        candidates = self.ranked_providers()
+        errors = []
+        while candidates:
+            primary = candidates.pop(0)
+            try:
+                if self.hedge and candidates:
+                    return self._hedged_chat(primary, candidates, messages, errors, priority)
+                return self._call(primary, messages, priority)
+            except ProviderError as e:
+                errors.append(e)
+        raise self._no_provider(errors)
+
+    def _submit_hedged(self, provider, messages, priority):
+        # -> future, or None when every hedge thread is taken
+        if not self._hedge_slots.acquire(blocking=False):
+            self.hedges["skipped"] += 1
+            return None
+        future = self._executor.submit(self._call, provider, messages, priority)
+        # Done callbacks also run for futures cancelled before they started
+        future.add_done_callback(lambda f: self._hedge_slots.release())
+        return future
+
+    def _hedged_chat(self, primary, candidates, messages, errors, priority='interactive'):
+        # Hedge: give the primary its usual p95, then race the next provider.
+        # Whichever answers first wins; the loser's future is cancelled if it
+        # has not started, otherwise its late answer is discarded (its latency
+        # still feeds the stats).
+        first = self._submit_hedged(primary, messages, priority)
+        if first is None:
+            return self._call(primary, messages, priority)
+        done, _ = wait([first], timeout=self.hedge_delay(primary))
+        if done:
+            return first.result()
+
+        second = self._submit_hedged(candidates[0], messages, priority)
+        if second is None:
+            return first.result()
+        candidates.pop(0)
+        self.hedges["fired"] += 1
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except ProviderError as e:
+                    errors.append(e)
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                return response
+        raise errors.pop()
+
+    async def achat(self, messages, priority='interactive'):
+        candidates = self.ranked_providers()
+        errors = []
+        while candidates:
+            primary = candidates.pop(0)
+            try:
+                if self.hedge and candidates:
+                    return await self._hedged_achat(primary, candidates, messages, errors, priority)
+                return await self._acall(primary, messages, priority)
+            except ProviderError as e:
+                errors.append(e)
+        raise self._no_provider(errors)
+
+    async def _hedged_achat(self, primary, candidates, messages, errors, priority='interactive'):
+        # Same policy as _hedged_chat(); on the event loop the loser is really cancelled
+        first = asyncio.ensure_future(self._acall(primary, messages, priority))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay(primary))
+        if done:
+            return first.result()
+
+        backup = candidates.pop(0)
+        self.hedges["fired"] += 1
+        second = asyncio.ensure_future(self._acall(backup, messages, priority))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return task.result()
+                    except ProviderError as e:
+                        errors.append(e)
+            raise errors.pop()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def chat_stream(self, messages, priority='interactive'):
+        # Fail over only until the first token; after that the answer is
+        # already on its way to the client and cannot be restarted elsewhere
+        errors = []
+        for provider in self.ranked_providers():
+            try:
+                self._admit(provider, messages, priority)
+            except (CircuitOpenError, ProviderRateLimitError) as e:
+                errors.append(e)
+                continue
+            start = time.perf_counter()
+            stream = provider.chat_stream(messages)
+            try:
+                first = next(stream, None)
+            except ProviderError as e:
+                self._record(provider, start, e, mode='stream')
+                errors.append(e)
+                continue
+            provider_ttft_seconds.observe(time.perf_counter() - start, provider=provider.name)
+            try:
+                if first:
+                    yield first
+                yield from stream
+            except ProviderError as e:
+                self._record(provider, start, e, mode='stream')
+                raise
+            except GeneratorExit:
+                # Client went away mid-stream: no verdict on the provider
+                self.get_breaker(provider.name).release_probe()
+                stream.close()
+                raise
+            self._record(provider, start, mode='stream')
+            return
+        raise self._no_provider(errors)
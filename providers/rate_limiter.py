@@ -0,0 +1,268 @@
+import asyncio
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_reset(value):
+    # Groq sends durations like "2m59.56s" or "120ms", Cerebras plain seconds
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, matched = 0.0, False
+    for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "h": 3600.0, "m": 60.0, "s": 1.0}[unit]
+    return total if matched else None
+
+def estimate_tokens(messages):
+    # ~4 characters per token for the prompt plus the expected completion
+    chars = sum(len(str(m.get('content', ''))) for m in messages)
+    return chars // 4 + int(os.getenv('PROVIDER_COMPLETION_ESTIMATE', '256'))
+
+class TokenBucket:
+    # Unlimited until the upstream reports a limit. Between reports the level
+    # refills linearly at the rate implied by the last report: the missing
+    # quota comes back by the reset time.
+
+    def __init__(self):
+        self.capacity = None
+        self.level = 0.0
+        self.rate = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost, now):
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        # A request larger than the whole quota waits for a full bucket, not forever
+        cost = min(cost, self.capacity)
+        if self.level >= cost:
+            return 0.0
+        if self.rate <= 0:
+            return 1.0
+        return (cost - self.level) / self.rate
+
+    def take(self, cost):
+        if self.capacity is not None:
+            self.level -= min(cost, self.capacity)
+
+    def update(self, limit, remaining, reset, now):
+        # A report can predate calls admitted while its response was in
+        # flight, so after the first one it only ever lowers the estimate
+        if remaining is None:
+            return
+        first = self.capacity is None
+        if limit is not None:
+            self.capacity = limit
+        elif first or remaining > self.capacity:
+            self.capacity = remaining
+        if first:
+            self.level = remaining
+        else:
+            self._refill(now)
+            self.level = min(self.level, remaining)
+        self.updated = now
+        if reset and reset > 0 and self.capacity > remaining:
+            self.rate = (self.capacity - remaining) / reset
+
+    def snapshot(self):
+        if self.capacity is None:
+            return None
+        return {"capacity": self.capacity, "level": round(self.level, 1), "rate": round(self.rate, 3)}
+
+class _Waiter:
+    def __init__(self, cost, deadline, wake=None):
+        self.cost = cost
+        self.deadline = deadline
+        self.evicted = False
+        # Async waiters are woken through their event loop, not the condition
+        self.wake = wake
+
+class AdmissionScheduler:
+    # Per-provider admission control in front of upstream calls. Requests and
+    # tokens each have a bucket that is re-synced from the x-ratelimit-*
+    # headers of every response. Calls that cannot go now wait in a bounded
+    # priority queue: interactive chat is admitted before batch work, and a
+    # full queue sheds its lowest-priority waiter to make room. Waiters give
+    # up at their deadline so a starved provider can be failed over.
+
+    def __init__(self, max_queue=None):
+        self.max_queue = max_queue or int(os.getenv('PROVIDER_QUEUE_SIZE', '64'))
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+        self.paused_until = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _wait_time(self, cost, now):
+        return max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(cost, now), 0.0)
+
+    def _admit(self, cost, waited):
+        self.requests.take(1)
+        self.tokens.take(cost)
+        self.admitted += 1
+        self.queue_wait_total += waited
+
+    def _notify(self):
+        self._cond.notify_all()
+        for _, _, waiter in self._queue:
+            if waiter.wake is not None:
+                waiter.wake()
+
+    def _enqueue(self, cost, priority, start, waiter):
+        # Under the lock: None when admitted at once, otherwise the queue entry
+        rank = PRIORITIES.get(priority, 0)
+        if not self._queue and self._wait_time(cost, start) == 0:
+            self._admit(cost, 0.0)
+            return None
+        if len(self._queue) >= self.max_queue:
+            worst = max(self._queue)
+            if worst[0] <= rank:
+                self.rejected += 1
+                raise AdmissionRejected("Rate limit queue is full", self._wait_time(cost, start))
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            worst[2].evicted = True
+            if worst[2].wake is not None:
+                worst[2].wake()
+        entry = (rank, next(self._seq), waiter)
+        heapq.heappush(self._queue, entry)
+        self._notify()
+        return entry
+
+    def _poll(self, entry, start):
+        # Under the lock: (seconds queued, None) once admitted, otherwise
+        # (None, seconds to sleep before polling again)
+        waiter = entry[2]
+        now = time.monotonic()
+        if waiter.evicted:
+            self.rejected += 1
+            raise AdmissionRejected("Displaced by higher-priority requests", self._wait_time(waiter.cost, now))
+        delay = None
+        if self._queue[0] is entry:
+            delay = self._wait_time(waiter.cost, now)
+            if delay == 0:
+                heapq.heappop(self._queue)
+                self._admit(waiter.cost, now - start)
+                self._notify()
+                return now - start, None
+        remaining = waiter.deadline - now
+        if remaining <= 0:
+            self._remove(entry)
+            self.rejected += 1
+            raise AdmissionRejected("Timed out waiting for rate limit", delay)
+        return None, (min(delay, remaining) if delay is not None else remaining)
+
+    def _remove(self, entry):
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._notify()
+
+    def acquire(self, cost, priority="interactive", timeout=10.0):
+        # Blocks until admitted and returns the seconds spent queued;
+        # raises AdmissionRejected when the queue is full or the deadline passes
+        start = time.monotonic()
+        with self._cond:
+            entry = self._enqueue(cost, priority, start, _Waiter(cost, start + timeout))
+            if entry is None:
+                return 0.0
+            while True:
+                waited, sleep = self._poll(entry, start)
+                if sleep is None:
+                    return waited
+                self._cond.wait(sleep)
+
+    async def aacquire(self, cost, priority="interactive", timeout=10.0):
+        # acquire() for the event loop: no thread is held while queued, and a
+        # cancelled task leaves the queue at once
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(woken.set)
+            except RuntimeError:
+                # Loop already closed; its task is gone too
+                pass
+
+        start = time.monotonic()
+        with self._cond:
+            entry = self._enqueue(cost, priority, start, _Waiter(cost, start + timeout, wake))
+        if entry is None:
+            return 0.0
+        try:
+            while True:
+                woken.clear()
+                with self._cond:
+                    waited, sleep = self._poll(entry, start)
+                if sleep is None:
+                    return waited
+                try:
+                    await asyncio.wait_for(woken.wait(), sleep)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._cond:
+                self._remove(entry)
+            raise
+
+    def observe(self, headers):
+        # Re-sync both buckets from a response's x-ratelimit-* headers
+        values = {k.lower(): v for k, v in headers.items() if k.lower().startswith('x-ratelimit-')}
+        if not values:
+            return
+        now = time.monotonic()
+        with self._cond:
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                fields = {}
+                for field in ("limit", "remaining", "reset"):
+                    prefix = f"x-ratelimit-{field}-{kind}"
+                    fields[field] = next((v for k, v in values.items() if k.startswith(prefix)), None)
+                try:
+                    limit = float(fields["limit"]) if fields["limit"] is not None else None
+                    remaining = float(fields["remaining"]) if fields["remaining"] is not None else None
+                except ValueError:
+                    continue
+                bucket.update(limit, remaining, parse_reset(fields["reset"]), now)
+            self._notify()
+
+    def pause(self, seconds):
+        # A 429 got through anyway: hold every waiter until Retry-After
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + (seconds or 1.0))
+            self._notify()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "mean_queue_wait": round(self.queue_wait_total / self.admitted, 4) if self.admitted else 0.0,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                "requests": self.requests.snapshot(),
+                "tokens": self.tokens.snapshot()
+            }
@@ -1,33 +1,209 @@
-import requests
 import json
+import os
+import threading
+import uuid
+
+import requests
+from http_compression import accept_encoding_header, choose_encoding, compress, response_body, supported_encodings
+from retrieval import question_text
 from .base_provider import BaseProvider
+from .errors import ProviderResponseError, ProviderUnavailableError
 
 class RemoteProvider(BaseProvider):
-    def __init__(self, api_url):
+    def __init__(self, api_url, read_timeout=30):
+        # The cloud server handles the API keys, so there is no key to keep
+        super().__init__(None, read_timeout=read_timeout)
         # API URL should be the base URL of the cloud server
-        self.api_url = api_url.rstrip('/') + "/api/chat"
+        self.base_url = api_url.rstrip('/')
+        self.api_url = self.base_url + "/api/chat"
+        self.stream_url = self.base_url + "/api/chat/stream"
         self.name = "remote"
 
+        # Conversation as last acknowledged by the cloud server's session
+        # protocol: {"id", "version", "history"}
+        self._conversation = None
+        self._conversation_lock = threading.Lock()
+
+        # REMOTE_COMPRESSION: "auto" compresses request bodies once the server
+        # advertises the codings it accepts, "gzip"/"zstd" always use that
+        # coding, "off" sends and asks for plain JSON
+        self.compression = os.getenv('REMOTE_COMPRESSION', 'auto').lower()
+        self.compress_min_bytes = int(os.getenv('REMOTE_COMPRESS_MIN_BYTES', '512'))
+        self._request_encoding = self.compression if self.compression in supported_encodings() else None
+        self.accept_encoding = 'identity' if self.compression == 'off' else accept_encoding_header()
+
+    def _payload(self, messages, force_full=False):
+        # The cloud server handles the API keys and its own system prompt, so
+        # only user/assistant turns are sent. When our history is a suffix of
+        # what the server already holds, only the new message goes over the
+        # wire; otherwise the full history re-seeds the session.
+        turns = [{"role": m['role'], "content": m['content']}
+                 for m in messages if m.get('role') in ('user', 'assistant')]
+        message = turns[-1]['content'] if turns else ""
+        history = turns[:-1]
+        # The UI keeps the plain question in its history and sends it again
+        # with the resume as the message; the server stores only the question
+        question = question_text(message)
+        if history and history[-1]['role'] == 'user' and history[-1]['content'] in (question, message):
+            history = history[:-1]
+
+        with self._conversation_lock:
+            known = self._conversation
+        if known and history and not force_full:
+            synced = known['history']
+            if len(history) <= len(synced) and synced[len(synced) - len(history):] == history:
+                data = {"session_id": known['id'], "version": known['version'], "message": message}
+                return data, (known['id'], known['history'], question)
+
+        session_id = known['id'] if known and history else uuid.uuid4().hex
+        data = {"session_id": session_id, "messages": history, "message": message}
+        return data, (session_id, history, question)
+
+    def _remember(self, turn, result, response):
+        # `history` is the server-side history the new turn was appended to,
+        # and `question` the user text the server stored for it
+        session_id, history, question = turn
+        with self._conversation_lock:
+            if result.get('session_id') == session_id and result.get('version') is not None \
+                    and not result.get('diverged'):
+                self._conversation = {
+                    "id": session_id,
+                    "version": result['version'],
+                    "history": history + [{"role": "user", "content": question},
+                                          {"role": "assistant", "content": response}]
+                }
+            else:
+                self._conversation = None
+
+    def _encode(self, data, accept=None):
+        # Compact JSON, compressed when the server is known to accept it
+        body = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        headers = {"Content-Type": "application/json", "Accept-Encoding": self.accept_encoding}
+        if accept:
+            headers["Accept"] = accept
+        encoding = self._request_encoding
+        if encoding and len(body) >= self.compress_min_bytes:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+        return body, headers
+
+    def _learn(self, response, headers):
+        if response.status_code == 415 and 'Content-Encoding' in headers:
+            # The server does not take compressed bodies after all
+            self._request_encoding = None
+            return True
+        if self.compression == 'auto':
+            accepted = response.headers.get('Accept-Encoding')
+            if accepted:
+                self._request_encoding = choose_encoding(accepted)
+        return False
+
+    def _post(self, url, data, stream=False, accept=None):
+        body, headers = self._encode(data, accept)
+        response = self.session.post(url, headers=headers, data=body, timeout=self.timeout, stream=stream)
+        if self._learn(response, headers):
+            response.close()
+            body, headers = self._encode(data, accept)
+            response = self.session.post(url, headers=headers, data=body, timeout=self.timeout, stream=stream)
+        return response
+
+    async def _apost(self, client, url, data):
+        body, headers = self._encode(data)
+        response = await client.post(url, headers=headers, content=body)
+        if self._learn(response, headers):
+            body, headers = self._encode(data)
+            response = await client.post(url, headers=headers, content=body)
+        return response
+
+    def _json(self, response):
+        return json.loads(response_body(response))
+
+    def _check_response(self, response):
+        # Surface the cloud server's own error message instead of a bare status line
+        if response.status_code < 400:
+            return
+        try:
+            detail = self._json(response).get('error')
+        except ValueError:
+            detail = None
+        if isinstance(detail, dict):
+            detail = detail.get('message')
+        reason = detail or getattr(response, 'reason', None) or getattr(response, 'reason_phrase', '')
+        raise requests.exceptions.HTTPError(f"Cloud server error {response.status_code}: {reason}", response=response)
+
+    def _read_result(self, result):
+        # The cloud server returns {"response": "AI response"}
+        if not result.get('response'):
+            raise ProviderResponseError(self.name, "Empty response from cloud server")
+        return result['response']
+
     def chat(self, messages):
-        headers = {
-            "Content-Type": "application/json"
-        }
-        # We send the messages directly. The cloud server handles the API keys.
-        data = {
-            "messages": messages,
-            "message": messages[-1]['content'] if messages else "" 
-        }
+        data, turn = self._payload(messages)
         
         try:
             print(f"Sending request to {self.api_url}")
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=30)
-            response.raise_for_status()
-            
-            # The cloud server returns {"response": "AI response"}
-            result = response.json()
-            return result.get('response', "Error: Empty response from server")
-            
-        except requests.exceptions.RequestException as e:
-            return f"Error connecting to cloud server: {str(e)}"
+            response = self._post(self.api_url, data)
+            if response.status_code == 409 and 'messages' not in data:
+                # Session diverged on the server: resend the full history once
+                data, turn = self._payload(messages, force_full=True)
+                response = self._post(self.api_url, data)
+            self._check_response(response)
+            result = self._json(response)
+            text = self._read_result(result)
+            self._remember(turn, result, text)
+            return text
+        except Exception as e:
+            raise self.wrap_error(e) from e
+
+    async def achat(self, messages):
+        client = self.async_client()
+        if client is None:
+            return await super().achat(messages)
+        data, turn = self._payload(messages)
+        try:
+            response = await self._apost(client, self.api_url, data)
+            if response.status_code == 409 and 'messages' not in data:
+                data, turn = self._payload(messages, force_full=True)
+                response = await self._apost(client, self.api_url, data)
+            self._check_response(response)
+            result = self._json(response)
+            text = self._read_result(result)
+            self._remember(turn, result, text)
+            return text
+        except Exception as e:
+            raise self.wrap_error(e) from e
+
+    def chat_stream(self, messages):
+        data, turn = self._payload(messages)
+
+        try:
+            response = self._post(self.stream_url, data, stream=True, accept="text/event-stream")
+            if response.status_code == 409 and 'messages' not in data:
+                response.close()
+                data, turn = self._payload(messages, force_full=True)
+                response = self._post(self.stream_url, data, stream=True, accept="text/event-stream")
+            with response:
+                if response.status_code == 404:
+                    # Older cloud server without the SSE endpoint
+                    yield self.chat(messages)
+                    return
+                self._check_response(response)
+
+                # The cloud server sends {"delta": "..."} events, then the
+                # session fields, then [DONE]
+                parts = []
+                result = {}
+                for event in self.iter_sse_data(response):
+                    error = event.get('error')
+                    if error:
+                        message = error.get('message') if isinstance(error, dict) else error
+                        raise ProviderUnavailableError(self.name, f"Cloud server error: {message}")
+                    if event.get('delta'):
+                        parts.append(event['delta'])
+                        yield event['delta']
+                    elif 'session_id' in event:
+                        result = event
+                self._remember(turn, result, "".join(parts))
+
         except Exception as e:
-            return f"Error: {str(e)}"
+            raise self.wrap_error(e) from e
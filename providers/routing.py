@@ -0,0 +1,50 @@
+import threading
+from collections import deque
+
+class ProviderStats:
+    # Rolling health of one provider: EWMA latency and error rate plus a small
+    # window of recent latencies for percentile-based hedge deadlines.
+
+    def __init__(self, alpha=0.2, window=200):
+        self.alpha = alpha
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.requests = 0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.requests += 1
+            self.error_ewma = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_ewma
+            if ok:
+                self.recent.append(latency)
+                if self.latency_ewma is None:
+                    self.latency_ewma = latency
+                else:
+                    self.latency_ewma = self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+
+    def percentile(self, pct, default=None):
+        with self._lock:
+            if not self.recent:
+                return default
+            ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def healthy(self, max_error_rate):
+        return self.error_ewma < max_error_rate
+
+    def score(self):
+        # Unmeasured providers score 0 so they get tried once; errors inflate
+        # latency so a fast but flaky vendor loses to a slower reliable one
+        latency = self.latency_ewma or 0.0
+        return latency * (1.0 + 4.0 * self.error_ewma)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "latency_ewma": round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+                "error_rate": round(self.error_ewma, 4)
+            }
@@ -0,0 +1,111 @@
+import os
+import time
+
+from providers.base_provider import create_session
+from providers.circuit_breaker import CircuitBreaker
+
+class RemoteOCRError(Exception):
+    pass
+
+class RemoteOCRClient:
+    # Desktop side of the cloud /api/ocr_remote endpoint. Captures go through
+    # the local preprocessor first (blank regions and repeats never leave the
+    # machine), are re-encoded as small grayscale images and posted over one
+    # keep-alive session. A slow or failing server trips a breaker and the
+    # local engine takes over until the recovery timeout passes; the engine is
+    # only ever loaded on that fallback path.
+
+    def __init__(self, base_url, timeout=4.0, image_format='png', fallback=True, max_side=2560):
+        self.base_url = base_url.rstrip('/')
+        self.url = self.base_url + "/api/ocr_remote"
+        self.timeout = timeout
+        self.image_format = image_format
+        self.fallback = fallback
+        self.max_side = max_side
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('OCR_REMOTE_FAILURES', '2')),
+            recovery_timeout=float(os.getenv('OCR_REMOTE_RECOVERY', '60'))
+        )
+        # Retries would only stretch a slow call past the point of falling back
+        self.session = create_session(pool_size=2, max_retries=0)
+
+    def encode(self, image_bytes):
+        try:
+            from image_preprocess import compact_encode
+            return compact_encode(image_bytes, self.image_format, self.max_side)
+        except Exception as e:
+            print(f"Compact OCR encoding failed, uploading capture as is: {e}")
+            return image_bytes, 'png'
+
+    def upload(self, image_bytes):
+        body, extension = self.encode(image_bytes)
+        files = {"image": (f"capture.{extension}", body, f"image/{extension}")}
+        try:
+            # Connecting gets the same budget as the whole call
+            response = self.session.post(self.url, files=files, timeout=(self.timeout, self.timeout))
+        except Exception as e:
+            raise RemoteOCRError(f"Remote OCR unreachable: {e}") from e
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code != 200 or 'error' in data:
+            raise RemoteOCRError(f"Remote OCR failed ({response.status_code}): {data.get('error', response.reason)}")
+        return data.get('text', ''), data.get('method', 'Cloud OCR')
+
+    def recognize(self, image_bytes, ocr_engine, preprocessor=None, timings=None):
+        # -> (text, method). ocr_engine is a callable returning the local
+        # engine; timings, when given, gets "prepare", "upload" and
+        # "fallback" stages in seconds.
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        result, image, key = None, image_bytes, None
+        if preprocessor is not None:
+            result, image, key = preprocessor.lookup(image_bytes)
+        timings["prepare"] = time.perf_counter() - start
+        if result is not None:
+            return result
+
+        error = None
+        if self.breaker.allow_request():
+            start = time.perf_counter()
+            try:
+                result = self.upload(image)
+                self.breaker.record_success()
+            except RemoteOCRError as e:
+                self.breaker.record_failure()
+                print(f"{e}; using local OCR" if self.fallback else str(e))
+                error = e
+            timings["upload"] = time.perf_counter() - start
+        else:
+            error = RemoteOCRError(f"Remote OCR paused for {self.breaker.retry_after():.0f}s after failures")
+
+        if result is None:
+            if not self.fallback:
+                raise error
+            start = time.perf_counter()
+            result = ocr_engine().extract_text_from_image(image)
+            timings["fallback"] = time.perf_counter() - start
+        if preprocessor is not None:
+            preprocessor.remember(key, result)
+        return result
+
+    def close(self):
+        self.session.close()
+
+def remote_ocr_from_env():
+    # OCR_MODE=remote sends captures to OCR_REMOTE_URL (default: the
+    # REMOTE_SERVER_URL cloud server); anything else keeps OCR local
+    if os.getenv('OCR_MODE', 'local').lower() != 'remote':
+        return None
+    url = os.getenv('OCR_REMOTE_URL') or os.getenv('REMOTE_SERVER_URL')
+    if not url:
+        print("OCR_MODE=remote needs OCR_REMOTE_URL or REMOTE_SERVER_URL; using local OCR")
+        return None
+    return RemoteOCRClient(
+        url,
+        timeout=float(os.getenv('OCR_REMOTE_TIMEOUT', '4')),
+        image_format=os.getenv('OCR_REMOTE_FORMAT', 'png').lower(),
+        fallback=os.getenv('OCR_REMOTE_FALLBACK', 'on').lower() not in ('0', 'off', 'false'),
+        max_side=int(os.getenv('OCR_REMOTE_MAX_SIDE', '2560'))
+    )
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class ResponseCache:
+    # Two-tier cache for chat completions: an LRU+TTL dict in memory and an
+    # optional directory of JSON files that survives restarts. Concurrent
+    # identical requests share a single upstream call (singleflight).
+
+    def __init__(self, max_entries=256, max_bytes=8 * 1024 * 1024, ttl=600,
+                 disk_dir=None, disk_max_entries=2048):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._disk_writes = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "shared": 0, "bypassed": 0, "evictions": 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(messages):
+        # Only role and content matter; whitespace differences are not new
+        # prompts. The provider is left out: with routing and failover the
+        # one that answers is not known until after the lookup.
+        normalized = [
+            {"role": m.get('role'), "content": " ".join(str(m.get('content', '')).split())}
+            for m in messages
+        ]
+        raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def cacheable(value):
+        # Provider failures are raised as ProviderError and never reach the cache
+        return isinstance(value, str) and bool(value)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                self._remove(key)
+
+        value = self._disk_get(key, now)
+        if value is not None:
+            with self._lock:
+                self.counters["disk_hits"] += 1
+                self._store(key, value, now)
+        return value
+
+    def set(self, key, value):
+        if not self.cacheable(value):
+            return
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+        self._disk_set(key, value, now)
+
+    def get_or_call(self, key, fn, bypass=False):
+        if bypass:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return fn()
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+                self.counters["misses"] += 1
+            else:
+                self.counters["shared"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            self.set(key, call.result)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    async def aget_or_call(self, key, coro_fn, bypass=False):
+        # Event-loop flavour of get_or_call for the ASGI serving mode
+        if bypass:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return await coro_fn()
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        future = self._async_inflight.get(key)
+        if future is not None:
+            with self._lock:
+                self.counters["shared"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_inflight[key] = future
+        with self._lock:
+            self.counters["misses"] += 1
+        try:
+            result = await coro_fn()
+            self.set(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unshared failure does not warn on collection
+            future.exception()
+            raise
+        finally:
+            self._async_inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hit_count = self.counters["hits"] + self.counters["disk_hits"]
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                in_flight=len(self._inflight) + len(self._async_inflight),
+                hit_rate=round(hit_count / lookups, 4) if lookups else 0.0
+            )
+
+    # Memory tier (caller holds self._lock)
+
+    def _store(self, key, value, now):
+        self._remove(key)
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (now + self.ttl, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.counters["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= len(entry[1].encode('utf-8'))
+
+    # Disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.json')
+
+    def _disk_get(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires_at', 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get('value')
+
+    def _disk_set(self, key, value, now):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"expires_at": now + self.ttl, "value": value}, f)
+            os.replace(temp_path, path)
+            self._disk_writes += 1
+            if self._disk_writes % 64 == 0:
+                self._disk_prune()
+        except OSError as e:
+            print(f"Response cache disk write failed: {e}")
+
+    def _disk_prune(self):
+        files = [os.path.join(self.disk_dir, n) for n in os.listdir(self.disk_dir) if n.endswith('.json')]
+        if len(files) <= self.disk_max_entries:
+            return
+        files.sort(key=lambda p: os.path.getmtime(p))
+        for path in files[:len(files) - self.disk_max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+# The UI pastes the whole resume in front of every question, and retrieval
+# keeps that layout with excerpts in place of the resume
+DOCUMENT_MESSAGE_RE = re.compile(
+    r"^\[(?:CANDIDATE RESUME|RELEVANT RESUME EXCERPTS)\]:.*?(?:\n\n|\\n\\n)\[QUESTION\]:\s*(.*)$", re.S)
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it its me my of on or our so that the their
+this to was we were what when where which who why will with you your do does did can could would
+should about tell give describe explain how
+""".split())
+
+def tokenize(text):
+    return [t.rstrip('.') for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+def question_text(message):
+    # What the user typed: the question of a message carrying resume text
+    match = DOCUMENT_MESSAGE_RE.match(message)
+    return match.group(1) if match else message
+
+def chunk_text(text, chunk_words=120, overlap=30):
+    # Word windows that prefer to break on line boundaries, with overlap so a
+    # fact split across two windows is still retrievable from one of them
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    chunks, current = [], []
+    for line in lines:
+        words = line.split()
+        if current and len(current) + len(words) > chunk_words:
+            chunks.append(" ".join(current))
+            current = current[-overlap:] if overlap else []
+        current.extend(words)
+        while len(current) > chunk_words:
+            chunks.append(" ".join(current[:chunk_words]))
+            current = current[chunk_words - overlap:]
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+class BM25Index:
+    # Okapi BM25 over a handful of chunks; postings are plain dicts, which is
+    # plenty for resume-sized documents
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(c)) for c in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        df = Counter()
+        for tf in self.term_freqs:
+            df.update(tf.keys())
+        n = len(chunks)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def search(self, query, k=4):
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        if not terms:
+            return []
+        scores = []
+        for i, tf in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scores.append((score, i))
+        scores.sort(reverse=True)
+        return [(self.chunks[i], round(score, 4)) for score, i in scores[:k]]
+
+class RetrievalStore:
+    # Per-session (or per-document) BM25 indexes, kept in an LRU and
+    # optionally persisted as JSON chunk lists so they survive restarts.
+
+    def __init__(self, index_dir=None, max_indexes=128, chunk_words=120, overlap=30):
+        self.index_dir = index_dir
+        self.max_indexes = max_indexes
+        self.chunk_words = chunk_words
+        self.overlap = overlap
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        if self.index_dir:
+            os.makedirs(self.index_dir, exist_ok=True)
+
+    @staticmethod
+    def document_key(text):
+        return "doc-" + hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def session_key(session_id):
+        return "session-" + hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.index_dir, key + '.json')
+
+    def index(self, key, text):
+        chunks = chunk_text(text, self.chunk_words, self.overlap)
+        index = BM25Index(chunks)
+        self._remember(key, index)
+        if self.index_dir:
+            path = self._path(key)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"chunks": chunks}, f)
+            os.replace(temp_path, path)
+        return index
+
+    def get(self, key):
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+        if self.index_dir and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    index = BM25Index(json.load(f)["chunks"])
+            except (OSError, ValueError, KeyError):
+                return None
+            self._remember(key, index)
+            return index
+        return None
+
+    def evict(self, key):
+        # Drop the in-memory copy; the next get() rereads index_dir
+        with self._lock:
+            self._indexes.pop(key, None)
+
+    def get_or_index(self, key, text):
+        return self.get(key) or self.index(key, text)
+
+    def _remember(self, key, index):
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
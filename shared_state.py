@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_state_revision ON state(revision);
+"""
+
+class SharedState:
+    # Small key/value store shared by every worker process on the host
+    # (SQLite, WAL mode, one connection per thread). Each write bumps a global
+    # revision; a watcher thread notices commits from other processes through
+    # PRAGMA data_version and calls subscribers with the keys that changed.
+
+    def __init__(self, db_path, poll_interval=0.5):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._subscribers = []
+        self._watcher = None
+        self._seen_revision = 0
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+        try:
+            # Holds API keys: readable by the owner only
+            os.chmod(self.db_path, 0o600)
+        except OSError:
+            pass
+        self._seen_revision = self.revision()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def revision(self):
+        row = self._conn().execute("SELECT MAX(revision) AS revision FROM state").fetchone()
+        return row["revision"] or 0
+
+    def get(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def items(self, prefix=''):
+        rows = self._conn().execute(
+            "SELECT key, value FROM state WHERE key LIKE ? ESCAPE '\\' ORDER BY key",
+            (prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%',)
+        ).fetchall()
+        return {row["key"]: json.loads(row["value"]) for row in rows}
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, values):
+        now = time.time()
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                revision = (conn.execute("SELECT MAX(revision) FROM state").fetchone()[0] or 0) + 1
+                conn.executemany(
+                    "INSERT INTO state (key, value, revision, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                    "revision = excluded.revision, updated_at = excluded.updated_at",
+                    [(key, json.dumps(value), revision, now) for key, value in values.items()]
+                )
+        return revision
+
+    # Change notifications
+
+    def subscribe(self, callback):
+        # callback(key, value) runs on the watcher thread for changes made by
+        # other processes (and by this one; handlers must be idempotent)
+        self._subscribers.append(callback)
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='shared-state', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        data_version = None
+        while True:
+            try:
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != data_version:
+                    data_version = current
+                    self._dispatch(conn)
+            except sqlite3.Error as e:
+                print(f"Shared state watcher error: {e}")
+            time.sleep(self.poll_interval)
+
+    def _dispatch(self, conn):
+        rows = conn.execute(
+            "SELECT key, value, revision FROM state WHERE revision > ? ORDER BY revision",
+            (self._seen_revision,)
+        ).fetchall()
+        for row in rows:
+            self._seen_revision = max(self._seen_revision, row["revision"])
+            value = json.loads(row["value"])
+            for callback in self._subscribers:
+                try:
+                    callback(row["key"], value)
+                except Exception as e:
+                    print(f"Shared state subscriber error for {row['key']}: {e}")
+
+def shared_state_from_env():
+    # SHARED_STATE_DB turns on shared provider/config state for multi-worker serving
+    db_path = os.getenv('SHARED_STATE_DB')
+    if not db_path:
+        return None
+    return SharedState(db_path, poll_interval=float(os.getenv('SHARED_STATE_POLL', '0.5')))
@@ -0,0 +1,86 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_process_start = time.perf_counter()
+
+class StartupProfile:
+    # Wall-clock time of each named startup stage, in the order they ran
+
+    def __init__(self):
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.stages.append((name, seconds))
+
+    def report(self):
+        with self._lock:
+            stages = list(self.stages)
+        lines = ["Startup profile", "-" * 48]
+        for name, seconds in stages:
+            lines.append(f"{name:<36}{seconds * 1000:>9.1f} ms")
+        lines.append("-" * 48)
+        lines.append(f"{'since first import':<36}{(time.perf_counter() - _process_start) * 1000:>9.1f} ms")
+        return "\n".join(lines)
+
+class Subsystem:
+    # An optional module loaded on first use. The loader returns the module
+    # (or any object) and raises ImportError when it is unavailable; that
+    # outcome is remembered so the import is only attempted once.
+
+    def __init__(self, name, loader, profile):
+        self.name = name
+        self.loader = loader
+        self.profile = profile
+        self.value = None
+        self.error = None
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.loaded:
+            return self.value
+        with self._lock:
+            if not self.loaded:
+                with self.profile.stage(f"load:{self.name}"):
+                    try:
+                        self.value = self.loader()
+                    except ImportError as e:
+                        self.error = str(e)
+                        print(f"{self.name} not available: {e}")
+                self.loaded = True
+        return self.value
+
+class SubsystemRegistry:
+    def __init__(self, profile):
+        self.profile = profile
+        self._subsystems = {}
+
+    def register(self, name, loader):
+        self._subsystems[name] = Subsystem(name, loader, self.profile)
+
+    def get(self, name):
+        return self._subsystems[name].get()
+
+    def load_all(self):
+        for subsystem in self._subsystems.values():
+            subsystem.get()
+
+    def status(self):
+        return {
+            name: {"loaded": s.loaded, "available": s.value is not None, "error": s.error}
+            for name, s in self._subsystems.items()
+        }
+
+startup = StartupProfile()
+registry = SubsystemRegistry(startup)
@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# ui_bridge writes its log, history journal and databases next to the working
+# directory, so the app under test runs in a throwaway one
+STATE_DIR = tempfile.mkdtemp(prefix='dark-net-tests-')
+os.environ.update(
+    CLOUD_MODE='true',
+    CONVERSATION_DB=os.path.join(STATE_DIR, 'conversations.db'),
+    USER_CONFIG_FILE=os.path.join(STATE_DIR, 'user_config.json'),
+    OCR_WORKER='off'
+)
+for name in ('REMOTE_SERVER_URL', 'GROQ_API_KEY', 'CEREBRAS_API_KEY', 'SHARED_STATE_DB', 'OCR_MODE'):
+    os.environ.pop(name, None)
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    # Keep-alive HTTP/1.1, so tests can see whether clients reuse connections
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with self.server.lock:
+            self.server.requests.append({"path": self.path, "headers": dict(self.headers), "body": body})
+            respond = self.server.script.pop(0) if self.server.script else self.server.respond
+        respond(self, json.loads(body) if body else None)
+
+    do_GET = do_POST
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_chunked(self, content_type='text/event-stream'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def write_chunk(self, data):
+        data = data.encode('utf-8') if isinstance(data, str) else data
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def abort(self):
+        # Drop the connection mid-response
+        self.close_connection = True
+        self.wfile.flush()
+        self.connection.shutdown(2)
+
+def completion(content, usage=None):
+    return {"choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": usage or {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}
+
+def delta_event(content):
+    return "data: " + json.dumps({"choices": [{"delta": {"content": content}}]}) + "\n\n"
+
+@pytest.fixture
+def upstream():
+    # Stand-in for an OpenAI-compatible API. Set .respond(handler, body) for
+    # every request, or queue one-off handlers in .script.
+    server = ThreadingHTTPServer(('127.0.0.1', 0), UpstreamHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    server.script = []
+    server.respond = lambda handler, body: handler.send_json(200, completion("ok"))
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(scope='session')
+def bridge():
+    # Imported once, from the state directory
+    os.chdir(STATE_DIR)
+    import ui_bridge
+    return ui_bridge
+
+@pytest.fixture
+def manager_for(monkeypatch):
+    # ProviderManager with a Groq provider pointed at the given upstream
+    from providers.provider_manager import ProviderManager
+
+    def make(url, **env):
+        monkeypatch.setenv('GROQ_API_KEY', 'test-key')
+        monkeypatch.setenv('GROQ_API_URL', url + '/chat/completions')
+        monkeypatch.setenv('CURRENT_PROVIDER', 'groq')
+        for key, value in env.items():
+            monkeypatch.setenv(key, str(value))
+        return ProviderManager(os.path.join(STATE_DIR, '.env'))
+
+    return make
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from providers.errors import ProviderRateLimitError
+from providers.rate_limiter import AdmissionRejected, AdmissionScheduler
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+async def until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.005)
+
+def test_async_waiter_is_admitted_when_the_pause_ends():
+    scheduler = AdmissionScheduler()
+    scheduler.pause(0.2)
+    waited = asyncio.run(scheduler.aacquire(10, timeout=2))
+    assert 0.15 < waited < 1.0
+    assert scheduler.snapshot()["admitted"] == 1
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    scheduler = AdmissionScheduler()
+    scheduler.pause(5)
+
+    async def run():
+        task = asyncio.ensure_future(scheduler.aacquire(10, timeout=10))
+        await until(lambda: scheduler.snapshot()["queued"] == 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return scheduler.snapshot()["queued"]
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == 0
+    assert time.monotonic() - start < 1.0
+
+def test_thread_and_async_waiters_share_priorities():
+    scheduler = AdmissionScheduler()
+    scheduler.pause(0.2)
+    order = []
+
+    def batch():
+        scheduler.acquire(10, "batch", timeout=5)
+        order.append("batch")
+
+    async def run():
+        thread = threading.Thread(target=batch)
+        thread.start()
+        await until(lambda: scheduler.snapshot()["queued"] == 1)
+        await scheduler.aacquire(10, "interactive", timeout=5)
+        order.append("interactive")
+        await asyncio.to_thread(thread.join)
+
+    asyncio.run(run())
+    assert order == ["interactive", "batch"]
+
+def test_full_queue_evicts_a_lower_priority_async_waiter():
+    scheduler = AdmissionScheduler(max_queue=1)
+    scheduler.pause(5)
+
+    async def run():
+        batch = asyncio.ensure_future(scheduler.aacquire(10, "batch", timeout=10))
+        await until(lambda: scheduler.snapshot()["queued"] == 1)
+        interactive = asyncio.ensure_future(scheduler.aacquire(10, "interactive", timeout=10))
+        with pytest.raises(AdmissionRejected):
+            await asyncio.wait_for(batch, 1)
+        interactive.cancel()
+
+    asyncio.run(run())
+
+@pytest.fixture
+def half_open(upstream, manager_for):
+    manager = manager_for(upstream.url, PROVIDER_ADMISSION='true')
+    provider = manager.get_provider()
+    breaker = manager.get_breaker(provider.name)
+    breaker.state = breaker.HALF_OPEN
+    breaker.probes_in_flight = 0
+    provider.limiter.pause(5)
+    return manager, provider, breaker
+
+def test_cancelled_async_admission_returns_the_probe(half_open):
+    manager, provider, breaker = half_open
+
+    async def run():
+        task = asyncio.ensure_future(manager._aadmit(provider, MESSAGES))
+        await until(lambda: provider.limiter.snapshot()["queued"] == 1)
+        assert breaker.probes_in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.probes_in_flight == 0
+    assert provider.limiter.snapshot()["queued"] == 0
+
+def test_rejected_admission_returns_the_probe(half_open, monkeypatch):
+    manager, provider, breaker = half_open
+    monkeypatch.setitem(manager.queue_timeouts, "interactive", 0.05)
+    with pytest.raises(ProviderRateLimitError):
+        asyncio.run(manager._aadmit(provider, MESSAGES))
+    assert breaker.probes_in_flight == 0
+    with pytest.raises(ProviderRateLimitError):
+        manager._admit(provider, MESSAGES)
+    assert breaker.probes_in_flight == 0
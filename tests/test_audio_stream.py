@@ -0,0 +1,166 @@
+import io
+import queue
+import threading
+import wave
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from audio_stream import RingBuffer, StreamingTranscriber
+
+RATE = 16000
+
+def tone(seconds, amplitude=0.3, freq=220.0):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+def silence(seconds, seed=0):
+    return (np.random.default_rng(seed).standard_normal(int(RATE * seconds)) * 0.001).astype(np.float32)
+
+def wav_roundtrip(samples):
+    # Through a 16-bit mono WAV, as a microphone capture would arrive
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes((np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes())
+    out.seek(0)
+    with wave.open(out, 'rb') as w:
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype='<i2')
+    return pcm.astype(np.float32) / 32767
+
+class FakeRecognizer:
+    # Names each utterance by its order and length
+    def __init__(self, fail_on=()):
+        self.lengths = []
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def transcribe(self, samples, sample_rate):
+        with self.lock:
+            index = len(self.lengths)
+            self.lengths.append(len(samples) / sample_rate)
+        if index in self.fail_on:
+            raise RuntimeError("recognizer down")
+        return f"utterance {index}"
+
+def feed(transcriber, samples, chunk=1024):
+    for offset in range(0, len(samples), chunk):
+        transcriber.feed(samples[offset:offset + chunk])
+
+def make(recognizer=None, **kwargs):
+    transcriber = StreamingTranscriber(recognizer or FakeRecognizer(), RATE, **kwargs)
+    transcriber.start()
+    return transcriber
+
+def test_each_utterance_is_transcribed_once():
+    recognizer = FakeRecognizer()
+    transcriber = make(recognizer)
+    feed(transcriber, wav_roundtrip(np.concatenate([
+        silence(0.5), tone(1.0), silence(1.0), tone(0.8, freq=330.0), silence(1.0)
+    ])))
+    assert transcriber.finish(timeout=5) == "utterance 0 utterance 1"
+    assert len(recognizer.lengths) == 2
+    # Speech plus the preroll before it and the hangover after it
+    assert 1.0 < recognizer.lengths[0] < 2.0
+    assert 0.8 < recognizer.lengths[1] < 1.8
+
+def test_partials_arrive_before_finish():
+    transcriber = make()
+    events = transcriber.subscribe()
+    feed(transcriber, np.concatenate([silence(0.3), tone(0.6), silence(1.0)]))
+    assert events.get(timeout=5) == {"partial": "utterance 0", "index": 0}
+    feed(transcriber, np.concatenate([tone(0.6), silence(1.0)]))
+    assert events.get(timeout=5) == {"partial": "utterance 1", "index": 1}
+    transcriber.finish(timeout=5)
+    assert events.get(timeout=5) == {"final": "utterance 0 utterance 1"}
+
+def test_finish_flushes_speech_without_trailing_silence():
+    recognizer = FakeRecognizer()
+    transcriber = make(recognizer)
+    feed(transcriber, np.concatenate([silence(0.3), tone(1.2)]))
+    assert transcriber.finish(timeout=5) == "utterance 0"
+    assert recognizer.lengths[0] >= 1.2
+
+def test_clicks_are_not_transcribed():
+    recognizer = FakeRecognizer()
+    transcriber = make(recognizer)
+    # Two frames of sound: below min_speech_frames
+    feed(transcriber, np.concatenate([silence(0.5), tone(0.06), silence(1.0)]))
+    assert transcriber.finish(timeout=5) == ""
+    assert recognizer.lengths == []
+
+def test_long_speech_is_cut_at_the_utterance_limit():
+    recognizer = FakeRecognizer()
+    transcriber = make(recognizer, max_utterance_seconds=1)
+    feed(transcriber, np.concatenate([silence(0.3), tone(2.5), silence(1.0)]))
+    transcriber.finish(timeout=5)
+    # 2.5 s of speech plus preroll and hangover, in pieces of at most 1 s
+    assert len(recognizer.lengths) == 4
+    assert max(recognizer.lengths) <= 1.0
+    assert sum(recognizer.lengths) >= 2.5
+
+def test_late_subscriber_sees_each_partial_once():
+    transcriber = make()
+    feed(transcriber, np.concatenate([silence(0.3), tone(0.6), silence(1.0)]))
+    while not transcriber.transcripts:
+        threading.Event().wait(0.01)
+    late = transcriber.subscribe()
+    transcriber.finish(timeout=5)
+    assert late.get_nowait() == {"partial": "utterance 0", "index": 0}
+    assert late.get_nowait() == {"final": "utterance 0"}
+    with pytest.raises(queue.Empty):
+        late.get_nowait()
+
+def test_recognizer_errors_drop_only_that_utterance():
+    transcriber = make(FakeRecognizer(fail_on=(0,)))
+    feed(transcriber, np.concatenate([silence(0.3), tone(0.6), silence(1.0), tone(0.6), silence(1.0)]))
+    assert transcriber.finish(timeout=5) == "utterance 1"
+
+def test_ring_buffer_overwrites_oldest_when_full():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.float32))
+    ring.write(np.arange(6, 12, dtype=np.float32))
+    assert ring.dropped == 4
+    out = np.empty(8, dtype=np.float32)
+    assert ring.read(8, out, timeout=0)
+    assert out.tolist() == list(range(4, 12))
+    assert ring.read(1, out, timeout=0) is False
+
+def test_close_stops_the_threads_and_publishes_what_is_done():
+    transcriber = make()
+    events = transcriber.subscribe()
+    feed(transcriber, np.concatenate([silence(0.5), tone(0.6), silence(1.0, seed=1)]))
+    assert events.get(timeout=5) == {"partial": "utterance 0", "index": 0}
+    assert transcriber.close() == "utterance 0"
+    assert events.get(timeout=1) == {"final": "utterance 0"}
+    assert not transcriber._thread.is_alive()
+    for worker in transcriber._executor._threads:
+        worker.join(1)
+        assert not worker.is_alive()
+
+@pytest.fixture
+def handler(bridge):
+    from transcription_jobs import TranscriptionJobPool
+    return bridge.LiveAudioHandler(TranscriptionJobPool(workers=1, max_pending=0), recognizer=FakeRecognizer())
+
+def test_refused_job_closes_the_transcriber(bridge, handler):
+    handler.streaming = True
+    handler._start_recording('user')
+    transcriber = handler.transcribers['user']
+    with pytest.raises(bridge.JobQueueFull):
+        handler.stop_user()
+    assert 'user' not in handler.transcribers
+    assert not transcriber._thread.is_alive()
+    assert transcriber._executor._shutdown
+
+def test_restart_closes_the_previous_transcriber(handler):
+    handler.streaming = True
+    handler._start_recording('system')
+    first = handler.transcribers['system']
+    handler._start_recording('system')
+    assert handler.transcribers['system'] is not first
+    assert not first._thread.is_alive()
+    handler.transcribers['system'].close()
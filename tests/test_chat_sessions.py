@@ -0,0 +1,39 @@
+import pytest
+
+@pytest.fixture
+def client(bridge, upstream, manager_for, monkeypatch):
+    monkeypatch.setattr(bridge, 'provider_manager', manager_for(upstream.url))
+    bridge.response_cache.clear()
+    return bridge.app.test_client()
+
+def chat(client, **body):
+    return client.post('/api/chat', json=dict({"message": "hello", "retrieval": False}, **body))
+
+@pytest.mark.parametrize('version', ['one', '1.5', 1.5, True, [1], {"v": 1}])
+def test_bad_version_is_400(client, version):
+    response = chat(client, session_id='s-bad-version', version=version)
+    assert response.status_code == 400
+    assert 'version' in response.get_json()['error']
+
+@pytest.mark.parametrize('body', [{"session_id": 7}, {"messages": "hi"}, {"messages": ["hi"]}])
+def test_bad_session_fields_are_400(client, body):
+    assert chat(client, **body).status_code == 400
+
+def test_versions_advance(client):
+    first = chat(client, session_id='s-versions').get_json()
+    assert first['version'] == 1
+    second = chat(client, session_id='s-versions', version='1', message='again').get_json()
+    assert second['version'] == 2
+    stale = chat(client, session_id='s-versions', version=1, message='stale')
+    assert stale.status_code == 409
+
+def test_turns_are_stored_as_typed(bridge, client, upstream):
+    # Long enough for retrieval to replace the resume with excerpts
+    resume = "\n".join(f"Line {i}: built kafka pipelines and python services for team {i}." for i in range(200))
+    message = f"[CANDIDATE RESUME]: {resume}\n\n[QUESTION]: What about kafka?"
+    chat(client, session_id='s-typed', message=message, retrieval=True)
+    sent = upstream.requests[-1]["body"].decode()
+    assert "RELEVANT RESUME EXCERPTS" in sent
+    history = bridge.conversation_store.get_history('s-typed')
+    assert history == [{"role": "user", "content": "What about kafka?"}, {"role": "assistant", "content": "ok"}]
+    assert bridge.conversation_store.search('excerpts', session_id='s-typed') == []
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from conftest import delta_event
+from providers.errors import ProviderError
+
+def stream_of(*parts, done=True, after_done=(), abort=False):
+    def respond(handler, body):
+        handler.start_chunked()
+        for part in parts:
+            handler.write_chunk(delta_event(part))
+        if abort:
+            handler.abort()
+            return
+        if done:
+            handler.write_chunk("data: [DONE]\n\n")
+        for part in after_done:
+            handler.write_chunk(delta_event(part))
+        handler.end_chunked()
+    return respond
+
+def sse_payloads(response):
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if block.startswith("data: "):
+            data = block[6:]
+            events.append(data if data == "[DONE]" else json.loads(data))
+    return events
+
+def test_provider_assembles_deltas(upstream, manager_for):
+    upstream.respond = stream_of("Hel", "lo ", "world")
+    provider = manager_for(upstream.url).get_provider()
+    assert "".join(provider.chat_stream([{"role": "user", "content": "hi"}])) == "Hello world"
+    assert json.loads(upstream.requests[0]["body"])["stream"] is True
+
+def test_provider_stops_at_done(upstream, manager_for):
+    upstream.respond = stream_of("one", done=True, after_done=("ignored",))
+    provider = manager_for(upstream.url).get_provider()
+    assert list(provider.chat_stream([{"role": "user", "content": "hi"}])) == ["one"]
+
+def test_provider_skips_keepalives_and_empty_deltas(upstream, manager_for):
+    def respond(handler, body):
+        handler.start_chunked()
+        handler.write_chunk(": keepalive\n\n")
+        handler.write_chunk('data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n')
+        handler.write_chunk(delta_event("text"))
+        handler.write_chunk('data: {"choices": [], "usage": {"total_tokens": 3}}\n\n')
+        handler.write_chunk("data: [DONE]\n\n")
+        handler.end_chunked()
+    upstream.respond = respond
+    provider = manager_for(upstream.url).get_provider()
+    assert list(provider.chat_stream([{"role": "user", "content": "hi"}])) == ["text"]
+
+def test_provider_raises_on_broken_stream(upstream, manager_for):
+    upstream.respond = stream_of("partial", abort=True)
+    provider = manager_for(upstream.url).get_provider()
+    received = []
+    with pytest.raises(ProviderError):
+        for delta in provider.chat_stream([{"role": "user", "content": "hi"}]):
+            received.append(delta)
+    assert received == ["partial"]
+
+def test_route_streams_deltas_then_done(bridge, upstream, manager_for, monkeypatch):
+    upstream.respond = stream_of("Hi", " there")
+    monkeypatch.setattr(bridge, 'provider_manager', manager_for(upstream.url))
+    response = bridge.app.test_client().post('/api/chat/stream', json={"message": "hello", "retrieval": False})
+    assert response.mimetype == 'text/event-stream'
+    assert sse_payloads(response) == [{"delta": "Hi"}, {"delta": " there"}, "[DONE]"]
+
+def test_route_reports_mid_stream_error(bridge, upstream, manager_for, monkeypatch):
+    upstream.respond = stream_of("Hi", abort=True)
+    monkeypatch.setattr(bridge, 'provider_manager', manager_for(upstream.url))
+    events = sse_payloads(bridge.app.test_client().post('/api/chat/stream', json={"message": "hello", "retrieval": False}))
+    assert events[0] == {"delta": "Hi"}
+    assert events[1]["error"]["provider"] == "groq"
+    assert events[-1] == "[DONE]"
+
+def test_route_upstream_error_before_first_token(bridge, upstream, manager_for, monkeypatch):
+    upstream.respond = lambda handler, body: handler.send_json(400, {"error": {"message": "bad request"}})
+    monkeypatch.setattr(bridge, 'provider_manager', manager_for(upstream.url))
+    events = sse_payloads(bridge.app.test_client().post('/api/chat/stream', json={"message": "hello", "retrieval": False}))
+    assert events[0]["error"]["type"] == "no_provider"
+    assert events[0]["error"]["attempts"][0]["type"] == "bad_response"
+    assert events[-1] == "[DONE]"
@@ -0,0 +1,65 @@
+import json
+import multiprocessing
+import os
+import sys
+import threading
+
+import pytest
+
+from config_store import ConfigStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'benchmarks'))
+
+from config_store_stress import hammer
+
+PROCESSES, THREADS, UPDATES = 2, 4, 10
+
+def test_concurrent_saves_lose_nothing(tmp_path):
+    # A bounded run of benchmarks/config_store_stress.py
+    path = str(tmp_path / 'user_config.json')
+    with open(path, 'w') as f:
+        json.dump({"theme": "dark"}, f)
+
+    torn = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with open(path) as f:
+                    json.load(f)
+            except ValueError:
+                torn.append(1)
+
+    reader_thread = threading.Thread(target=reader)
+    reader_thread.start()
+    try:
+        with multiprocessing.Pool(PROCESSES) as pool:
+            results = pool.starmap_async(hammer, [(path, w, THREADS, UPDATES) for w in range(PROCESSES)]).get(60)
+    finally:
+        stop.set()
+        reader_thread.join()
+
+    with open(path) as f:
+        final = json.load(f)
+    expected = {f"w{w}-t{t}-{i}" for w in range(PROCESSES) for t in range(THREADS) for i in range(UPDATES)}
+    assert expected <= final.keys()
+    assert final["theme"] == "dark"
+    assert [e for _, errors in results for e in errors] == []
+    assert torn == []
+    # Bursts share writes
+    assert sum(writes for writes, _ in results) < len(expected)
+
+def test_failed_write_is_not_reported_to_later_updates(tmp_path):
+    directory = tmp_path / 'missing'
+    store = ConfigStore(str(directory / 'user_config.json'), write_delay=0)
+    with pytest.raises(OSError):
+        store.update({"theme": "dark"}, timeout=5)
+
+    # The writer retries; an update made after the failure waits for that
+    # retry instead of getting the earlier error
+    directory.mkdir()
+    assert store.update({"font": "mono"}, timeout=5) == {"theme": "dark", "font": "mono"}
+    with open(directory / 'user_config.json') as f:
+        assert json.load(f) == {"theme": "dark", "font": "mono"}
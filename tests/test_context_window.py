@@ -0,0 +1,34 @@
+from context_window import ContextWindow, message_tokens
+
+def session(turns):
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"Turn {i} says something. " + "filler words " * 40})
+    return messages
+
+def test_short_prompt_is_unchanged():
+    messages = session(2)
+    assert ContextWindow().fit(messages, budget=10000) is messages
+
+def test_fitted_prompt_stays_in_budget_and_keeps_the_newest_turn():
+    messages = session(60)
+    fitted = ContextWindow().fit(messages, budget=1000)
+    assert sum(message_tokens(m) for m in fitted) <= 1000
+    assert fitted[0] == messages[0]
+    assert fitted[1]["content"].startswith("Summary of earlier conversation:")
+    assert fitted[-1] == messages[-1]
+
+def test_each_dropped_turn_is_summarized_once():
+    window = ContextWindow(summary_tokens=100000)
+    messages = session(40)
+    window.fit(messages, budget=2000)
+    built = window.stats()["lines_built"]
+    assert built > 0
+
+    # One more exchange drops a couple more turns; only those are summarized
+    messages += session(3)[1:3]
+    fitted = window.fit(messages, budget=2000)
+    dropped = len(messages) - len(fitted) + 1
+    assert window.stats()["lines_built"] == dropped
+    assert window.stats()["lines_built"] - built <= 3
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from conversation_manager import ConversationManager
+
+@pytest.fixture
+def storage(tmp_path):
+    return str(tmp_path / 'history.json')
+
+def reopen(storage):
+    manager = ConversationManager(storage)
+    history = [m['content'] for m in manager.get_history()]
+    return manager, history
+
+def test_journal_is_replayed(storage):
+    manager = ConversationManager(storage)
+    manager.add_message('user', 'one')
+    manager.add_message('assistant', 'two')
+    manager.close()
+    manager, history = reopen(storage)
+    manager.close()
+    assert history == ['one', 'two']
+
+def test_append_after_torn_line_survives(storage):
+    manager = ConversationManager(storage)
+    manager.add_message('user', 'one')
+    manager.close()
+    # Crash in the middle of writing the next record
+    record = json.dumps({"op": "add", "seq": 2, "message": {"role": "user", "content": "torn"}})
+    with open(storage + '.journal', 'a') as f:
+        f.write(record[:len(record) // 2])
+
+    manager, history = reopen(storage)
+    assert history == ['one']
+    manager.add_message('assistant', 'after crash')
+    manager.close()
+
+    manager, history = reopen(storage)
+    manager.close()
+    assert history == ['one', 'after crash']
+
+def test_compaction_keeps_history(storage):
+    manager = ConversationManager(storage, compact_every=5)
+    for i in range(12):
+        manager.add_message('user', str(i))
+    manager.close()
+    manager, history = reopen(storage)
+    manager.close()
+    assert history == [str(i) for i in range(12)]
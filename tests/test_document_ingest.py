@@ -0,0 +1,70 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Appended, so benchmark scripts never shadow the modules they measure
+sys.path.append(os.path.join(ROOT, 'benchmarks'))
+from corpus import make_pdf
+from document_ingest import DocumentIngestor, IngestError
+
+pytest.importorskip('PyPDF2')
+
+@pytest.fixture
+def ingestor():
+    ingestor = DocumentIngestor(workers=2, pages_per_task=2)
+    yield ingestor
+    ingestor.shutdown()
+
+def test_pages_from_the_pool_keep_their_order(ingestor):
+    text = "\n".join(f"Line {i}." for i in range(10 * 48))
+    events = list(ingestor.iter_ingest(make_pdf(text), 'portfolio.pdf'))
+    assert events[-2] == {"progress": 10, "total": 10}
+    extracted = events[-1]["text"]
+    assert extracted.index("Line 0.") < extracted.index("Line 200.") < extracted.index("Line 479.")
+    assert glob.glob(os.path.join(tempfile.gettempdir(), 'ingest-*.pdf')) == []
+
+def test_cached_upload_skips_extraction(ingestor):
+    data = make_pdf("Cached resume.")
+    ingestor.ingest(data, 'a.pdf')
+    assert list(ingestor.iter_ingest(data, 'b.pdf'))[-1]["cached"] is True
+
+def test_limits(ingestor):
+    with pytest.raises(IngestError):
+        ingestor.ingest(b"x", 'resume.exe')
+    ingestor.max_pages = 3
+    with pytest.raises(IngestError) as error:
+        ingestor.ingest(make_pdf("\n".join("x" for _ in range(4 * 48))), 'long.pdf')
+    assert error.value.status == 413
+
+SPAWNING_MAIN = '''
+import json, multiprocessing, sys, threading
+sys.path.insert(0, {root!r})
+import cloud_server, ui_bridge
+
+def probe():
+    # Runs in the spawned worker, after it re-imported this script
+    return {{"threads": [t.name for t in threading.enumerate()],
+             "app_state": hasattr(ui_bridge, "conversation_manager") or hasattr(cloud_server, "ocr_scheduler")}}
+
+if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        print(json.dumps(pool.submit(probe).result()))
+'''
+
+def test_spawned_workers_skip_app_setup(tmp_path):
+    # The worker re-imports the main script, and with it the whole app
+    script = tmp_path / 'serve.py'
+    script.write_text(SPAWNING_MAIN.format(root=ROOT))
+    env = dict(os.environ, OCR_ENGINE='fake_ocr:FakeOCREngine', PYTHONPATH=os.path.join(ROOT, 'benchmarks'))
+    result = subprocess.run([sys.executable, str(script)], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    worker = json.loads(result.stdout.strip().splitlines()[-1])
+    assert worker == {"threads": ["MainThread"], "app_state": False}
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from conftest import completion
+from providers.circuit_breaker import CircuitBreaker
+from providers.errors import CircuitOpenError, NoProviderAvailableError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+def test_breaker_opens_at_the_threshold_and_probes_after_recovery():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.1, half_open_probes=1)
+    breaker.record_failure()
+    assert breaker.state == breaker.CLOSED and breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow_request()
+    assert 0 < breaker.retry_after() <= 0.1
+
+    time.sleep(0.15)
+    assert breaker.allow_request()
+    assert breaker.state == breaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED and breaker.failures == 0
+
+def test_failed_probe_reopens_and_released_probe_is_reusable():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.1)
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow_request()
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == breaker.CLOSED
+
+def by_path(groq, cerebras):
+    def respond(handler, body):
+        (cerebras if handler.path.startswith('/cerebras') else groq)(handler, body)
+    return respond
+
+def status(code):
+    return lambda handler, body: handler.send_json(code, {"error": {"message": f"status {code}"}})
+
+def answer(text):
+    return lambda handler, body: handler.send_json(200, completion(text))
+
+@pytest.fixture
+def two_providers(upstream, manager_for):
+    def make(**env):
+        return manager_for(upstream.url, CEREBRAS_API_KEY='test-key', CEREBRAS_API_URL=upstream.url + '/cerebras',
+                           PROVIDER_RETRY_BACKOFF=0, PROVIDER_MAX_RETRIES=0, PROVIDER_BREAKER_FAILURES=2, **env)
+    return make
+
+def test_failover_walks_the_current_provider_first(upstream, two_providers):
+    upstream.respond = by_path(status(500), answer("from cerebras"))
+    manager = two_providers()
+    assert [p.name for p in manager.failover_chain()] == ['groq', 'cerebras']
+    assert manager.chat(MESSAGES) == "from cerebras"
+    assert [r["path"] for r in upstream.requests] == ['/chat/completions', '/cerebras']
+
+def test_explicit_failover_order(upstream, two_providers):
+    manager = two_providers(PROVIDER_FAILOVER='cerebras,groq')
+    assert [p.name for p in manager.failover_chain()] == ['cerebras', 'groq']
+    manager.chat(MESSAGES)
+    assert [r["path"] for r in upstream.requests] == ['/cerebras']
+
+def test_unavailable_provider_is_skipped_once_its_circuit_opens(upstream, two_providers):
+    upstream.respond = by_path(status(503), answer("from cerebras"))
+    manager = two_providers()
+    for _ in range(2):
+        assert manager.chat(MESSAGES) == "from cerebras"
+    assert manager.get_breaker('groq').state == CircuitBreaker.OPEN
+    upstream.requests.clear()
+    assert manager.chat(MESSAGES) == "from cerebras"
+    assert [r["path"] for r in upstream.requests] == ['/cerebras']
+
+def test_client_errors_do_not_open_the_circuit(upstream, two_providers):
+    upstream.respond = by_path(status(400), status(400))
+    manager = two_providers()
+    for _ in range(5):
+        with pytest.raises(NoProviderAvailableError):
+            manager.chat(MESSAGES)
+    assert manager.get_breaker('groq').state == CircuitBreaker.CLOSED
+    assert manager.get_breaker('cerebras').state == CircuitBreaker.CLOSED
+
+def test_rate_limits_do_not_open_the_circuit(upstream, two_providers):
+    upstream.respond = by_path(status(429), answer("from cerebras"))
+    manager = two_providers(PROVIDER_ADMISSION='false')
+    for _ in range(5):
+        assert manager.chat(MESSAGES) == "from cerebras"
+    assert manager.get_breaker('groq').state == CircuitBreaker.CLOSED
+
+def test_all_circuits_open_reports_the_soonest_retry(upstream, two_providers):
+    upstream.respond = status(502)
+    manager = two_providers(PROVIDER_BREAKER_RECOVERY=30)
+    for _ in range(2):
+        with pytest.raises(NoProviderAvailableError):
+            manager.chat(MESSAGES)
+    with pytest.raises(NoProviderAvailableError) as error:
+        manager.chat(MESSAGES)
+    assert all(isinstance(e, CircuitOpenError) for e in error.value.errors)
+    assert 0 < error.value.retry_after <= 30
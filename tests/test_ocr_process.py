@@ -0,0 +1,27 @@
+import contextlib
+import io
+import subprocess
+
+import ocr_worker
+from subsystems import Subsystem
+
+def missing_engine():
+    raise ImportError("No module named 'easyocr'")
+
+def test_missing_engine_answers_503(bridge, monkeypatch):
+    monkeypatch.setenv('OCR_PREPROCESS', 'off')
+    monkeypatch.setattr(ocr_worker, 'select_and_capture', lambda: (b'image', None))
+    monkeypatch.setitem(bridge.subsystems._subsystems, 'ocr_engine',
+                        Subsystem('ocr_engine', missing_engine, bridge.startup))
+
+    def run_in_process(cmd, **kwargs):
+        # What the `--ocr` child prints, without spawning it
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            bridge.run_ocr_process()
+        return subprocess.CompletedProcess(cmd, 0, stdout.getvalue(), '')
+
+    monkeypatch.setattr(bridge.subprocess, 'run', run_in_process)
+    response = bridge.app.test_client().post('/api/ocr')
+    assert response.status_code == 503
+    assert response.get_json() == {"error": "OCR engine not available: No module named 'easyocr'"}
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from ocr_scheduler import OCRBatchScheduler, QueueFullError
+
+class BatchEngine:
+    def __init__(self):
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def extract_text_batch(self, images):
+        self.entered.set()
+        self.release.wait(5)
+        self.batches.append(len(images))
+        return [(image.decode(), "Batch") for image in images]
+
+def submit_all(scheduler, count):
+    results = [None] * count
+
+    def submit(i):
+        results[i] = scheduler.submit(f"image {i}".encode(), timeout=5)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def test_concurrent_requests_are_batched():
+    engine = BatchEngine()
+    scheduler = OCRBatchScheduler(lambda: engine, max_batch=4, max_wait=0.5)
+    results = submit_all(scheduler, 8)
+    assert results == [(f"image {i}", "Batch") for i in range(8)]
+    assert sum(engine.batches) == 8
+    assert max(engine.batches) == 4
+
+def test_full_queue_rejects():
+    engine = BatchEngine()
+    engine.release.clear()
+    scheduler = OCRBatchScheduler(lambda: engine, max_queue=1, max_batch=1, max_wait=0)
+    scheduler.start()
+    scheduler.ready.wait(5)
+    # One job holds the engine, the next one fills the queue
+    running = threading.Thread(target=scheduler.submit, args=(b"x", 5))
+    running.start()
+    engine.entered.wait(5)
+    queued = threading.Thread(target=scheduler.submit, args=(b"z", 5))
+    queued.start()
+    while scheduler.stats()["queue_depth"] < 1:
+        threading.Event().wait(0.01)
+    with pytest.raises(QueueFullError):
+        scheduler.submit(b"y")
+    engine.release.set()
+    running.join()
+    queued.join()
+    assert scheduler.stats()["rejected"] == 1
+
+def test_engine_load_error_fails_requests():
+    def broken():
+        raise RuntimeError("no model")
+
+    scheduler = OCRBatchScheduler(broken)
+    with pytest.raises(RuntimeError, match="no model"):
+        scheduler.submit(b"x", timeout=5)
+    assert scheduler.stats()["ready"] is False
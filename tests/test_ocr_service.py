@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+from ocr_scheduler import OCRBatchScheduler, QueueFullError
+from ocr_service import OCRServiceClient, OCRServiceHandler, OCRServiceServer
+
+class Engine:
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+
+    def extract_text_batch(self, images):
+        self.release.wait(5)
+        return [(image.decode()[::-1], "Test") for image in images]
+
+@pytest.fixture
+def service():
+    engine = Engine()
+    server = OCRServiceServer(('127.0.0.1', 0), OCRServiceHandler)
+    server.scheduler = OCRBatchScheduler(lambda: engine, max_queue=1, max_batch=4, max_wait=0.01)
+    server.scheduler.start()
+    server.engine = engine
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, OCRServiceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    engine.release.set()
+    server.shutdown()
+    server.server_close()
+
+def test_client_returns_the_engine_result(service):
+    _, client = service
+    assert client.submit(b"abc", timeout=5) == ("cba", "Test")
+    assert client.stats()["batch_sizes"] == {"1": 1}
+
+def hold_engine(server, client):
+    server.engine.release.clear()
+    running = threading.Thread(target=lambda: client.submit(b"running", timeout=5))
+    running.start()
+    while server.scheduler.stats()["batch_sizes"] == {}:
+        threading.Event().wait(0.01)
+    return running
+
+def test_timeout_maps_to_future_timeout(service):
+    server, client = service
+    running = hold_engine(server, client)
+    with pytest.raises(FutureTimeout):
+        client.submit(b"queued", timeout=0.2)
+    server.engine.release.set()
+    running.join()
+
+def test_full_queue_maps_to_queue_full(service):
+    server, client = service
+    running = hold_engine(server, client)
+    queued = threading.Thread(target=lambda: client.submit(b"queued", timeout=5))
+    queued.start()
+    while server.scheduler.stats()["queue_depth"] < 1:
+        threading.Event().wait(0.01)
+    with pytest.raises(QueueFullError):
+        client.submit(b"rejected", timeout=5)
+    server.engine.release.set()
+    running.join()
+    queued.join()
+
+def test_unreachable_service_fails_cleanly():
+    client = OCRServiceClient("http://127.0.0.1:9")
+    with pytest.raises(RuntimeError):
+        client.submit(b"x", timeout=1)
+    assert client.stats()["ready"] is False
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import completion
+from providers.errors import ProviderRateLimitError, ProviderUnavailableError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+@pytest.fixture
+def provider(upstream, manager_for):
+    return manager_for(upstream.url, PROVIDER_RETRY_BACKOFF=0).get_provider()
+
+def status(code, headers=None):
+    return lambda handler, body: handler.send_json(code, {"error": {"message": f"status {code}"}}, headers)
+
+def test_sequential_calls_reuse_one_connection(upstream, provider):
+    for _ in range(10):
+        assert provider.chat(MESSAGES) == "ok"
+    assert len(upstream.requests) == 10
+    assert upstream.connections == 1
+
+def test_concurrent_calls_share_the_pool(upstream, provider):
+    def worker():
+        for _ in range(10):
+            provider.chat(MESSAGES)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(upstream.requests) == 40
+    assert upstream.connections <= 4
+
+def test_transient_5xx_is_retried(upstream, provider):
+    upstream.script = [status(502)]
+    upstream.respond = lambda handler, body: handler.send_json(200, completion("recovered"))
+    assert provider.chat(MESSAGES) == "recovered"
+    assert len(upstream.requests) == 2
+
+def test_429_with_short_retry_after_is_retried(upstream, provider):
+    upstream.script = [status(429, {"Retry-After": "1"})]
+    start = time.monotonic()
+    assert provider.chat(MESSAGES) == "ok"
+    assert time.monotonic() - start >= 0.9
+    assert len(upstream.requests) == 2
+
+def test_503_with_short_retry_after_is_retried(upstream, provider):
+    upstream.script = [status(503, {"Retry-After": "0"}), status(503)]
+    assert provider.chat(MESSAGES) == "ok"
+    assert len(upstream.requests) == 3
+
+def test_429_with_long_retry_after_fails_fast(upstream, provider):
+    upstream.respond = status(429, {"Retry-After": "4"})
+    start = time.monotonic()
+    with pytest.raises(ProviderRateLimitError) as error:
+        provider.chat(MESSAGES)
+    assert time.monotonic() - start < 1.0
+    assert error.value.retry_after == 4.0
+    assert len(upstream.requests) == 1
+    assert provider.limiter.snapshot()["paused_for"] > 3
+
+def test_503_with_long_retry_after_fails_fast(upstream, provider):
+    upstream.respond = status(503, {"Retry-After": "31"})
+    start = time.monotonic()
+    with pytest.raises(ProviderUnavailableError):
+        provider.chat(MESSAGES)
+    assert time.monotonic() - start < 1.0
+    assert len(upstream.requests) == 1
+    assert provider.limiter.snapshot()["paused_for"] > 30
+
+def test_async_client_retries_like_the_session(upstream, provider):
+    upstream.script = [status(502), status(504)]
+    upstream.respond = lambda handler, body: handler.send_json(200, completion("recovered"))
+
+    async def run():
+        try:
+            return await provider.achat(MESSAGES)
+        finally:
+            await provider.aclose()
+
+    assert asyncio.run(run()) == "recovered"
+    assert len(upstream.requests) == 3
+
+def test_async_client_retries_short_retry_after(upstream, provider):
+    upstream.script = [status(429, {"Retry-After": "0"}), status(503, {"Retry-After": "0"})]
+
+    async def run():
+        try:
+            return await provider.achat(MESSAGES)
+        finally:
+            await provider.aclose()
+
+    assert asyncio.run(run()) == "ok"
+    assert len(upstream.requests) == 3
+
+def test_async_client_fails_fast_on_long_retry_after(upstream, provider):
+    upstream.respond = status(429, {"Retry-After": "4"})
+
+    async def run():
+        try:
+            await provider.achat(MESSAGES)
+        finally:
+            await provider.aclose()
+
+    start = time.monotonic()
+    with pytest.raises(ProviderRateLimitError):
+        asyncio.run(run())
+    assert time.monotonic() - start < 1.0
+    assert len(upstream.requests) == 1
+
+def test_replaced_provider_closes_async_clients_on_their_loop(upstream, manager_for):
+    manager = manager_for(upstream.url)
+    old = manager.get_provider()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        assert asyncio.run_coroutine_threadsafe(old.achat(MESSAGES), loop).result(5) == "ok"
+        clients = list(old._async_clients)
+        manager.add_provider('groq', 'rotated-key')
+        assert manager.get_provider() is not old
+        deadline = time.monotonic() + 5
+        while not all(client.is_closed for client in clients) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert all(client.is_closed for client in clients)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+def test_replacing_from_the_serving_loop_closes_async_clients(upstream, manager_for):
+    manager = manager_for(upstream.url)
+    old = manager.get_provider()
+
+    async def run():
+        await old.achat(MESSAGES)
+        clients = list(old._async_clients)
+        manager.add_provider('groq', 'rotated-key')
+        await old._closing
+        await manager.get_provider().aclose()
+        return clients
+
+    assert all(client.is_closed for client in asyncio.run(run()))
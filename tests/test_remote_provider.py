@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from conftest import completion, delta_event
+
+RESUME = "Backend engineer. Built kafka pipelines and python services."
+QUESTIONS = ["What do they build?", "Which languages?", "Any streaming work?", "Team size?"]
+
+@pytest.fixture
+def cloud(bridge, upstream, manager_for, monkeypatch):
+    # The bridge app served over HTTP as the cloud server, answering from the upstream
+    answers = iter(range(100))
+
+    def respond(handler, body):
+        answer = f"answer {next(answers)}"
+        if not body.get('stream'):
+            handler.send_json(200, completion(answer))
+            return
+        handler.start_chunked()
+        handler.write_chunk(delta_event(answer))
+        handler.write_chunk("data: [DONE]\n\n")
+        handler.end_chunked()
+
+    upstream.respond = respond
+    monkeypatch.setattr(bridge, 'provider_manager', manager_for(upstream.url))
+    bridge.response_cache.clear()
+    server = make_server('127.0.0.1', 0, bridge.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+@pytest.fixture
+def remote(cloud, monkeypatch):
+    # RemoteProvider recording each body it posts and the status it got back
+    from providers.remote_provider import RemoteProvider
+
+    provider = RemoteProvider(cloud)
+    provider.sent = []
+    post = provider._post
+
+    def recording_post(url, data, **kwargs):
+        response = post(url, data, **kwargs)
+        provider.sent.append((data, response.status_code))
+        return response
+
+    monkeypatch.setattr(provider, '_post', recording_post)
+    yield provider
+    provider.close()
+
+class UIConversation:
+    # Shapes each turn like the bundled UI and the local bridge: the plain
+    # question is appended to the UI's history, and the message sent carries
+    # the resume in front of it
+    def __init__(self, bridge):
+        self.bridge = bridge
+        self.history = []
+
+    def messages(self, question):
+        self.history.append({"role": "user", "content": question})
+        message = f"[CANDIDATE RESUME]: {RESUME}\\n\\n[QUESTION]: {question}"
+        return self.bridge.build_chat_messages(message, self.history)
+
+    def answered(self, answer):
+        self.history.append({"role": "assistant", "content": answer})
+
+def run_turn(remote, ui, question, stream=False):
+    messages = ui.messages(question)
+    answer = "".join(remote.chat_stream(messages)) if stream else remote.chat(messages)
+    ui.answered(answer)
+    return answer
+
+def test_later_turns_send_only_the_new_message(bridge, remote):
+    ui = UIConversation(bridge)
+    for question in QUESTIONS[:3]:
+        run_turn(remote, ui, question)
+
+    first, status = remote.sent[0]
+    assert status == 200 and first["messages"] == []
+    for data, status in remote.sent[1:]:
+        assert status == 200
+        assert set(data) == {"session_id", "version", "message"}
+    assert [data["version"] for data, _ in remote.sent[1:]] == [1, 2]
+
+    stored = bridge.conversation_store.get_history(first["session_id"])
+    assert stored == [m for m in ui.history if m["role"] in ("user", "assistant")]
+
+def test_streamed_turns_stay_incremental(bridge, remote):
+    ui = UIConversation(bridge)
+    for question in QUESTIONS[:3]:
+        run_turn(remote, ui, question, stream=True)
+    assert "messages" in remote.sent[0][0]
+    assert all(set(data) == {"session_id", "version", "message"} for data, _ in remote.sent[1:])
+    assert ui.history[-1] == {"role": "assistant", "content": "answer 2"}
+
+def test_conflict_resyncs_then_goes_incremental_again(bridge, remote):
+    ui = UIConversation(bridge)
+    run_turn(remote, ui, QUESTIONS[0])
+    run_turn(remote, ui, QUESTIONS[1])
+    session_id = remote.sent[0][0]["session_id"]
+
+    # Another client appends to the session behind our back
+    version = bridge.conversation_store.get_session(session_id)["version"]
+    bridge.conversation_store.append_turn(session_id, version, [{"role": "user", "content": "elsewhere"}])
+
+    remote.sent.clear()
+    assert run_turn(remote, ui, QUESTIONS[2]).startswith("answer")
+    (stale, stale_status), (resync, resync_status) = remote.sent
+    assert stale_status == 409 and "messages" not in stale
+    assert resync_status == 200 and len(resync["messages"]) == 4
+    assert bridge.conversation_store.get_history(session_id) == ui.history
+
+    remote.sent.clear()
+    run_turn(remote, ui, QUESTIONS[3])
+    assert [set(data) for data, _ in remote.sent] == [{"session_id", "version", "message"}]
@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import completion
+from response_cache import ResponseCache
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "What is a cache?"}]
+
+def test_key_ignores_whitespace_but_not_content():
+    spaced = [{"role": "system", "content": " sys "}, {"role": "user", "content": "What  is a\ncache?"}]
+    assert ResponseCache.make_key(MESSAGES) == ResponseCache.make_key(spaced)
+    other = [MESSAGES[0], {"role": "user", "content": "What is a queue?"}]
+    assert ResponseCache.make_key(MESSAGES) != ResponseCache.make_key(other)
+
+def test_answers_starting_with_error_are_cached():
+    cache = ResponseCache()
+    key = ResponseCache.make_key(MESSAGES)
+    cache.set(key, "Errors in caching usually come from stale keys.")
+    assert cache.get(key) == "Errors in caching usually come from stale keys."
+
+def test_failed_calls_are_not_cached():
+    cache = ResponseCache()
+    key = ResponseCache.make_key(MESSAGES)
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_call(key, fail)
+    assert cache.get_or_call(key, lambda: "answer") == "answer"
+
+def test_failover_answer_is_served_from_cache(bridge, upstream, manager_for, monkeypatch):
+    # The current provider (groq) is down; cerebras answers and that answer
+    # must be found again for the same prompt
+    def respond(handler, body):
+        if handler.path.startswith('/cerebras'):
+            handler.send_json(200, completion("from cerebras"))
+        else:
+            handler.send_json(401, {"error": {"message": "invalid key"}})
+    upstream.respond = respond
+    manager = manager_for(upstream.url, CEREBRAS_API_KEY='test-key', CEREBRAS_API_URL=upstream.url + '/cerebras')
+    monkeypatch.setattr(bridge, 'provider_manager', manager)
+    bridge.response_cache.clear()
+
+    client = bridge.app.test_client()
+    body = {"message": "What is a cache?", "retrieval": False}
+    assert client.post('/api/chat', json=body).get_json()["response"] == "from cerebras"
+    calls = len(upstream.requests)
+    assert client.post('/api/chat', json=body).get_json()["response"] == "from cerebras"
+    assert len(upstream.requests) == calls
@@ -0,0 +1,26 @@
+import os
+import random
+import sys
+
+import pytest
+
+# Appended, so benchmark scripts never shadow the modules they measure
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from corpus import make_resume_text
+
+def resume_message(words, question="What experience do they have with kafka?"):
+    return f"[CANDIDATE RESUME]: {make_resume_text(random.Random(words), words)}\n\n[QUESTION]: {question}"
+
+@pytest.mark.parametrize('words', [100, 300, 350, 400, 450, 600, 1000, 3000])
+def test_retrieval_never_grows_the_prompt(bridge, words):
+    message = resume_message(words)
+    reduced, context = bridge.apply_retrieval(message)
+    assert context == []
+    assert len(reduced) <= len(message)
+
+def test_long_resume_is_reduced_to_excerpts(bridge):
+    message = resume_message(3000)
+    reduced, _ = bridge.apply_retrieval(message)
+    assert reduced.startswith("[RELEVANT RESUME EXCERPTS]:")
+    assert reduced.endswith("[QUESTION]: What experience do they have with kafka?")
+    assert len(reduced) < len(message) / 3
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import completion
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+def slow_groq(delay):
+    # Groq answers after `delay` seconds, Cerebras at once
+    def respond(handler, body):
+        if handler.path.startswith('/cerebras'):
+            handler.send_json(200, completion("from cerebras"))
+        else:
+            time.sleep(delay)
+            handler.send_json(200, completion("from groq"))
+    return respond
+
+@pytest.fixture
+def two_providers(upstream, manager_for):
+    def make(**env):
+        return manager_for(upstream.url, CEREBRAS_API_KEY='test-key', CEREBRAS_API_URL=upstream.url + '/cerebras',
+                           PROVIDER_RETRY_BACKOFF=0, **env)
+    return make
+
+def names(providers):
+    return [p.name for p in providers]
+
+def test_latency_routing_prefers_the_faster_provider(two_providers):
+    manager = two_providers(PROVIDER_ROUTING='latency')
+    manager.get_stats('groq').record(0.1, True)
+    # An unmeasured provider is tried first
+    assert names(manager.ranked_providers()) == ['cerebras', 'groq']
+    manager.get_stats('cerebras').record(0.5, True)
+    assert names(manager.ranked_providers()) == ['groq', 'cerebras']
+    # The EWMA follows a provider that got faster
+    for _ in range(10):
+        manager.get_stats('cerebras').record(0.01, True)
+    assert names(manager.ranked_providers()) == ['cerebras', 'groq']
+
+def test_errors_outweigh_latency(two_providers):
+    manager = two_providers(PROVIDER_ROUTING='latency')
+    manager.get_stats('groq').record(0.5, True)
+    manager.get_stats('cerebras').record(0.1, True)
+    for _ in range(5):
+        manager.get_stats('cerebras').record(0.1, False)
+    assert not manager.get_stats('cerebras').healthy(manager.max_error_rate)
+    assert names(manager.ranked_providers()) == ['groq', 'cerebras']
+
+def test_fixed_routing_keeps_the_failover_order(two_providers):
+    manager = two_providers()
+    manager.get_stats('groq').record(5.0, True)
+    manager.get_stats('cerebras').record(0.1, True)
+    assert names(manager.ranked_providers()) == ['groq', 'cerebras']
+
+def test_no_hedge_when_the_primary_is_fast(upstream, two_providers):
+    manager = two_providers(PROVIDER_HEDGE='true', PROVIDER_HEDGE_MIN_DELAY=0.5)
+    assert manager.chat(MESSAGES) == "ok"
+    assert len(upstream.requests) == 1
+    assert manager.hedges["fired"] == 0
+
+def test_hedge_fires_after_the_delay(upstream, two_providers):
+    upstream.respond = slow_groq(1.0)
+    manager = two_providers(PROVIDER_HEDGE='true', PROVIDER_HEDGE_MIN_DELAY=0.1)
+    start = time.monotonic()
+    assert manager.chat(MESSAGES) == "from cerebras"
+    assert time.monotonic() - start < 0.8
+    assert manager.hedges["fired"] == 1
+    assert sorted(r["path"] for r in upstream.requests) == ['/cerebras', '/chat/completions']
+
+def test_saturated_hedge_pool_serves_unhedged(upstream, two_providers):
+    upstream.respond = slow_groq(0.3)
+    manager = two_providers(PROVIDER_HEDGE='true', PROVIDER_HEDGE_MIN_DELAY=0.1, PROVIDER_HEDGE_WORKERS=1)
+    # The only hedge thread is taken by the primary, so no hedge is sent
+    assert manager.chat(MESSAGES) == "from groq"
+    assert manager.hedges == {"fired": 0, "skipped": 1}
+    assert [r["path"] for r in upstream.requests] == ['/chat/completions']
+
+def test_async_hedge_cancels_the_loser(upstream, two_providers):
+    upstream.respond = slow_groq(2.0)
+    manager = two_providers(PROVIDER_HEDGE='true', PROVIDER_HEDGE_MIN_DELAY=0.1)
+
+    async def run():
+        try:
+            return await manager.achat(MESSAGES)
+        finally:
+            for provider in manager.providers.values():
+                await provider.aclose()
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == "from cerebras"
+    assert time.monotonic() - start < 1.5
+    # The cancelled primary leaves no verdict in the stats or the breaker
+    assert manager.get_stats('groq').requests == 0
+    assert manager.get_breaker('groq').snapshot() == {"state": "closed", "failures": 0}
+    assert manager.get_stats('cerebras').requests == 1
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from conversation_store import ConversationStore, SessionConflict
+
+@pytest.fixture
+def client(bridge):
+    return bridge.app.test_client()
+
+@pytest.mark.parametrize('query', ['before=yesterday', 'before=nan', 'before=inf'])
+def test_bad_before_is_400(client, query):
+    response = client.get('/api/sessions?' + query)
+    assert response.status_code == 400
+    assert 'before' in response.get_json()['error']
+
+@pytest.mark.parametrize('query', ['before_id=abc', 'before_id=1.5', 'after_id=x', 'before_id=' + '9' * 30])
+def test_bad_message_cursor_is_400(client, query):
+    session = client.post('/api/sessions', json={}).get_json()
+    response = client.get(f"/api/sessions/{session['id']}/messages?" + query)
+    assert response.status_code == 400
+
+def test_message_cursors_page(client):
+    session = client.post('/api/sessions', json={}).get_json()
+    for i in range(5):
+        client.post(f"/api/sessions/{session['id']}/messages", json={"role": "user", "content": str(i)})
+    page = client.get(f"/api/sessions/{session['id']}/messages?limit=2").get_json()
+    assert [m['content'] for m in page['messages']] == ['3', '4']
+    older = client.get(f"/api/sessions/{session['id']}/messages?limit=2&before_id={page['next_before_id']}").get_json()
+    assert [m['content'] for m in older['messages']] == ['1', '2']
+    assert client.get('/api/sessions?before=&limit=1').status_code == 200
+
+def test_store_prunes_at_startup(tmp_path):
+    store = ConversationStore(str(tmp_path / 'c.db'), max_sessions=2)
+    for _ in range(4):
+        store.create_session()
+        time.sleep(0.01)
+    store.start_pruning(0).join(5)
+    assert len(store.list_sessions()) == 2
+
+def test_store_without_limits_does_not_prune(tmp_path):
+    assert ConversationStore(str(tmp_path / 'c.db')).start_pruning(60) is None
+
+def test_prune_bumps_the_session_version(tmp_path):
+    store = ConversationStore(str(tmp_path / 'c.db'))
+    version = store.append_turn('s', None, [{"role": "user", "content": str(i)} for i in range(6)])
+    store.prune(max_messages_per_session=2)
+    assert [m['content'] for m in store.get_history('s')] == ['4', '5']
+    with pytest.raises(SessionConflict):
+        store.append_turn('s', version, [{"role": "user", "content": "late"}])
+    assert store.get_session('s')['version'] == version + 1
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConversationStore(str(tmp_path / 'c.db'))
+    if not store.fts:
+        pytest.skip("SQLite built without FTS5")
+    return store
+
+def test_search_finds_inserted_messages(store):
+    store.add_messages('a', [{"role": "user", "content": "How do circuit breakers work?"},
+                             {"role": "assistant", "content": "They stop calls to a failing service."}])
+    store.add_message('b', 'user', 'Tell me about breakers in a house')
+    results = store.search('breakers')
+    assert sorted(r['session_id'] for r in results) == ['a', 'b']
+    assert '[breakers]' in results[0]['snippet']
+    assert [r['session_id'] for r in store.search('breakers', session_id='b')] == ['b']
+    # Terms are quoted, so FTS operators in user input are plain words
+    assert store.search('breakers OR "') == []
+
+def test_search_follows_updates_and_deletes(store):
+    message = store.add_message('a', 'user', 'original wording')
+    conn = store._conn()
+    with conn:
+        conn.execute("UPDATE messages SET content = ? WHERE id = ?", ('revised wording', message['id']))
+    assert store.search('original') == []
+    assert [r['id'] for r in store.search('revised')] == [message['id']]
+
+    store.delete_session('a')
+    assert store.search('revised') == []
+    store.add_messages('b', [{"role": "user", "content": str(i) + " pruned"} for i in range(3)])
+    store.prune(max_messages_per_session=1)
+    assert [r['content'] for r in store.search('pruned')] == ['2 pruned']
+
+def test_search_route(client):
+    session = client.post('/api/sessions', json={}).get_json()
+    client.post(f"/api/sessions/{session['id']}/messages", json={"role": "user", "content": "zebra crossing"})
+    assert client.get('/api/search').status_code == 400
+    results = client.get(f"/api/search?q=zebra&session_id={session['id']}").get_json()['results']
+    assert [r['content'] for r in results] == ['zebra crossing']
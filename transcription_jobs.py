@@ -0,0 +1,90 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import observe_stage
+
+class JobQueueFull(Exception):
+    pass
+
+class TranscriptionJob:
+    def __init__(self, source, transcriber=None):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.transcriber = transcriber
+        self.status = "queued"
+        self.text = None
+        self.error = None
+        self.timings = {}
+        self.created_at = time.time()
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "source": self.source,
+            "status": self.status,
+            "text": self.text,
+            "error": self.error,
+            "timings": self.timings
+        }
+
+class TranscriptionJobPool:
+    # Runs transcriptions off the request thread. At most max_pending jobs
+    # may be queued or running; finished jobs are kept (newest max_jobs) so
+    # clients can poll for them by id.
+
+    def __init__(self, workers=2, max_pending=8, max_jobs=128):
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transcription')
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, source, work, transcriber=None):
+        # work(timings) -> text; it may record its own stage durations in timings
+        job = TranscriptionJob(source, transcriber)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull("Too many transcriptions in progress")
+            self._pending += 1
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job, work, time.perf_counter())
+        return job
+
+    def _run(self, job, work, submitted):
+        start = time.perf_counter()
+        job.timings["queued_ms"] = round((start - submitted) * 1000, 2)
+        job.status = "running"
+        try:
+            job.text = work(job.timings) or ""
+            job.status = "done"
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            job.error = str(e)
+            job.status = "error"
+        finally:
+            job.timings["total_ms"] = round((time.perf_counter() - submitted) * 1000, 2)
+            for name, value in job.timings.items():
+                if name.endswith('_ms'):
+                    observe_stage('audio', name[:-3], value / 1000.0)
+            job.transcriber = None
+            with self._lock:
+                self._pending -= 1
+            job.done.set()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {"pending": self._pending, "max_pending": self.max_pending, "jobs": statuses}
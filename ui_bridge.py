@@ -1,47 +1,71 @@
 import os
 import sys
+import math
 import threading
 import time
 import json
+import queue
+import re
 import subprocess
-try:
-    if os.environ.get('CLOUD_MODE'):
-        raise ImportError("Cloud Mode: Skipping Webview")
-    import webview
-except ImportError:
-    webview = None
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS
+import multiprocessing
+import types
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from subsystems import registry as subsystems, startup
+
+with startup.stage("import:flask"):
+    from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
+    from flask_cors import CORS
+
 # Import backend logic
-from conversation_manager import ConversationManager
-from providers.provider_manager import ProviderManager
-try:
+with startup.stage("import:backend"):
+    from conversation_manager import ConversationManager
+    from conversation_store import store_from_env, SessionConflict
+    from providers.provider_manager import ProviderManager
+    from providers.errors import ProviderError
+    from response_cache import ResponseCache
+    from context_window import ContextWindow
+    from document_ingest import DocumentIngestor, IngestError, in_worker_process
+    from retrieval import RetrievalStore, question_text
+    from transcription_jobs import TranscriptionJobPool, JobQueueFull
+    from shared_state import shared_state_from_env
+    from config_store import ConfigStore
+    from metrics import registry as metrics_registry, Gauge, instrument_flask, observe_stage
+    from http_compression import compress_flask
+    from ocr_worker import OCRWorker, OCRWorkerError, OCREngineUnavailable, capture_and_recognize, preprocessor_from_env, remote_from_env
+
+# GUI, audio and OCR dependencies are heavy and absent in Cloud Mode; they
+# are imported on first use through the subsystem registry
+def load_webview():
+    if os.environ.get('CLOUD_MODE'):
+        raise ImportError("Cloud Mode: Skipping Webview")
+    import webview
+    return webview
+
+def load_matrix_loader():
     if os.environ.get('CLOUD_MODE'):
         raise ImportError("Cloud Mode: Skipping GUI")
     from nivy_matrix_loader import show_matrix_loader
-except ImportError:
-    show_matrix_loader = None
+    return show_matrix_loader
 
-# Audio imports
-try:
+def load_audio():
     if os.environ.get('CLOUD_MODE'):
         raise ImportError("Cloud Mode: Skipping audio drivers")
     import sounddevice as sd
-    import soundfile as sf
     import numpy as np
     import speech_recognition as sr
-except ImportError:
-    sd = None
-    sf = None
-    np = None
-    sr = None
-    print("Audio drivers not available (Cloud Mode or missing dependencies)")
+    return types.SimpleNamespace(sd=sd, np=np, sr=sr)
+
+def load_ocr_engine():
+    from ocr.ocr_engine import OCREngine
+    return OCREngine
 
-import tempfile
+subsystems.register('webview', load_webview)
+subsystems.register('matrix_loader', load_matrix_loader)
+subsystems.register('audio', load_audio)
+subsystems.register('ocr_engine', load_ocr_engine)
 
 # Setup Flask
 if getattr(sys, 'frozen', False):
@@ -51,13 +75,56 @@ else:
 
 app = Flask(__name__, static_folder=static_folder, static_url_path='')
 CORS(app)
+instrument_flask(app)
+# gzip/zstd request and response bodies (RemoteProvider on slow links)
+compress_flask(app)
 
 from pathlib import Path
 
-# Initialize Managers
-conversation_manager = ConversationManager()
-env_file = Path(__file__).parent / '.env'
-provider_manager = ProviderManager(env_file)
+# Spawned ingestion workers re-import the main module (ui_bridge.py, or
+# cloud_server.py and with it this module) as __mp_main__ to unpickle their
+# tasks. They need its functions, not another copy of the running app: no
+# journal, store, pruner, watcher or logging threads.
+WORKER_PROCESS = in_worker_process()
+
+if not WORKER_PROCESS:
+    # Initialize Managers
+    with startup.stage("init:conversation_manager"):
+        conversation_manager = ConversationManager()
+    with startup.stage("init:providers"):
+        env_file = Path(__file__).parent / '.env'
+        provider_manager = ProviderManager(env_file)
+    with startup.stage("init:conversation_store"):
+        conversation_store = store_from_env()
+    with startup.stage("init:caches"):
+        response_cache = ResponseCache(
+            max_entries=int(os.getenv('CHAT_CACHE_SIZE', '256')),
+            ttl=int(os.getenv('CHAT_CACHE_TTL', '600')),
+            disk_dir=os.getenv('CHAT_CACHE_DIR') or None
+        )
+        document_ingestor = DocumentIngestor(
+            max_bytes=int(os.getenv('UPLOAD_MAX_BYTES', str(20 * 1024 * 1024))),
+            max_pages=int(os.getenv('UPLOAD_MAX_PAGES', '200')),
+            workers=int(os.getenv('INGEST_WORKERS', '0')) or None,
+            cache_dir=os.getenv('INGEST_CACHE_DIR') or None
+        )
+        ocr_worker = OCRWorker()
+        retrieval_store = RetrievalStore(index_dir=os.getenv('RETRIEVAL_INDEX_DIR') or None)
+        context_window = ContextWindow(completion_reserve=int(os.getenv('CONTEXT_COMPLETION_RESERVE', '1024')))
+
+def on_shared_change(key, value):
+    # Another worker re-indexed a session's documents
+    if key.startswith('retrieval:') and value.get('pid') != os.getpid():
+        retrieval_store.evict(key.split(':', 1)[1])
+
+# Multi-worker serving: provider keys/selection and index invalidations are
+# shared through SHARED_STATE_DB; conversations already live in SQLite
+if not WORKER_PROCESS:
+    with startup.stage("init:shared_state"):
+        shared_state = shared_state_from_env()
+        if shared_state is not None:
+            provider_manager.use_shared_state(shared_state)
+            shared_state.subscribe(on_shared_change)
 
 @app.route('/')
 def index():
@@ -108,143 +175,497 @@ def setup_api():
     else:
         return jsonify({"error": "Failed to save API key"}), 500
 
+def read_upload():
+    # Returns (data, filename, None) or (None, None, error response)
+    if 'file' not in request.files:
+        return None, None, (jsonify({"error": "No file provided"}), 400)
+    
+    file = request.files['file']
+    if file.filename == '':
+        return None, None, (jsonify({"error": "No file selected"}), 400)
+
+    # Read one byte past the limit so oversized uploads fail before parsing
+    data = file.read(document_ingestor.max_bytes + 1)
+    return data, file.filename, None
+
+def index_upload(text, session_id=None):
+    # Uploads tied to a session get a retrieval index, so chat turns in that
+    # session only carry the relevant chunks
+    session_id = session_id or request.form.get('session_id')
+    if not session_id:
+        return {}
+    key = RetrievalStore.session_key(session_id)
+    index = retrieval_store.index(key, text)
+    if shared_state is not None:
+        shared_state.set(f'retrieval:{key}', {"pid": os.getpid(), "chunks": len(index.chunks)})
+    return {"session_id": session_id, "indexed_chunks": len(index.chunks)}
+
 @app.route('/api/upload_resume', methods=['POST'])
 def upload_resume():
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
+        data, filename, error = read_upload()
+        if error:
+            return error
         
-        filename = file.filename.lower()
-        text_content = ""
-        
-        if filename.endswith('.txt'):
-            text_content = file.read().decode('utf-8', errors='ignore')
-            
-        elif filename.endswith('.pdf'):
-            try:
-                import PyPDF2
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text_content += page.extract_text() + "\n"
-            except Exception as e:
-                return jsonify({"error": f"PDF parsing failed: {str(e)}"}), 500
-                
-        elif filename.endswith('.docx'):
-            try:
-                import docx
-                doc = docx.Document(file)
-                for paragraph in doc.paragraphs:
-                    text_content += paragraph.text + "\n"
-            except Exception as e:
-                return jsonify({"error": f"DOCX parsing failed: {str(e)}"}), 500
-        else:
-            return jsonify({"error": "Unsupported file type. Please use PDF, DOCX, or TXT"}), 400
-        
-        if not text_content.strip():
-            return jsonify({"error": "No text could be extracted from the file"}), 400
-            
-        return jsonify({"success": True, "text": text_content.strip()})
+        text_content = document_ingestor.ingest(data, filename)
+        result = {"success": True, "text": text_content}
+        result.update(index_upload(text_content))
+        return jsonify(result)
         
+    except IngestError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         return jsonify({"error": f"Upload failed: {str(e)}"}), 500
 
+@app.route('/api/upload_resume/stream', methods=['POST'])
+def upload_resume_stream():
+    # Same upload as /api/upload_resume, answered as Server-Sent Events:
+    # {"progress": pages_done, "total": pages} while PDF pages are extracted,
+    # then {"success": true, "text": ...} and [DONE]
+    data, filename, error = read_upload()
+    if error:
+        return error
+    session_id = request.form.get('session_id')
+
+    def generate():
+        try:
+            for event in document_ingestor.iter_ingest(data, filename):
+                if event.get('done'):
+                    result = {"success": True, "text": event['text'], "cached": event['cached']}
+                    result.update(index_upload(event['text'], session_id))
+                    yield sse_event(result)
+                else:
+                    yield sse_event(event)
+        except IngestError as e:
+            yield sse_event({"error": str(e), "status": e.status})
+        except Exception as e:
+            yield sse_event({"error": f"Upload failed: {str(e)}"})
+        yield sse_event("[DONE]")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+SYSTEM_PROMPT = "You are a helpful AI interview assistant. Format your responses professionally using markdown."
+
+# The UI pastes the whole resume into every question in this form
+RESUME_MESSAGE_RE = re.compile(r"^\[CANDIDATE RESUME\]:\s*(.*?)(?:\n\n|\\n\\n)\[QUESTION\]:\s*(.*)$", re.S)
+
+def apply_retrieval(user_message, session_id=None):
+    # Returns (user_message, context_messages) with documents reduced to the
+    # top-k chunks for the question. Short documents are cheaper sent whole.
+    top_k = int(os.getenv('RETRIEVAL_TOP_K', '4'))
+    min_words = int(os.getenv('RETRIEVAL_MIN_WORDS', '300'))
+
+    match = RESUME_MESSAGE_RE.match(user_message)
+    if match:
+        document, question = match.group(1), match.group(2)
+        if len(document.split()) < min_words:
+            return user_message, []
+        index = retrieval_store.get_or_index(RetrievalStore.document_key(document), document)
+        if len(index.chunks) <= top_k:
+            # Every chunk would be sent, overlaps included
+            return user_message, []
+        # Questions with no matching terms still get the top of the resume
+        excerpts = [chunk for chunk, _ in index.search(question, top_k)] or index.chunks[:top_k]
+        reduced = "[RELEVANT RESUME EXCERPTS]:\n" + "\n---\n".join(excerpts) + "\n\n[QUESTION]: " + question
+        # Overlapping excerpts of a resume not much longer than top_k chunks
+        # can outgrow the resume itself
+        if len(reduced) >= len(user_message):
+            return user_message, []
+        return reduced, []
+
+    if session_id:
+        index = retrieval_store.get(RetrievalStore.session_key(session_id))
+        if index:
+            excerpts = [chunk for chunk, _ in index.search(user_message, top_k)]
+            if excerpts:
+                return user_message, [{
+                    "role": "system",
+                    "content": "Relevant excerpts from the candidate's documents:\n" + "\n---\n".join(excerpts)
+                }]
+    return user_message, []
+
+def build_chat_messages(user_message, conversation_history, context_messages=None):
+    # Simplified System prompt
+    system_prompt = {
+        "role": "system",
+        "content": SYSTEM_PROMPT
+    }
+    
+    messages = [system_prompt]
+    
+    if conversation_history:
+        # Filter out any messages with null content
+        valid_history = [m for m in conversation_history if m.get('content')]
+        messages.extend(valid_history)
+    
+    if context_messages:
+        messages.extend(context_messages)
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+def resolve_history(data):
+    # Session protocol: the client sends {"session_id", "version", "message"}
+    # and the server supplies the history. Sending "messages" as well re-seeds
+    # the server copy (used after a 409). Without session_id this is the old
+    # full-history form. Returns (history, session, error).
+    session_id = data.get('session_id')
+    conversation_history = data.get('messages')
+    if conversation_history is not None and not (
+            isinstance(conversation_history, list) and all(isinstance(m, dict) for m in conversation_history)):
+        return None, None, ({"error": "messages must be a list of objects"}, 400)
+    if not session_id:
+        return conversation_history or [], None, None
+    if not isinstance(session_id, str):
+        return None, None, ({"error": "session_id must be a string"}, 400)
+
+    version = data.get('version')
+    if version is not None:
+        # Integers, or their decimal string form; bool is an int subclass
+        try:
+            if isinstance(version, bool) or not isinstance(version, (int, str)):
+                raise ValueError
+            version = int(version)
+        except ValueError:
+            return None, None, ({"error": "version must be an integer"}, 400)
+
+    stored = conversation_store.get_session(session_id)
+    server_version = stored['version'] if stored else 0
+    in_sync = version is not None and version == server_version
+
+    if conversation_history is not None and not in_sync:
+        history = [{"role": m['role'], "content": m['content']}
+                   for m in conversation_history
+                   if m.get('content') and m.get('role') in ('user', 'assistant')]
+        return history, {"id": session_id, "version": server_version, "resync": True, "history": history}, None
+
+    if version is not None and not in_sync:
+        return None, None, ({
+            "error": "session_diverged",
+            "session_id": session_id,
+            "version": server_version,
+            "message": "Session changed on the server; resend with the full messages array"
+        }, 409)
+
+    history = conversation_store.get_history(session_id) if stored else []
+    return history, {"id": session_id, "version": server_version, "resync": False}, None
+
+def record_session_turn(session, user_message, response):
+    # Returns the fields to merge into the chat response. The turn is stored
+    # as the user typed it: no resume text or retrieved excerpts, which every
+    # new question carries again anyway.
+    if not session:
+        return {}
+    turn = [{"role": "user", "content": question_text(user_message)}, {"role": "assistant", "content": response}]
+    if session['resync']:
+        version = conversation_store.append_turn(session['id'], None, session['history'] + turn, replace=True)
+    else:
+        version = conversation_store.append_turn(session['id'], session['version'], turn)
+    return {"session_id": session['id'], "version": version}
+
+def session_conflict_response(e, response=None):
+    payload = {"error": "session_diverged", "session_id": e.session_id, "version": e.version}
+    if response is not None:
+        payload["response"] = response
+    return payload, 409
+
+def prepare_chat(data):
+    # Shared by the Flask routes and the ASGI serving mode (asgi_server.py).
+    # Returns (provider, messages, session, None) or (None, None, None, (payload, status)).
+    user_message = data.get('message', '')
+    
+    if not user_message:
+        return None, None, None, ({"error": "Message is required"}, 400)
+    
+    provider = provider_manager.get_provider()
+    
+    if not provider:
+        return None, None, None, ({"setup_required": True, "response": "Please configure your API key in Settings."}, 200)
+    
+    conversation_history, session, error = resolve_history(data)
+    if error:
+        return None, None, None, error
+
+    # Debug logging
+    if getattr(provider, 'api_key', None):
+        masked_key = provider.api_key[:4] + "..." + provider.api_key[-4:] if len(provider.api_key) > 8 else "INVALID"
+        print(f"Using provider: {provider.name}, Key: {masked_key}")
+
+    context_messages = []
+    if data.get('retrieval', True) and os.getenv('RETRIEVAL', 'on') != 'off':
+        user_message, context_messages = apply_retrieval(user_message, data.get('session_id'))
+
+    # Keep long sessions inside the model's context: older turns get summarized
+    messages = build_chat_messages(user_message, conversation_history, context_messages)
+    budget = int(os.getenv('CONTEXT_BUDGET_TOKENS', '0')) or None
+    messages = context_window.fit(messages, getattr(provider, 'model', None), budget)
+
+    return provider, messages, session, None
+
+def request_priority(data):
+    # {"priority": "batch"} queues behind interactive chat for upstream quota
+    return "batch" if data.get('priority') == "batch" else "interactive"
+
+def provider_error_response(e):
+    # Typed upstream failure: 503 when every circuit is open, 502 otherwise.
+    # "response" keeps the UI readable; "error" lets clients react to the kind.
+    print(f"PROVIDER ERROR: {e}")
+    payload = {
+        "response": f"⚠️ **Provider Error ({e.kind}):**\n\n{str(e)}",
+        "error": e.to_dict()
+    }
+    retry_after = getattr(e, 'retry_after', None)
+    headers = {"Retry-After": str(int(retry_after) + 1)} if retry_after else {}
+    return payload, (503 if retry_after else 502), headers
+
+def chat_error_response(e):
+    error_msg = str(e)
+    print(f"CHAT ERROR: {error_msg}") # Log to console
+    
+    # Return ACTUAL error to user for debugging
+    return {"response": f"⚠️ **API Error:**\n\n{error_msg}\n\n(Please check console for details)"}
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
         data = request.json
-        user_message = data.get('message', '')
-        conversation_history = data.get('messages', [])
+        provider, messages, session, error = prepare_chat(data)
+        if error:
+            return jsonify(error[0]), error[1]
         
-        if not user_message:
-            return jsonify({"error": "Message is required"}), 400
-        
-        provider = provider_manager.get_provider()
-        
-        if not provider:
-            return jsonify({"setup_required": True, "response": "Please configure your API key in Settings."}), 200
-        
-        # Debug logging
-        if hasattr(provider, 'api_key'):
-            masked_key = provider.api_key[:4] + "..." + provider.api_key[-4:] if len(provider.api_key) > 8 else "INVALID"
-            print(f"Using provider: {provider.name}, Key: {masked_key}")
-
-        # Simplified System prompt
-        system_prompt = {
-            "role": "system",
-            "content": "You are a helpful AI interview assistant. Format your responses professionally using markdown."
-        }
-        
-        messages = [system_prompt]
-        
-        if conversation_history:
-            # Filter out any messages with null content
-            valid_history = [m for m in conversation_history if m.get('content')]
-            messages.extend(valid_history)
-        
-        messages.append({"role": "user", "content": user_message})
-        
-        response = provider.chat(messages)
-        return jsonify({"response": response})
+        # Identical prompts share one upstream call; "no_cache" skips the cache
+        key = response_cache.make_key(messages)
+        response = response_cache.get_or_call(key, lambda: provider_manager.chat(messages, request_priority(data)), bypass=bool(data.get('no_cache')))
+        try:
+            return jsonify(dict({"response": response}, **record_session_turn(session, data['message'], response)))
+        except SessionConflict as e:
+            payload, status = session_conflict_response(e, response)
+            return jsonify(payload), status
+    except ProviderError as e:
+        payload, status, headers = provider_error_response(e)
+        return jsonify(payload), status, headers
     except Exception as e:
-        error_msg = str(e)
-        print(f"CHAT ERROR: {error_msg}") # Log to console
-        
-        # Return ACTUAL error to user for debugging
-        return jsonify({"response": f"⚠️ **API Error:**\n\n{error_msg}\n\n(Please check console for details)"}), 200
+        return jsonify(chat_error_response(e)), 200
+
+@app.route('/api/providers/stats', methods=['GET'])
+def provider_stats():
+    return jsonify(provider_manager.routing_snapshot())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text format
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/clear', methods=['POST'])
+def cache_clear():
+    response_cache.clear()
+    return jsonify({"status": "cleared"})
+
+def sse_event(payload):
+    if isinstance(payload, str):
+        return f"data: {payload}\n\n"
+    return f"data: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    # Same request body as /api/chat, answered as Server-Sent Events: each token
+    # arrives as `data: {"delta": "..."}` and the stream ends with `data: [DONE]`.
+    data = request.json or {}
+    provider, messages, session, error = prepare_chat(data)
+    if error:
+        return jsonify(error[0]), error[1]
+
+    def generate():
+        try:
+            # Routed and failed over like /api/chat, but never hedged
+            parts = []
+            for delta in provider_manager.chat_stream(messages, request_priority(data)):
+                if delta:
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+            if session:
+                try:
+                    yield sse_event(record_session_turn(session, data['message'], "".join(parts)))
+                except SessionConflict as e:
+                    yield sse_event({"session_id": e.session_id, "version": e.version, "diverged": True})
+        except ProviderError as e:
+            print(f"CHAT STREAM ERROR: {e}")
+            yield sse_event({"error": e.to_dict()})
+        except Exception as e:
+            print(f"CHAT STREAM ERROR: {e}")
+            yield sse_event({"error": str(e)})
+        yield sse_event("[DONE]")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def run_ocr_subprocess():
+    # One-shot OCR process per request (OCR_WORKER=off)
+    cmd = [sys.executable]
+    if not getattr(sys, 'frozen', False):
+        cmd.append(os.path.abspath(__file__))
+    cmd.append('--ocr')
+    
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    
+    if result.returncode == 0:
+        try:
+            stdout_lines = result.stdout.strip().split('\n')
+            json_str = ""
+            for line in reversed(stdout_lines):
+                if line.strip().startswith('{') and line.strip().endswith('}'):
+                    json_str = line.strip()
+                    break
+            
+            if not json_str:
+                json_str = result.stdout.strip()
+
+            output = json.loads(json_str)
+            return ocr_response(output)
+        except json.JSONDecodeError:
+            clean_text = result.stdout.strip().replace("Tesseract not available", "")
+            return jsonify({"text": clean_text, "method": "Raw Output"})
+    else:
+        return jsonify({"error": f"OCR process failed: {result.stderr}"}), 500
+
+def observe_ocr_timings(result):
+    # Stage timings measured in the OCR process go to /metrics, not the client
+    for stage, seconds in (result.pop('timings', None) or {}).items():
+        observe_stage('ocr', stage, seconds)
+    return result
+
+def ocr_response(result):
+    # Results may carry the HTTP status to answer with, e.g. 503 without an engine
+    status = result.pop('status', 200)
+    return jsonify(observe_ocr_timings(result)), status
 
 @app.route('/api/ocr', methods=['POST'])
 def ocr():
     try:
-        cmd = [sys.executable]
-        if not getattr(sys, 'frozen', False):
-            cmd.append(os.path.abspath(__file__))
-        cmd.append('--ocr')
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            try:
-                stdout_lines = result.stdout.strip().split('\n')
-                json_str = ""
-                for line in reversed(stdout_lines):
-                    if line.strip().startswith('{') and line.strip().endswith('}'):
-                        json_str = line.strip()
-                        break
-                
-                if not json_str:
-                    json_str = result.stdout.strip()
-
-                output = json.loads(json_str)
-                return jsonify(output)
-            except json.JSONDecodeError:
-                clean_text = result.stdout.strip().replace("Tesseract not available", "")
-                return jsonify({"text": clean_text, "method": "Raw Output"})
-        else:
-            return jsonify({"error": f"OCR process failed: {result.stderr}"}), 500
+        if os.getenv('OCR_WORKER', 'on') == 'off':
+            return run_ocr_subprocess()
+        # Warm worker: the engine is already loaded, only selection + OCR run here
+        result = ocr_worker.request('ocr', timeout=float(os.getenv('OCR_TIMEOUT', '120')))
+        return ocr_response(result)
+    except OCRWorkerError as e:
+        return jsonify({"error": f"OCR process failed: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Session history endpoints
+def query_number(name, kind):
+    # Optional numeric query parameter; ValueError names the bad one
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        number = kind(value)
+    except ValueError:
+        number = None
+    # SQLite integers are 64-bit; nan and inf never match a row either
+    if number is None or abs(number) >= 2 ** 63 or not math.isfinite(number):
+        raise ValueError(f"{name} must be {'an integer' if kind is int else 'a number'}")
+    return number
+
+@app.route('/api/sessions', methods=['GET'])
+def list_sessions():
+    try:
+        before = query_number('before', float)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sessions = conversation_store.list_sessions(
+        user_id=request.args.get('user_id'),
+        limit=request.args.get('limit', 20),
+        before=before
+    )
+    return jsonify({"sessions": sessions})
+
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    data = request.json or {}
+    session = conversation_store.create_session(user_id=data.get('user_id'), title=data.get('title'))
+    return jsonify(session), 201
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    session = conversation_store.get_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+    return jsonify(session)
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    if not conversation_store.delete_session(session_id):
+        return jsonify({"error": "Session not found"}), 404
+    return jsonify({"status": "deleted"})
+
+@app.route('/api/sessions/<session_id>/messages', methods=['GET'])
+def get_session_messages(session_id):
+    if not conversation_store.get_session(session_id):
+        return jsonify({"error": "Session not found"}), 404
+    try:
+        before_id = query_number('before_id', int)
+        after_id = query_number('after_id', int)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    messages = conversation_store.get_messages(
+        session_id,
+        limit=request.args.get('limit', 50),
+        before_id=before_id,
+        after_id=after_id
+    )
+    # Cursor for the next (older) page
+    next_before = messages[0]['id'] if messages else None
+    return jsonify({"messages": messages, "next_before_id": next_before})
+
+@app.route('/api/sessions/<session_id>/messages', methods=['POST'])
+def add_session_message(session_id):
+    data = request.json or {}
+    if not data.get('content') or data.get('role') not in ('user', 'assistant', 'system'):
+        return jsonify({"error": "role and content are required"}), 400
+    message = conversation_store.add_message(session_id, data['role'], data['content'])
+    return jsonify(message), 201
+
+@app.route('/api/search', methods=['GET'])
+def search_messages():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Query parameter q is required"}), 400
+    results = conversation_store.search(
+        query,
+        session_id=request.args.get('session_id'),
+        user_id=request.args.get('user_id'),
+        limit=request.args.get('limit', 20)
+    )
+    return jsonify({"results": results})
+
+@app.route('/api/sessions/prune', methods=['POST'])
+def prune_sessions():
+    # Body values override the CONVERSATION_* retention defaults for this run
+    data = request.json or {}
+    removed = conversation_store.prune(
+        retention_days=data.get('retention_days'),
+        max_sessions=data.get('max_sessions'),
+        max_messages_per_session=data.get('max_messages_per_session')
+    )
+    return jsonify({"removed": removed})
+
 # Config persistence endpoints
-CONFIG_FILE = "user_config.json"
+CONFIG_FILE = os.getenv("USER_CONFIG_FILE", "user_config.json")
+if not WORKER_PROCESS:
+    config_store = ConfigStore(CONFIG_FILE)
 
 @app.route('/api/config/save', methods=['POST'])
 def save_config():
     try:
         data = request.json
-        existing_config = {}
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                existing_config = json.load(f)
-        
-        existing_config.update(data)
-        
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(existing_config, f)
-            
+        if not isinstance(data, dict):
+            return jsonify({"error": "Config must be a JSON object"}), 400
+        config_store.update(data)
         return jsonify({"status": "saved"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -252,32 +673,73 @@ def save_config():
 @app.route('/api/config/load', methods=['GET'])
 def load_config():
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-            return jsonify(config)
-        return jsonify({})
+        return jsonify(config_store.load())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # Audio handler
 class LiveAudioHandler:
-    def __init__(self):
+    # With AUDIO_STREAMING on (the default) each source feeds a
+    # StreamingTranscriber while recording, so utterances are transcribed as
+    # they end and stop only waits for the last one. Stopping hands the rest
+    # of the work to a TranscriptionJobPool and returns the job.
+
+    def __init__(self, jobs, recognizer=None):
         self.recording_user = False
         self.recording_system = False
-        self.user_data = []
-        self.system_data = []
+        self.user_data = None
+        self.system_data = None
         self.sample_rate = 44100
+        self.max_seconds = int(os.getenv('AUDIO_MAX_SECONDS', '600'))
+        self.streaming = os.getenv('AUDIO_STREAMING', 'on').lower() not in ('0', 'off', 'false')
+        self.jobs = jobs
+        self.recognizer = recognizer
+        self.transcribers = {}
+
+    def _get_recognizer(self):
+        if self.recognizer is None:
+            from audio_stream import GoogleRecognizer
+            self.recognizer = GoogleRecognizer()
+        return self.recognizer
+
+    def _start_recording(self, source):
+        # Returns the bounded buffer for the record-then-transcribe path
+        from audio_stream import StreamingTranscriber, BoundedRecording
+        # Starting again without a stop abandons the previous recording
+        previous = self.transcribers.pop(source, None)
+        if previous is not None:
+            previous.close()
+        if self.streaming:
+            transcriber = StreamingTranscriber(self._get_recognizer(), self.sample_rate)
+            transcriber.start()
+            self.transcribers[source] = transcriber
+            return None
+        return BoundedRecording(self.sample_rate * self.max_seconds)
+
+    def _submit(self, source, recording):
+        transcriber = self.transcribers.pop(source, None)
+        if transcriber is not None:
+            try:
+                return self.jobs.submit(source, lambda timings: transcriber.finish(timings=timings), transcriber)
+            except JobQueueFull:
+                # No job will finish it, so release its thread and executor
+                transcriber.close()
+                raise
+        return self.jobs.submit(source, lambda timings: self._transcribe(recording, timings))
+
+    def subscribe(self, source):
+        transcriber = self.transcribers.get(source)
+        return (transcriber, transcriber.subscribe()) if transcriber else (None, None)
 
     def start_user(self):
-        if not sd: return # No audio driver
+        if not subsystems.get('audio'): return # No audio driver
         self.recording_user = True
-        self.user_data = []
+        self.user_data = self._start_recording('user')
         threading.Thread(target=self._record_user).start()
 
     def _record_user(self):
         try:
-            if not sd: return
+            sd = subsystems.get('audio').sd
             with sd.InputStream(samplerate=self.sample_rate, channels=1, callback=self._user_callback):
                 while self.recording_user:
                     sd.sleep(100)
@@ -286,22 +748,27 @@ class LiveAudioHandler:
 
     def _user_callback(self, indata, frames, time, status):
         if self.recording_user:
-            self.user_data.append(indata.copy())
+            transcriber = self.transcribers.get('user')
+            if transcriber:
+                transcriber.feed(indata)
+            elif self.user_data is not None:
+                self.user_data.append(indata)
 
     def stop_user(self):
+        # Returns a TranscriptionJob, or None when nothing was recorded
         self.recording_user = False
-        if not self.user_data: return ""
-        return self._transcribe(self.user_data)
+        if 'user' not in self.transcribers and not self.user_data: return None
+        return self._submit('user', self.user_data)
 
     def start_system(self):
-        if not sd: return # No audio driver
+        if not subsystems.get('audio'): return # No audio driver
         self.recording_system = True
-        self.system_data = []
+        self.system_data = self._start_recording('system')
         threading.Thread(target=self._record_system).start()
 
     def _record_system(self):
         try:
-            if not sd: return
+            sd = subsystems.get('audio').sd
             wasapi_info = next(h for h in sd.query_hostapis() if 'WASAPI' in h['name'])
             default_speakers = wasapi_info['default_output_device']
             
@@ -313,44 +780,54 @@ class LiveAudioHandler:
 
     def _system_callback(self, indata, frames, time, status):
         if self.recording_system:
-            self.system_data.append(indata.copy())
+            transcriber = self.transcribers.get('system')
+            if transcriber:
+                transcriber.feed(indata)
+            elif self.system_data is not None:
+                self.system_data.append(indata)
 
     def stop_system(self):
+        # Returns a TranscriptionJob, or None when nothing was recorded
         self.recording_system = False
-        if not self.system_data: return ""
-        return self._transcribe(self.system_data)
+        if 'system' not in self.transcribers and not self.system_data: return None
+        return self._submit('system', self.system_data)
 
-    def _transcribe(self, data_list):
-        try:
-            if not data_list or not np or not sf or not sr: return ""
-            audio_data = np.concatenate(data_list, axis=0)
-            
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-                temp_path = f.name
-            
-            sf.write(temp_path, audio_data, self.sample_rate)
-            
-            r = sr.Recognizer()
-            with sr.AudioFile(temp_path) as source:
-                audio = r.record(source)
-            
-            try:
-                text = r.recognize_google(audio)
-            except sr.UnknownValueError:
-                text = ""
-            except Exception:
-                text = ""
-            
-            try:
-                os.remove(temp_path)
-            except:
-                pass
-                
-            return text
-        except Exception:
-            return ""
+    def _transcribe(self, recording, timings):
+        # Encoded in memory as 16-bit PCM; nothing touches the disk
+        if not recording or not subsystems.get('audio'): return ""
+        start = time.perf_counter()
+        samples = recording.samples()
+        timings["concat_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        start = time.perf_counter()
+        text = self._get_recognizer().transcribe(samples, self.sample_rate)
+        timings["recognize_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        timings["dropped_samples"] = recording.dropped
+        return text
+
+if not WORKER_PROCESS:
+    transcription_jobs = TranscriptionJobPool(
+        workers=int(os.getenv('AUDIO_JOB_WORKERS', '2')),
+        max_pending=int(os.getenv('AUDIO_JOB_QUEUE', '8'))
+    )
+    audio_handler = LiveAudioHandler(transcription_jobs)
+    metrics_registry.register(Gauge("transcription_jobs_pending", "Transcription jobs queued or running",
+                                    callback=lambda: transcription_jobs.stats()["pending"]))
 
-audio_handler = LiveAudioHandler()
+def stop_recording_response(stop):
+    # {"async": true} (or ?async=1) returns 202 with a job id to poll;
+    # otherwise the request waits for the text as before
+    data = request.get_json(silent=True) or {}
+    wait = not (data.get('async') or request.args.get('async') in ('1', 'true'))
+    try:
+        job = stop()
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    if job is None:
+        return jsonify({"text": "", "status": "done"})
+    if not wait:
+        return jsonify(job.to_dict()), 202
+    job.done.wait(float(os.getenv('AUDIO_STOP_TIMEOUT', '120')))
+    return jsonify(dict(job.to_dict(), text=job.text or ""))
 
 @app.route('/api/record/user/start', methods=['POST'])
 def start_user_record():
@@ -359,8 +836,33 @@ def start_user_record():
 
 @app.route('/api/record/user/stop', methods=['POST'])
 def stop_user_record():
-    text = audio_handler.stop_user()
-    return jsonify({"text": text})
+    return stop_recording_response(audio_handler.stop_user)
+
+@app.route('/api/record/<source>/partials', methods=['GET'])
+def record_partials(source):
+    # Partial transcripts of the recording in progress as Server-Sent Events:
+    # `data: {"partial": ..., "index": n}` per utterance, then `{"final": ...}`
+    transcriber, events = audio_handler.subscribe(source)
+    if transcriber is None:
+        return jsonify({"error": "No streaming recording in progress"}), 404
+
+    def generate():
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event(event)
+                if 'final' in event:
+                    break
+        finally:
+            transcriber.unsubscribe(events)
+        yield sse_event("[DONE]")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/api/record/system/start', methods=['POST'])
 def start_system_record():
@@ -369,18 +871,80 @@ def start_system_record():
 
 @app.route('/api/record/system/stop', methods=['POST'])
 def stop_system_record():
-    text = audio_handler.stop_system()
-    return jsonify({"text": text})
+    return stop_recording_response(audio_handler.stop_system)
+
+@app.route('/api/transcriptions', methods=['GET'])
+def transcription_stats():
+    return jsonify(transcription_jobs.stats())
 
-def start_server():
-    app.run(port=5000, threaded=True, use_reloader=False)
+@app.route('/api/transcriptions/<job_id>', methods=['GET'])
+def get_transcription(job_id):
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/transcriptions/<job_id>/events', methods=['GET'])
+def transcription_events(job_id):
+    # Partial transcripts still arriving for a stopped recording, then the
+    # finished job as `data: {"job_id": ..., "status": "done", "text": ...}`
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    transcriber = job.transcriber
+    events = transcriber.subscribe() if transcriber else None
+
+    def generate():
+        try:
+            while events is not None and not job.done.is_set():
+                try:
+                    event = events.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if 'partial' in event:
+                    yield sse_event(event)
+            job.done.wait()
+        finally:
+            if events is not None:
+                transcriber.unsubscribe(events)
+        yield sse_event(job.to_dict())
+        yield sse_event("[DONE]")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Set once the HTTP server is listening (or failed to bind)
+server_ready = threading.Event()
+http_server = None
+server_error = None
+
+def start_server(host='127.0.0.1', port=5000):
+    global http_server, server_error
+    from werkzeug.serving import make_server
+    try:
+        with startup.stage("server:bind"):
+            http_server = make_server(host, port, app, threaded=True)
+    except Exception as e:
+        server_error = e
+        server_ready.set()
+        raise
+    server_ready.set()
+    http_server.serve_forever()
+
+def wait_for_server(timeout=10.0):
+    if not server_ready.wait(timeout):
+        raise RuntimeError(f"Server did not start within {timeout}s")
+    if server_error is not None:
+        raise RuntimeError(f"Server failed to start: {server_error}")
 
 class WindowApi:
     def minimize_window(self):
+        webview = subsystems.get('webview')
         if len(webview.windows) > 0:
             webview.windows[0].minimize()
 
 def start_webview():
+    webview = subsystems.get('webview')
     if not webview:
         print("Webview not available in Cloud Mode")
         return
@@ -401,49 +965,43 @@ def start_webview():
     )
     webview.start()
 
+def local_ocr_engine():
+    # The engine module (torch, easyocr) is imported only if recognition runs locally
+    engine_class = subsystems.get('ocr_engine')
+    if engine_class is None:
+        raise OCREngineUnavailable(f"OCR engine not available: {subsystems.status()['ocr_engine']['error']}")
+    return engine_class()
+
 def run_ocr_process():
-    try:
-        # Import directly from the package to avoid circular dependency issues if any
-        from ocr.text_selector import InvisibleTextSelector
-        from ocr.ocr_engine import OCREngine
-        
-        # Variable to store results from callback
-        selection_result = {"coords": None}
-        
-        def on_select(coords):
-            selection_result["coords"] = coords
-            
-        selector = InvisibleTextSelector(on_select)
-        selector.start_selection()
-        
-        coords = selection_result["coords"]
-        
-        if not coords:
-            print(json.dumps({"error": "No selection made"}))
-            return
-        
-        try:
-            # Use the selector instance to capture the screen
-            image_bytes = selector.capture_screen_region(coords)
-            
-            if image_bytes:
-                ocr_engine = OCREngine()
-                text, method = ocr_engine.extract_text_from_image(image_bytes)
-                print(json.dumps({"text": text, "method": method}))
-            else:
-                print(json.dumps({"error": "Failed to capture screen region"}))
-        except Exception as e:
-            print(json.dumps({"error": f"OCR Engine Error: {str(e)}"}))
-            
-    except Exception as e:
-        print(json.dumps({"error": f"OCR Process Error: {str(e)}"}))
+    print(json.dumps(capture_and_recognize(local_ocr_engine, preprocessor_from_env(), remote_from_env())))
 
+import atexit
 import logging
+import logging.handlers
 import traceback
 
+def setup_logging(filename='debug_log.txt', level=logging.DEBUG):
+    # Request threads only enqueue records; a listener thread does the file I/O
+    handler = logging.FileHandler(filename)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
 # Setup logging
-logging.basicConfig(filename='debug_log.txt', level=logging.DEBUG, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+if not WORKER_PROCESS:
+    setup_logging()
+
+def prewarm_ocr_worker():
+    try:
+        ocr_worker.start()
+        logging.info(f"OCR worker ready (engine loaded in {ocr_worker.load_seconds}s)")
+    except Exception as e:
+        logging.error(f"OCR worker failed to start: {e}")
 
 def start_app():
     logging.info("Starting app...")
@@ -452,16 +1010,46 @@ def start_app():
     server_thread = threading.Thread(target=start_server, daemon=True)
     server_thread.start()
     logging.info("Server thread started")
-    
-    time.sleep(1.5)
+
+    # Load the OCR engine in the background so the first /api/ocr is warm
+    if os.getenv('OCR_WORKER', 'on') != 'off':
+        threading.Thread(target=prewarm_ocr_worker, daemon=True).start()
+
+    # Import the GUI toolkit while the server binds
+    subsystems.get('webview')
+    wait_for_server()
+    logging.info("Server ready")
     
     logging.info("Starting webview...")
     start_webview()
     logging.info("Webview closed")
+    ocr_worker.stop()
+
+def profile_startup():
+    # Cold-start report: import and init stages recorded while this module
+    # loaded, then every optional subsystem and the server bind
+    subsystems.load_all()
+    # Port 0: the report must not clash with a running instance
+    threading.Thread(target=start_server, kwargs={"port": 0}, daemon=True).start()
+    with startup.stage("server:ready"):
+        wait_for_server()
+    http_server.shutdown()
+    print(startup.report())
+    for name, status in subsystems.status().items():
+        print(f"{name}: {'available' if status['available'] else status['error']}")
 
 def main():
+    # Process pools (document ingestion) re-launch the frozen executable on Windows
+    multiprocessing.freeze_support()
     try:
         logging.info("Application started")
+        if '--profile-startup' in sys.argv:
+            profile_startup()
+            return
+        if '--ocr-worker' in sys.argv:
+            from ocr_worker import serve
+            serve()
+            return
         if '--ocr' in sys.argv:
             run_ocr_process()
             return
@@ -475,6 +1063,7 @@ def main():
         try:
             logging.info("Showing Matrix Loader...")
             # Run loader first, blocking until it finishes
+            show_matrix_loader = subsystems.get('matrix_loader')
             if show_matrix_loader:
                 show_matrix_loader(None)
             logging.info("Matrix Loader finished")